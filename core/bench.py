@@ -0,0 +1,223 @@
+# core/bench.py
+
+import json
+import random
+import statistics
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from documents.models import Category, Document, natural_sort_key
+from documents.search import index_documents
+from tutor.models import ChatMessage, ChatSession
+from users.roles import STUDENTS_GROUP, TEACHERS_GROUP
+
+DUMP_PATH = Path(settings.BASE_DIR) / 'datadump.json'
+BENCH_TEACHER = 'bench-prof'
+# Generated students are named bench-<class>-<number>, their classes Bench <number>
+BENCH_STUDENT_PREFIX = 'bench-'
+BENCH_CLASS_PREFIX = 'Bench '
+BULK_BATCH_SIZE = 1000
+
+# Modules that create an OpenAI client: they get the stub during the benchmark
+LLM_CLIENT_TARGETS = ('tutor.views.OpenAI', 'dashboard.views.OpenAI', 'dashboard.services.OpenAI')
+STUB_SUMMARY = {
+    'error_analysis': {'Erreurs de calcul': 2, 'Erreurs conceptuelles': 1},
+    'summary_text': "Résumé généré pour le benchmark.",
+}
+
+
+class StubOpenAI:
+    """Stands for openai.OpenAI: every completion answers at once with a fixed JSON content."""
+    def __init__(self, *args, **kwargs):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, *args, **kwargs):
+        message = SimpleNamespace(content=json.dumps(STUB_SUMMARY, ensure_ascii=False))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@contextmanager
+def stub_llm():
+    """Replaces the OpenAI client everywhere it is used: no network call, no cost, stable timings."""
+    with ExitStack() as stack:
+        for target in LLM_CLIENT_TARGETS:
+            stack.enter_context(mock.patch(target, StubOpenAI))
+        yield
+
+
+def _fill_derived_columns():
+    """The dump predates the materialized paths, the sort keys and the search index."""
+    Category.rebuild_paths()
+    documents = list(Document.objects.only('id', 'title'))
+    for document in documents:
+        document.sort_key = natural_sort_key(document.title)
+    Document.objects.bulk_update(documents, ['sort_key'], batch_size=BULK_BATCH_SIZE)
+    index_documents(extract_text=False)
+
+
+def _clear_previous_run():
+    """A test database kept with --keepdb still holds the classes and students of the previous run."""
+    User = get_user_model()
+    User.objects.filter(username__startswith=BENCH_STUDENT_PREFIX).exclude(username=BENCH_TEACHER).delete()
+    Group.objects.filter(name__startswith=BENCH_CLASS_PREFIX).delete()
+
+
+def load_fixtures(scale=1, students_per_class=25, sessions_per_student=10, seed=0, dump_path=DUMP_PATH):
+    """
+    Loads datadump.json, then scales it: `scale` classes of `students_per_class`
+    students, each with `sessions_per_student` copies of the sessions of the dump (with
+    their messages), spread over the exercises of the curriculum. Bulk inserts only.
+    The rows generated by a previous run on the same database are replaced.
+    Returns the users and objects the benchmarked views need.
+    """
+    rng = random.Random(seed)
+    call_command('loaddata', str(dump_path), verbosity=0)
+    _fill_derived_columns()
+    _clear_previous_run()
+
+    User = get_user_model()
+    teachers, _ = Group.objects.get_or_create(name=TEACHERS_GROUP)
+    students_group, _ = Group.objects.get_or_create(name=STUDENTS_GROUP)
+    password = make_password('bench')
+    teacher, _ = User.objects.get_or_create(username=BENCH_TEACHER, defaults={'password': password})
+    teacher.groups.add(teachers)
+
+    classes = Group.objects.bulk_create([Group(name=f"{BENCH_CLASS_PREFIX}{index + 1:03d}") for index in range(scale)])
+    students = User.objects.bulk_create([
+        User(username=f"{BENCH_STUDENT_PREFIX}{index + 1:03d}-{number + 1:03d}", password=password)
+        for index in range(scale) for number in range(students_per_class)
+    ], batch_size=BULK_BATCH_SIZE)
+    Membership = User.groups.through
+    Membership.objects.bulk_create([
+        Membership(user_id=student.id, group_id=group.id)
+        for position, student in enumerate(students)
+        for group in (students_group, classes[position // students_per_class])
+    ], batch_size=BULK_BATCH_SIZE)
+
+    templates = list(ChatSession.objects.prefetch_related('messages').order_by('id'))
+    exercises = list(Document.objects.filter(solution_for__isnull=True, category__isnull=False).values_list('id', flat=True))
+    copies = []
+    for student in students:
+        for template in rng.sample(templates, min(sessions_per_student, len(templates))):
+            session = ChatSession(
+                student_id=student.id, document_id=rng.choice(exercises) if exercises else None,
+                question_context=template.question_context, solution_context=template.solution_context,
+                end_time=template.end_time, summary_data=template.summary_data or STUB_SUMMARY,
+                whiteboard_state=template.whiteboard_state, teacher_analysis=template.teacher_analysis,
+            )
+            copies.append((session, template))
+    ChatSession.objects.bulk_create([session for session, _ in copies], batch_size=BULK_BATCH_SIZE)
+    ChatMessage.objects.bulk_create([
+        ChatMessage(session_id=session.id, role=message.role, content=message.content)
+        for session, template in copies for message in template.messages.all()
+    ], batch_size=BULK_BATCH_SIZE)
+
+    return {
+        'teacher': teacher,
+        'student': students[0] if students else User.objects.exclude(pk=teacher.pk).first(),
+        'class_id': classes[0].id if classes else None,
+        'counts': {
+            'classes': len(classes),
+            'students': len(students),
+            'sessions': ChatSession.objects.count(),
+            'messages': ChatMessage.objects.count(),
+            'documents': Document.objects.count(),
+        },
+    }
+
+
+def bench_views(fixtures):
+    """(name, user, URL) of every benchmarked view."""
+    teacher, student, class_id = fixtures['teacher'], fixtures['student'], fixtures['class_id']
+    return [
+        ('DashboardView (teacher)', teacher, reverse('dashboard:dashboard')),
+        ('DashboardView (student)', student, reverse('dashboard:dashboard')),
+        ('ClassDashboardView', teacher, f"{reverse('dashboard:class-dashboard')}?class_id={class_id}"),
+        ('ClassAnalyticsAPIView', teacher, reverse('dashboard:class-analytics-api', args=[class_id])),
+        ('SessionListView', teacher, reverse('dashboard:session-list')),
+        ('StudentProgressionView', student, reverse('dashboard:my-progression')),
+        ('TutorPageView', student, reverse('tutor-page')),
+        ('DocumentBrowseView', teacher, reverse('documents:browse')),
+    ]
+
+
+class QueryTimer:
+    """Database execute wrapper counting the queries and the time spent in them."""
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def _measure(client, url):
+    timer = QueryTimer()
+    with connection.execute_wrapper(timer):
+        start = time.perf_counter()
+        response = client.get(url)
+        # Streaming responses are consumed: their queries and time count
+        if response.streaming:
+            b''.join(response.streaming_content)
+        wall = time.perf_counter() - start
+    return {
+        'status': response.status_code,
+        'wall_ms': wall * 1000,
+        'queries': timer.count,
+        'sql_ms': timer.seconds * 1000,
+    }
+
+
+def run_benchmarks(fixtures, repeat=5, only=None):
+    """
+    Requests every view with the test client: once with empty caches (cold), then
+    `repeat` times (warm). Returns one result per view with the cold run and the
+    median of the warm runs.
+    """
+    results = []
+    for name, user, url in bench_views(fixtures):
+        if only and not any(part.lower() in name.lower() for part in only):
+            continue
+        client = Client()
+        client.force_login(user)
+        cache.clear()
+        cold = _measure(client, url)
+        warm = [_measure(client, url) for _ in range(repeat)]
+        results.append({
+            'view': name,
+            'url': url,
+            'status': cold['status'],
+            'cold': cold,
+            'warm': {
+                key: statistics.median(run[key] for run in warm) if warm else cold[key]
+                for key in ('wall_ms', 'queries', 'sql_ms')
+            },
+        })
+    return results
+
+
+def compare_results(results, previous):
+    """Yields (view, metric, previous value, new value) for the warm metrics of the views in both runs."""
+    before = {result['view']: result for result in previous.get('results', [])}
+    for result in results:
+        old = before.get(result['view'])
+        if old is None:
+            continue
+        for metric in ('wall_ms', 'queries', 'sql_ms'):
+            yield result['view'], metric, old['warm'][metric], result['warm'][metric]
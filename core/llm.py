@@ -0,0 +1,28 @@
+# core/llm.py
+
+import time
+from . import metrics
+from .timing import record_llm_call
+
+
+def chat_completion(client, task, **kwargs):
+    """
+    client.chat.completions.create(**kwargs), accounted to the current request and to
+    the metrics of `task` (the call site: 'interaction', 'summary'...): duration, errors, tokens.
+    """
+    labels = {'task': task}
+    start = time.perf_counter()
+    try:
+        response = client.chat.completions.create(**kwargs)
+    except Exception:
+        metrics.inc('catalyst_llm_errors_total', labels)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        record_llm_call(seconds)
+        metrics.observe('catalyst_llm_request_duration_seconds', seconds, labels)
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        metrics.inc('catalyst_llm_tokens_total', {**labels, 'kind': 'prompt'}, usage.prompt_tokens or 0)
+        metrics.inc('catalyst_llm_tokens_total', {**labels, 'kind': 'completion'}, usage.completion_tokens or 0)
+    return response
@@ -0,0 +1,95 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.bench import compare_results, load_fixtures, run_benchmarks, stub_llm
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure les vues principales (temps, nombre de requêtes SQL, temps SQL) sur une base de test "
+        "remplie à partir de datadump.json, à l'échelle choisie. L'appel à OpenAI est simulé."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help="Nombre de classes générées.")
+        parser.add_argument('--students', type=int, default=25, help="Nombre d'élèves par classe.")
+        parser.add_argument('--sessions', type=int, default=10, help="Nombre de sessions par élève.")
+        parser.add_argument('--repeat', type=int, default=5, help="Nombre de mesures à chaud par vue.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--view', action='append', help="Ne mesure que les vues dont le nom contient ce texte (répétable).")
+        parser.add_argument('--output', '-o', default='bench_results.json', help="Fichier JSON des résultats.")
+        parser.add_argument('--compare', help="Fichier JSON d'une mesure précédente, pour afficher les écarts.")
+        parser.add_argument('--keepdb', action='store_true', help="Conserve la base de test entre deux mesures.")
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as previous_file:
+                    previous = json.load(previous_file)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Mesure précédente illisible : {e}")
+
+        # The benchmark never touches the real database: it runs on the test database
+        setup_test_environment()
+        runner = DiscoverRunner(keepdb=options['keepdb'], verbosity=0)
+        old_config = runner.setup_databases()
+        try:
+            with stub_llm():
+                self.stderr.write("Chargement des données...")
+                fixtures = load_fixtures(options['scale'], options['students'], options['sessions'], options['seed'])
+                self.stderr.write(", ".join(f"{count} {name}" for name, count in fixtures['counts'].items()))
+                results = run_benchmarks(fixtures, options['repeat'], options['view'])
+                counts, vendor = fixtures['counts'], connection.vendor
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'Vue':<28} {'statut':>6} {'froid ms':>9} {'req.':>5} {'ms':>9} {'req.':>5} {'SQL ms':>8}")
+        for result in results:
+            cold, warm = result['cold'], result['warm']
+            self.stdout.write(
+                f"{result['view']:<28} {result['status']:>6} {cold['wall_ms']:>9.1f} {cold['queries']:>5} "
+                f"{warm['wall_ms']:>9.1f} {warm['queries']:>5.0f} {warm['sql_ms']:>8.1f}"
+            )
+
+        report = {
+            'commit': _git_commit(),
+            'date': datetime.now(timezone.utc).isoformat(),
+            'database': vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'options': {key: options[key] for key in ('scale', 'students', 'sessions', 'repeat', 'seed')},
+            'counts': counts,
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Résultats enregistrés dans {options['output']}."))
+
+        if previous:
+            self.stdout.write(f"Écarts avec {options['compare']} (commit {previous.get('commit') or '?'}) :")
+            for view, metric, before, after in compare_results(results, previous):
+                change = f"{(after - before) / before * 100:+.0f} %" if before else "n/a"
+                self.stdout.write(f"  {view:<28} {metric:<8} {before:>9.1f} -> {after:>9.1f} ({change})")
+
+        failed = [result['view'] for result in results if result['status'] != 200]
+        if failed:
+            raise CommandError(f"Réponse en erreur : {', '.join(failed)}")
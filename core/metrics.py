@@ -0,0 +1,247 @@
+# core/metrics.py
+
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from django.conf import settings
+
+# name: (type, help). Gauges are "live": only the values of running processes are summed.
+METRICS = {
+    'catalyst_http_request_duration_seconds': ('histogram', "Duration of the HTTP requests, by URL name."),
+    'catalyst_tutor_requests_in_progress': ('gauge', "Tutor requests being served."),
+    'catalyst_llm_request_duration_seconds': ('histogram', "Duration of the LLM calls, by task."),
+    'catalyst_llm_errors_total': ('counter', "LLM calls that raised, by task."),
+    'catalyst_llm_tokens_total': ('counter', "Tokens used by the LLM calls, by task and kind (prompt, completion)."),
+    'catalyst_summaries_in_progress': ('gauge', "Session summaries being generated."),
+    'catalyst_summaries_total': ('counter', "Session summaries generated, by outcome (success, error)."),
+    'catalyst_whiteboard_saves_total': ('counter', "Whiteboard saves."),
+    'catalyst_whiteboard_save_bytes_total': ('counter', "Bytes received by the whiteboard saves."),
+}
+BUCKETS = {
+    'catalyst_http_request_duration_seconds': (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    'catalyst_llm_request_duration_seconds': (0.5, 1, 2, 4, 8, 15, 30, 60, 120),
+}
+
+# The requests write their values at most this often (seconds); the gauges at once
+FLUSH_INTERVAL = 5
+# Counters and histograms of the workers that exited, summed into one file (see retire)
+RETIRED_FILE = 'retired.json'
+
+_lock = threading.Lock()
+# (name, sorted label items) -> number, or for the histograms [bucket counts..., +Inf count, sum]
+_values = {}
+# The file of the process is named after its pid and start: a reused pid gets a new file
+_process = {'pid': os.getpid(), 'started': time.time(), 'flushed': 0.0}
+
+
+def _after_fork():
+    # A worker forked from a master that imported this module (gunicorn --preload) starts afresh
+    global _lock
+    _lock = threading.Lock()
+    _values.clear()
+    _process.update(pid=os.getpid(), started=time.time(), flushed=0.0)
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((labels or {}).items()))
+
+
+def inc(name, labels=None, amount=1):
+    """Adds `amount` to a counter or a gauge of this process."""
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+
+
+def observe(name, value, labels=None):
+    """Adds one observation to a histogram of this process."""
+    key = _key(name, labels)
+    buckets = BUCKETS[name]
+    with _lock:
+        series = _values.get(key)
+        if series is None:
+            series = _values[key] = [0] * (len(buckets) + 2)
+        # Cumulative buckets, as exposed
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                series[index] += 1
+        series[-2] += 1
+        series[-1] += value
+
+
+def metrics_dir():
+    return Path(settings.METRICS_DIR or Path(tempfile.gettempdir()) / 'catalyst-metrics')
+
+
+def flush():
+    """
+    Writes the values of this process to its file of the shared directory, where the
+    /metrics view of any worker reads them. The file is replaced atomically: a reader
+    never sees a partial file.
+    """
+    with _lock:
+        if not _values:
+            return
+        entries = [[name, dict(labels), value] for (name, labels), value in _values.items()]
+        pid, started = _process['pid'], _process['started']
+        _process['flushed'] = time.monotonic()
+    directory = metrics_dir()
+    path = directory / f"{pid}-{started:.6f}.json"
+    # One temporary file per thread: the background summaries flush too
+    temporary = directory / f"{pid}-{threading.get_ident()}.tmp"
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        temporary.write_text(json.dumps({'pid': pid, 'started': started, 'values': entries}))
+        os.replace(temporary, path)
+    except OSError:
+        # The metrics never fail a request: the next flush writes everything again
+        pass
+
+
+def flush_if_due():
+    """Flushes if the last flush is older than FLUSH_INTERVAL: what the end of a request calls."""
+    if time.monotonic() - _process['flushed'] >= FLUSH_INTERVAL:
+        flush()
+
+
+def clear():
+    """Removes the files of all the processes: called when the gunicorn master starts (gunicorn.conf.py)."""
+    for path in [*metrics_dir().glob('*.json'), *metrics_dir().glob('*.tmp')]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def _accumulate(totals, key, kind, value):
+    if kind == 'histogram':
+        series = totals.setdefault(key, [0] * len(value))
+        for index, count in enumerate(value):
+            series[index] += count
+    else:
+        totals[key] = totals.get(key, 0) + value
+
+
+def retire(pid):
+    """
+    Folds the counters and histograms of an exited process into the retired file and
+    deletes its own files, so that the directory holds one file per running worker
+    whatever the number of restarts. Called by the gunicorn master when a worker exits
+    (gunicorn.conf.py), after its last flush.
+    """
+    directory = metrics_dir()
+    paths = list(directory.glob(f"{pid}-*.json"))
+    if not paths:
+        return
+    retired = directory / RETIRED_FILE
+    totals = {}
+    for path in [retired, *paths]:
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data['values']:
+            kind = METRICS.get(name, ('counter',))[0]
+            if kind != 'gauge':
+                _accumulate(totals, _key(name, labels), kind, value)
+    entries = [[name, dict(labels), value] for (name, labels), value in totals.items()]
+    temporary = directory / f"{os.getpid()}-retired.tmp"
+    try:
+        temporary.write_text(json.dumps({'pid': 0, 'started': 0, 'values': entries}))
+        os.replace(temporary, retired)
+        for path in [*paths, *directory.glob(f"{pid}-*.tmp")]:
+            path.unlink()
+    except OSError:
+        pass
+
+
+# A worker restarted by gunicorn (max_requests) keeps what it counted since its last request
+atexit.register(flush)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """
+    The values of all the processes that wrote to the shared directory, summed. The
+    counters and histograms of the processes that exited still count (a counter never
+    goes down, see retire); their gauges do not. Of the files of a pid, only the latest
+    start can be a running process: the others are of processes that exited before it
+    was reused.
+    """
+    flush()
+    files = []
+    for path in metrics_dir().glob('*.json'):
+        try:
+            files.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    latest = {}
+    for data in files:
+        latest[data['pid']] = max(latest.get(data['pid'], 0), data.get('started', 0))
+
+    totals = {}
+    for data in files:
+        alive = data.get('started', 0) == latest[data['pid']] and _alive(data['pid'])
+        for name, labels, value in data['values']:
+            kind = METRICS.get(name, ('counter',))[0]
+            if kind == 'gauge' and not alive:
+                continue
+            _accumulate(totals, _key(name, labels), kind, value)
+    return totals
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+def render_metrics(totals, extra=()):
+    """
+    The text exposition format of Prometheus. `extra` are (name, type, help, value)
+    computed at scrape time (the summary backlog, read from the database).
+    """
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in totals.items() if metric == name)
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, value in series:
+            if kind == 'histogram':
+                bounds = [*BUCKETS[name], math.inf]
+                for bound, count in zip(bounds, value[:-1]):
+                    bucket_labels = labels + (('le', _format_value(float(bound))),)
+                    lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value[-2]}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    for name, kind, help_text, value in extra:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {_format_value(value)}"]
+    return "\n".join(lines) + "\n"
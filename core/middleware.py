@@ -0,0 +1,79 @@
+# core/middleware.py
+
+import json
+import logging
+import time
+from django.conf import settings
+from django.db import connection
+from . import metrics
+from .timing import end_request, start_request
+
+logger = logging.getLogger('catalyst.timing')
+
+
+class ServerTimingMiddleware:
+    """
+    Measures the SQL queries, the template rendering and the LLM calls of every request
+    (HTML views and DRF APIs alike) and reports them in a Server-Timing header, shown by
+    the browser's developer tools. Requests slower than SLOW_REQUEST_MS are logged as
+    one JSON line. The cost is a few clock reads per query, template and LLM call.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings, token = start_request()
+        try:
+            with connection.execute_wrapper(timings):
+                response = self.get_response(request)
+        finally:
+            end_request(token)
+
+        response['Server-Timing'] = timings.header()
+        total_ms = timings.total_seconds * 1000
+        if total_ms >= settings.SLOW_REQUEST_MS:
+            match = request.resolver_match
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else None,
+                'status': response.status_code,
+                'user_id': request.user.id if hasattr(request, 'user') and request.user.is_authenticated else None,
+                **timings.as_dict(),
+            }))
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Records the duration of every request by URL name, and the tutor requests in
+    progress, for the /metrics endpoint. The values of the process are written to the
+    shared metrics directory every few seconds, and at once when the gauge changes (core/metrics.py).
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            match = request.resolver_match
+            metrics.observe(
+                'catalyst_http_request_duration_seconds', time.perf_counter() - start,
+                {'view': match.view_name if match else 'unresolved'},
+            )
+            if getattr(request, 'tutor_in_progress', False):
+                metrics.inc('catalyst_tutor_requests_in_progress', amount=-1)
+                metrics.flush()
+            else:
+                metrics.flush_if_due()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match.route.startswith('tutor/'):
+            request.tutor_in_progress = True
+            metrics.inc('catalyst_tutor_requests_in_progress')
+            # Written at once: the tutor requests wait for the LLM, they must show while they do
+            metrics.flush()
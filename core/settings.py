@@ -60,6 +60,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that the time of every other middleware is measured too
+    "core.middleware.ServerTimingMiddleware",
+    "core.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -67,15 +70,24 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "users.middleware.UserRolesMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
 ROOT_URLCONF = "core.urls"
 
+AUTHENTICATION_BACKENDS = [
+    # Loads the stored roles with the user (users/roles.py)
+    "users.backends.RolesModelBackend",
+    # The sessions opened before name this backend: it can go once they have expired
+    "django.contrib.auth.backends.ModelBackend",
+]
+
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # The Django backend, with the rendering time accounted to the request (core/timing.py)
+        "BACKEND": "core.timing.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -105,6 +117,22 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+if 'DATABASE_URL' in os.environ:
+    # Production configuration: a cache shared by all the workers,
+    # so that invalidations are seen by every process
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'catalyst_cache'}
+    }
+else:
+    # Local development configuration (in-memory cache)
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalyst'}
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -161,6 +189,33 @@ CORS_ALLOW_ALL_ORIGINS = True
 # Media files configuration (uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Document files are sent by the front-end server when it supports it:
+# 'nginx' (X-Accel-Redirect to MEDIA_SENDFILE_PREFIX, an internal location aliased to MEDIA_ROOT)
+# or 'apache' (X-Sendfile). Empty: Django streams the files itself.
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', '')
+MEDIA_SENDFILE_PREFIX = os.environ.get('MEDIA_SENDFILE_PREFIX', '/protected-media/')
+# Partial files of the chunked uploads (documents/uploads.py), outside MEDIA_ROOT so they are never served
+CHUNKED_UPLOAD_DIR = os.environ.get('CHUNKED_UPLOAD_DIR', BASE_DIR / 'uploads')
+
+# Processes hashing the passwords of an imported roster (dashboard/roster.py): the import runs in a
+# web worker, and the CPU quota of a PaaS container is much lower than the host's CPU count
+ROSTER_HASHING_WORKERS = int(os.environ.get('ROSTER_HASHING_WORKERS', 2))
+
+# Requests slower than this (in ms) are logged with their SQL, template and LLM times (core/middleware.py)
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 1000))
+
+# Directory shared by the gunicorn workers, where each one writes its metrics (core/metrics.py).
+# Empty: catalyst-metrics in the temporary directory.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+# /metrics is served to the superusers, and to the scrapers sending "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'catalyst': {'handlers': ['console'], 'level': 'INFO'}},
+}
 
 
 # Authentication redirect URLs
@@ -0,0 +1,168 @@
+# core/testing.py
+
+from contextlib import contextmanager
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
+from django.db.backends.utils import CursorWrapper
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from dashboard.synthetic import generate_dataset
+from documents.models import Category, Document
+from tutor.models import ChatMessage, ChatSession
+from users.backends import RolesModelBackend
+from users.roles import TEACHERS_GROUP, get_user_roles
+from .bench import QueryTimer, stub_llm
+
+# The two dataset sizes every view is measured on: the large one has about ten times
+# more classes, students, sessions and messages
+SMALL_DATASET = {'prefix': 'small', 'classes': 1, 'students': 3, 'sessions': 20}
+LARGE_DATASET = {'prefix': 'large', 'classes': 3, 'students': 30, 'sessions': 600}
+DATASET_OPTIONS = {'messages': 4, 'image_rate': 0.5, 'image_size': 256, 'analysis_rate': 0.5, 'batch_size': 500}
+
+
+class RowCounter:
+    """Counts the rows fetched from the database, whatever the query (models, values, raw SQL)."""
+    def __init__(self):
+        self.rows = 0
+
+    @contextmanager
+    def counting(self):
+        counter = self
+
+        def fetchone(cursor):
+            row = cursor.cursor.fetchone()
+            counter.rows += row is not None
+            return row
+
+        def fetchmany(cursor, *args, **kwargs):
+            rows = cursor.cursor.fetchmany(*args, **kwargs)
+            counter.rows += len(rows)
+            return rows
+
+        def fetchall(cursor):
+            rows = cursor.cursor.fetchall()
+            counter.rows += len(rows)
+            return rows
+
+        # CursorWrapper forwards the fetch methods with __getattr__: class attributes take precedence
+        with mock.patch.object(CursorWrapper, 'fetchone', fetchone, create=True), \
+                mock.patch.object(CursorWrapper, 'fetchmany', fetchmany, create=True), \
+                mock.patch.object(CursorWrapper, 'fetchall', fetchall, create=True):
+            yield self
+
+
+def build_curriculum(grades=2, chapters=2, exercises=4):
+    """A small curriculum: grades > chapters > exercises, each exercise with its solution."""
+    for grade in range(grades):
+        grade_category = Category.objects.create(name=f"{grade + 9}ème", order=grade)
+        for chapter in range(chapters):
+            category = Category.objects.create(name=f"Chapitre {chapter + 1}", parent=grade_category, order=chapter)
+            for number in range(exercises):
+                exercise = Document.objects.create(category=category, title=f"ES{number + 1}")
+                Document.objects.create(category=category, title=f"ES{number + 1} (Corrigé)", solution_for=exercise)
+
+
+def dataset_fixtures(prefix):
+    """The objects of a generated dataset the views are requested with: its first class, its busiest student..."""
+    students = get_user_model().objects.filter(username__startswith=f"{prefix}-").exclude(username__contains='-prof-')
+    student = students.annotate(sessions=Count('chatsession')).order_by('-sessions', 'id').first()
+    # A finished session: resuming it reopens it, whatever the dataset
+    session = ChatSession.objects.filter(student=student, end_time__isnull=False).annotate(
+        message_count=Count('messages')
+    ).order_by('-message_count', 'id').first()
+    image_message = next(
+        message for message in ChatMessage.objects.filter(session__student__in=students, role='user').order_by('id')
+        if any(part.get('type') == 'image_url' for part in message.content)
+    )
+    return {
+        'class_id': Group.objects.filter(name__startswith=f"{prefix}-").order_by('name').values_list('id', flat=True).first(),
+        'student': student,
+        'session': session,
+        'document_id': session.document_id,
+        'category_id': session.document.category_id,
+        'image_message_id': image_message.id,
+    }
+
+
+# Counted queries are the views' own: the cache is in memory (not the database cache of
+# production) and the static files need no manifest
+TEST_SETTINGS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'query-budget'}},
+    'STATICFILES_STORAGE': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+}
+
+
+@override_settings(**TEST_SETTINGS)
+class QueryBudgetTestCase(TestCase):
+    """
+    Base of the query budget tests. Every view is requested on a small dataset, then
+    again once a ten times larger one was added: the number of queries must stay the
+    same (a query per row would show up here) and within the view's budget, and the
+    number of rows read must stay within the row budget. The LLM is stubbed.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        build_curriculum()
+        cls.teacher = get_user_model().objects.create_user('prof', password='prof')
+        cls.teacher.groups.add(Group.objects.get_or_create(name=TEACHERS_GROUP)[0])
+        for _ in generate_dataset(**DATASET_OPTIONS, **SMALL_DATASET):
+            pass
+
+    def setUp(self):
+        stub = stub_llm()
+        stub.__enter__()
+        self.addCleanup(stub.__exit__, None, None, None)
+        self.large = False
+
+    def grow(self):
+        """Adds the large dataset (rolled back with the test)."""
+        if not self.large:
+            for _ in generate_dataset(**DATASET_OPTIONS, **LARGE_DATASET):
+                pass
+            self.large = True
+
+    def measure(self, method, url, user, data=None, session=None, **extra):
+        """
+        (queries, rows, response) of one request with empty caches, the roles of `user`
+        being stored already (as after its first request). `session` is put in the client's session first.
+        """
+        cache.clear()
+        get_user_roles(RolesModelBackend().get_user(user.pk))
+        self.client.force_login(user)
+        if session:
+            client_session = self.client.session
+            client_session.update(session)
+            client_session.save()
+        timer, rows = QueryTimer(), RowCounter()
+        with connection.execute_wrapper(timer), rows.counting():
+            response = getattr(self.client, method)(url, data, **extra)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return timer.count, rows.rows, response
+
+    def assertQueryBudget(self, request, max_queries, max_rows, method='get', status=200):
+        """
+        `request(fixtures)` returns the arguments of `measure` (url, user, and optionally
+        data, session...) as a dict, for a dataset. The query counts on both datasets
+        must be equal and at most `max_queries`, the rows read on the large one at most `max_rows`.
+        """
+        counts = []
+        for prefix in (SMALL_DATASET['prefix'], LARGE_DATASET['prefix']):
+            if prefix == LARGE_DATASET['prefix']:
+                self.grow()
+            fixtures = dict(dataset_fixtures(prefix), teacher=self.teacher)
+            arguments = request(fixtures)
+            queries, rows, response = self.measure(method, **arguments)
+            self.assertEqual(response.status_code, status, f"{method.upper()} {arguments['url']}")
+            counts.append((queries, rows))
+
+        (small_queries, _), (large_queries, large_rows) = counts
+        self.assertEqual(
+            small_queries, large_queries,
+            f"The number of queries grows with the data: {small_queries} -> {large_queries}",
+        )
+        self.assertLessEqual(large_queries, max_queries, f"{large_queries} queries (budget: {max_queries})")
+        self.assertLessEqual(large_rows, max_rows, f"{large_rows} rows read (budget: {max_rows})")
@@ -0,0 +1,179 @@
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from tutor.models import ChatSession
+from . import metrics
+from .bench import load_fixtures, stub_llm
+from .testing import TEST_SETTINGS
+
+
+@override_settings(**TEST_SETTINGS)
+class ServerTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('eleve', password='eleve')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_html_view(self):
+        response = self.client.get(reverse('tutor-page'))
+        timing = response['Server-Timing']
+        self.assertIn('sql;dur=', timing)
+        self.assertNotIn('tpl;dur=0.0;', timing)
+        self.assertIn('desc="LLM (0)"', timing)
+
+    def test_api_view_counts_llm_calls(self):
+        session = self.client.session
+        chat_session = ChatSession.objects.create(student=self.user)
+        session.update({'chat_session_id': chat_session.id, 'exercise_context': {'question': "Q", 'solution': "S"}})
+        session.save()
+        with stub_llm():
+            response = self.client.post(
+                reverse('tutor-interact'), {'messages': [{'role': 'user', 'content': "Bonjour"}]},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="LLM (1)"', response['Server-Timing'])
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request_is_logged(self):
+        with self.assertLogs('catalyst.timing', 'WARNING') as logs:
+            self.client.get(reverse('tutor-page'))
+        self.assertIn('"view": "tutor-page"', logs.output[0])
+
+
+class BenchFixturesTests(TestCase):
+    def test_second_run_on_a_kept_database(self):
+        # A one-session dump stands for datadump.json
+        student = get_user_model().objects.create_user('eleve', password='eleve')
+        ChatSession.objects.create(student=student)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        dump_path = os.path.join(directory.name, 'dump.json')
+        with open(dump_path, 'w', encoding='utf-8') as dump:
+            json.dump([{'model': 'auth.group', 'pk': 900, 'fields': {'name': "Dump", 'permissions': []}}], dump)
+
+        first = load_fixtures(scale=2, students_per_class=3, sessions_per_student=1, dump_path=dump_path)
+        second = load_fixtures(scale=2, students_per_class=3, sessions_per_student=1, dump_path=dump_path)
+        self.assertEqual(second['teacher'], first['teacher'])
+        self.assertEqual(second['counts'], first['counts'])
+        self.assertEqual(second['counts']['sessions'], 7)
+
+
+@override_settings(**TEST_SETTINGS, METRICS_TOKEN='secret')
+class MetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(METRICS_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def scrape(self, **headers):
+        return self.client.get(reverse('metrics'), **headers)
+
+    def test_requires_token(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    def test_exposition(self):
+        self.client.get(reverse('home'))
+        response = self.scrape(HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE catalyst_http_request_duration_seconds histogram', body)
+        self.assertIn('catalyst_http_request_duration_seconds_bucket{view="home",le="+Inf"}', body)
+        self.assertIn('catalyst_summary_backlog 0', body)
+
+    def test_processes_are_summed(self):
+        # A worker that exited: its counters still count, its gauges no longer do
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        dead = process.pid
+        with open(f"{self.directory}/{dead}.json", 'w') as worker_file:
+            json.dump({'pid': dead, 'values': [
+                ['catalyst_whiteboard_saves_total', {}, 5],
+                ['catalyst_tutor_requests_in_progress', {}, 1],
+                ['catalyst_llm_request_duration_seconds', {'task': 'test'}, [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0.8]],
+            ]}, worker_file)
+        before = metrics.collect()
+        saves = before.get(('catalyst_whiteboard_saves_total', ()), 0)
+        metrics.inc('catalyst_whiteboard_saves_total', amount=2)
+        metrics.observe('catalyst_llm_request_duration_seconds', 3, {'task': 'test'})
+        totals = metrics.collect()
+        self.assertEqual(totals[('catalyst_whiteboard_saves_total', ())], saves + 2)
+        self.assertNotIn(('catalyst_tutor_requests_in_progress', ()), totals)
+        histogram = totals[('catalyst_llm_request_duration_seconds', (('task', 'test'),))]
+        self.assertEqual(histogram[-2], 2)
+        self.assertEqual(histogram[:4], [0, 1, 1, 2])
+
+    def saved_whiteboards(self):
+        """The whiteboard saves of this process, as written to its file."""
+        [path] = pathlib.Path(self.directory).glob(f"{os.getpid()}-*.json")
+        values = json.loads(path.read_text())['values']
+        return next(value for name, _, value in values if name == 'catalyst_whiteboard_saves_total')
+
+    def test_flush_is_throttled(self):
+        metrics.inc('catalyst_whiteboard_saves_total')
+        metrics.flush()
+        saves = self.saved_whiteboards()
+        metrics.inc('catalyst_whiteboard_saves_total')
+        metrics.flush_if_due()
+        self.assertEqual(self.saved_whiteboards(), saves)
+        with mock.patch.object(metrics, 'FLUSH_INTERVAL', 0):
+            metrics.flush_if_due()
+        self.assertEqual(self.saved_whiteboards(), saves + 1)
+
+    def test_reused_pid(self):
+        # The file of a process that exited before its pid went to this one
+        gauge = ('catalyst_tutor_requests_in_progress', ())
+        metrics.inc('catalyst_whiteboard_saves_total')
+        saves = metrics.collect()[('catalyst_whiteboard_saves_total', ())]
+        with open(f"{self.directory}/{os.getpid()}-1.000000.json", 'w') as worker_file:
+            json.dump({'pid': os.getpid(), 'started': 1.0, 'values': [
+                ['catalyst_whiteboard_saves_total', {}, 5],
+                ['catalyst_tutor_requests_in_progress', {}, 3],
+            ]}, worker_file)
+        totals = metrics.collect()
+        self.assertEqual(totals[('catalyst_whiteboard_saves_total', ())], saves + 5)
+        self.assertEqual(totals.get(gauge, 0), metrics._values.get(gauge, 0))
+
+    def test_retire(self):
+        metrics.inc('catalyst_whiteboard_saves_total')
+        before = metrics.collect()
+        saves = before[('catalyst_whiteboard_saves_total', ())]
+        # Two workers that exited: their counters are kept, their gauges dropped, their files deleted
+        for dead in (1_000_001, 1_000_002):
+            with open(f"{self.directory}/{dead}-1.000000.json", 'w') as worker_file:
+                json.dump({'pid': dead, 'started': 1.0, 'values': [
+                    ['catalyst_whiteboard_saves_total', {}, 5],
+                    ['catalyst_tutor_requests_in_progress', {}, 1],
+                    ['catalyst_llm_request_duration_seconds', {'task': 'test'}, [0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 0.8]],
+                ]}, worker_file)
+            metrics.retire(dead)
+        self.assertEqual(list(pathlib.Path(self.directory).glob('100000*')), [])
+        self.assertTrue((pathlib.Path(self.directory) / metrics.RETIRED_FILE).exists())
+        totals = metrics.collect()
+        self.assertEqual(totals[('catalyst_whiteboard_saves_total', ())], saves + 10)
+        histogram = ('catalyst_llm_request_duration_seconds', (('task', 'test'),))
+        self.assertEqual(totals[histogram][-2], before.get(histogram, [0, 0])[-2] + 2)
+        self.assertEqual(
+            totals.get(('catalyst_tutor_requests_in_progress', ()), 0),
+            before.get(('catalyst_tutor_requests_in_progress', ()), 0),
+        )
+
+    def test_clear(self):
+        metrics.inc('catalyst_whiteboard_saves_total')
+        metrics.flush()
+        metrics.clear()
+        self.assertEqual(list(pathlib.Path(self.directory).iterdir()), [])
@@ -0,0 +1,103 @@
+# core/timing.py
+
+import time
+from contextvars import ContextVar
+from django.template.backends.django import DjangoTemplates
+
+# Accounting of the request being served (None outside a request: commands, background threads)
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Where the time of one request went: SQL, template rendering and LLM calls."""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.llm_count = 0
+        self.llm_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper: installed by the middleware for the whole request
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_seconds += time.perf_counter() - start
+
+    @property
+    def total_seconds(self):
+        return time.perf_counter() - self.start
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.total_seconds * 1000, 1),
+            'sql_queries': self.sql_count,
+            'sql_ms': round(self.sql_seconds * 1000, 1),
+            'template_ms': round(self.template_seconds * 1000, 1),
+            'llm_calls': self.llm_count,
+            'llm_ms': round(self.llm_seconds * 1000, 1),
+        }
+
+    def header(self):
+        """Value of the Server-Timing header (the template time includes the queries run while rendering)."""
+        return ", ".join([
+            f'sql;dur={self.sql_seconds * 1000:.1f};desc="SQL ({self.sql_count})"',
+            f'tpl;dur={self.template_seconds * 1000:.1f};desc="Gabarits"',
+            f'llm;dur={self.llm_seconds * 1000:.1f};desc="LLM ({self.llm_count})"',
+            f'total;dur={self.total_seconds * 1000:.1f}',
+        ])
+
+
+def start_request():
+    """Starts the accounting of a request; returns the timings and the token for `end_request`."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_timings():
+    return _current.get()
+
+
+def record_llm_call(seconds):
+    timings = _current.get()
+    if timings is not None:
+        timings.llm_count += 1
+        timings.llm_seconds += seconds
+
+
+class TimedTemplate:
+    """Wraps a template of the Django backend: its rendering time is added to the request's."""
+    def __init__(self, template):
+        self.template = template
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            timings = _current.get()
+            if timings is not None:
+                timings.template_seconds += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timed: render(), render_to_string and the template
+    responses all go through it (the templates they include do not, so nothing is counted twice).
+    """
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -19,12 +19,13 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
-from .views import HomeView
+from .views import HomeView, MetricsView
 
 urlpatterns = [
     path("", HomeView.as_view(), name="home"),
     # path("api/", APIRootView.as_view(), name="api-root"), # Uncomment if you need an API root
     path("admin/", admin.site.urls),
+    path("metrics", MetricsView.as_view(), name="metrics"), # Prometheus scrape endpoint
     path("dashboard/", include(("dashboard.urls", "dashboard"), namespace="dashboard")), # Dashboard web pages
     path("tutor/", include("tutor.urls")), # Tutor web page and API
     path("documents/", include("documents.urls")), # URLs for document management
@@ -1,6 +1,11 @@
-from django.views.generic import TemplateView
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.generic import TemplateView, View
 from django.shortcuts import redirect
 from django.urls import reverse
+from dashboard.services import summary_backlog
+from .metrics import collect, render_metrics
 
 
 class HomeView(TemplateView):
@@ -16,4 +21,26 @@ class HomeView(TemplateView):
             return redirect(reverse('dashboard:dashboard'))
         
         # Otherwise, show the normal homepage for visitors.
-        return super().get(request, *args, **kwargs)
\ No newline at end of file
+        return super().get(request, *args, **kwargs)
+
+class MetricsView(View):
+    """
+    Prometheus scrape endpoint (text exposition format): the metrics of all the gunicorn
+    workers, summed, and the summary backlog read from the database.
+    Served to the superusers and to the scrapers sending the METRICS_TOKEN.
+    """
+    def get(self, request, *args, **kwargs):
+        token = settings.METRICS_TOKEN
+        authorized = request.user.is_superuser or (
+            token and constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}")
+        )
+        if not authorized:
+            return HttpResponse(status=403)
+
+        backlog, oldest_age = summary_backlog()
+        body = render_metrics(collect(), extra=[
+            ('catalyst_summary_backlog', 'gauge', "Ended sessions waiting for their summary.", backlog),
+            ('catalyst_summary_backlog_oldest_age_seconds', 'gauge',
+             "Time since the oldest session of the backlog ended.", oldest_age),
+        ])
+        return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
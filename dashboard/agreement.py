@@ -0,0 +1,191 @@
+# dashboard/agreement.py
+
+from collections import Counter, defaultdict
+from datetime import datetime
+from django.contrib.auth import get_user_model
+from tutor.models import ChatSession
+from users.roles import TEACHERS_GROUP
+from .grouping import ERROR_KEY_MAP, ERROR_KEYS
+
+AGREEMENT_WINDOWS = ('week', 'month')
+
+# The AI and the teacher both rate these categories; 'autre' only exists on the teacher side
+CATEGORIES = ERROR_KEYS
+DOMINANT_LABELS = ERROR_KEYS + ['autre', 'aucune']
+PRESENCE_LABELS = ['absente', 'présente']
+
+
+def _mask(error_analysis, key_of):
+    """Bit i is set when category i was reported at least once."""
+    mask = 0
+    for label, count in (error_analysis or {}).items():
+        key = key_of(label)
+        if key in CATEGORIES and isinstance(count, (int, float)) and count > 0:
+            mask |= 1 << CATEGORIES.index(key)
+    return mask
+
+
+def _dominant(error_analysis, key_of):
+    """Most reported category (ties broken by category order), or 'aucune'."""
+    counts = defaultdict(float)
+    for label, count in (error_analysis or {}).items():
+        key = key_of(label)
+        if key in DOMINANT_LABELS and isinstance(count, (int, float)) and count > 0:
+            counts[key] += count
+    if not counts:
+        return 'aucune'
+    return max(DOMINANT_LABELS[:-1], key=lambda key: (counts[key], -DOMINANT_LABELS.index(key)))
+
+
+def _window_key(moment, window):
+    if window == 'week':
+        year, week, _ = moment.isocalendar()
+        return f"{year}-W{week:02d}"
+    return f"{moment.year}-{moment.month:02d}"
+
+
+def load_agreement_columns(window='month'):
+    """
+    Loads every co-analysed session (AI summary and teacher diagnosis) as parallel
+    columns: one list per attribute, the error reports being reduced to bitmasks.
+    Runs three queries whatever the number of sessions.
+    """
+    rows = ChatSession.objects.filter(
+        summary_data__isnull=False, teacher_analysis__isnull=False
+    ).order_by('id').values_list('id', 'student_id', 'start_time', 'end_time', 'summary_data', 'teacher_analysis')
+
+    columns = defaultdict(list)
+    for session_id, student_id, start_time, end_time, summary_data, teacher_analysis in rows:
+        if not isinstance(summary_data, dict) or not isinstance(teacher_analysis, dict):
+            continue
+        if 'error_analysis' not in summary_data or 'error_analysis' not in teacher_analysis:
+            continue
+        ai_errors, teacher_errors = summary_data['error_analysis'], teacher_analysis['error_analysis']
+        analysed_at = teacher_analysis.get('analysed_at')
+        moment = datetime.fromisoformat(analysed_at) if analysed_at else (end_time or start_time)
+
+        columns['session_id'].append(session_id)
+        columns['student_id'].append(student_id)
+        columns['teacher_id'].append(teacher_analysis.get('teacher_id'))
+        columns['window'].append(_window_key(moment, window))
+        columns['ai_mask'].append(_mask(ai_errors, ERROR_KEY_MAP.get))
+        columns['teacher_mask'].append(_mask(teacher_errors, str))
+        columns['ai_dominant'].append(_dominant(ai_errors, ERROR_KEY_MAP.get))
+        columns['teacher_dominant'].append(_dominant(teacher_errors, str))
+
+    User = get_user_model()
+    memberships = defaultdict(list)
+    class_names = {}
+    for student_id, class_id, class_name in User.groups.through.objects.filter(
+        user_id__in=set(columns['student_id'])
+    ).exclude(group__name=TEACHERS_GROUP).values_list('user_id', 'group_id', 'group__name'):
+        memberships[student_id].append(class_id)
+        class_names[class_id] = class_name
+    columns['class_ids'] = [memberships[student_id] for student_id in columns['student_id']]
+
+    teacher_names = dict(User.objects.filter(
+        id__in={teacher_id for teacher_id in columns['teacher_id'] if teacher_id}
+    ).values_list('id', 'username'))
+    return columns, class_names, teacher_names
+
+
+def cohen_kappa(matrix):
+    """Cohen's kappa of a square confusion matrix, or None when it is undefined."""
+    total = sum(map(sum, matrix))
+    if not total:
+        return None
+    observed = sum(matrix[i][i] for i in range(len(matrix))) / total
+    expected = sum(
+        (sum(row) / total) * (sum(column) / total) for row, column in zip(matrix, zip(*matrix))
+    )
+    if expected >= 1:
+        # Both raters always gave the same single answer: agreement is not informative
+        return None
+    return round((observed - expected) / (1 - expected), 3)
+
+
+class _Tally:
+    """Running counts of one breakdown (the whole corpus, a class, a teacher or a time window)."""
+    __slots__ = ('sessions', 'exact', 'cells', 'dominant')
+
+    def __init__(self):
+        self.sessions = 0
+        self.exact = 0
+        # cells[category][ai_present * 2 + teacher_present]
+        self.cells = [[0, 0, 0, 0] for _ in CATEGORIES]
+        self.dominant = Counter()
+
+    def add(self, ai_mask, teacher_mask, ai_dominant, teacher_dominant):
+        self.sessions += 1
+        self.exact += ai_mask == teacher_mask
+        for i, cells in enumerate(self.cells):
+            cells[((ai_mask >> i) & 1) * 2 + ((teacher_mask >> i) & 1)] += 1
+        self.dominant[ai_dominant, teacher_dominant] += 1
+
+    def to_dict(self):
+        categories = {}
+        for key, (neither, teacher_only, ai_only, both) in zip(CATEGORIES, self.cells):
+            # Rows: AI, columns: teacher
+            matrix = [[neither, teacher_only], [ai_only, both]]
+            categories[key] = {
+                'agreement': round((neither + both) / self.sessions, 3),
+                'kappa': cohen_kappa(matrix),
+                'confusion': matrix,
+            }
+        dominant = [[self.dominant[ai, teacher] for teacher in DOMINANT_LABELS] for ai in DOMINANT_LABELS]
+        dominant_agreement = sum(dominant[i][i] for i in range(len(DOMINANT_LABELS))) / self.sessions
+        return {
+            'sessions': self.sessions,
+            'exact_agreement': round(self.exact / self.sessions, 3),
+            'divergence_rate': round(1 - self.exact / self.sessions, 3),
+            'categories': categories,
+            'dominant': {
+                'agreement': round(dominant_agreement, 3),
+                'kappa': cohen_kappa(dominant),
+                'confusion': dominant,
+            },
+        }
+
+
+def build_agreement_analytics(window='month'):
+    """
+    Teacher-AI agreement over every co-analysed session: per-category agreement,
+    Cohen's kappa and confusion matrices (presence of each error type and dominant
+    error type), overall and broken down by class, teacher and time window.
+    Every breakdown is filled in a single pass over the columns.
+    """
+    columns, class_names, teacher_names = load_agreement_columns(window)
+
+    overall = _Tally()
+    by_class = defaultdict(_Tally)
+    by_teacher = defaultdict(_Tally)
+    by_window = defaultdict(_Tally)
+    for ai_mask, teacher_mask, ai_dominant, teacher_dominant, class_ids, teacher_id, window_key in zip(
+        columns['ai_mask'], columns['teacher_mask'], columns['ai_dominant'], columns['teacher_dominant'],
+        columns['class_ids'], columns['teacher_id'], columns['window'],
+    ):
+        values = (ai_mask, teacher_mask, ai_dominant, teacher_dominant)
+        overall.add(*values)
+        for class_id in class_ids:
+            by_class[class_id].add(*values)
+        by_teacher[teacher_id].add(*values)
+        by_window[window_key].add(*values)
+
+    return {
+        'window': window,
+        'categories': CATEGORIES,
+        'dominant_labels': DOMINANT_LABELS,
+        'presence_labels': PRESENCE_LABELS,
+        'overall': overall.to_dict() if overall.sessions else None,
+        'by_class': sorted(
+            ({'id': class_id, 'name': class_names[class_id], **tally.to_dict()} for class_id, tally in by_class.items()),
+            key=lambda item: item['name'],
+        ),
+        'by_teacher': sorted(
+            ({'id': teacher_id, 'name': teacher_names.get(teacher_id, "Non renseigné"), **tally.to_dict()}
+             for teacher_id, tally in by_teacher.items()),
+            key=lambda item: item['name'],
+        ),
+        # Chronological, to plot the divergence trend
+        'by_window': [{'window': key, **by_window[key].to_dict()} for key in sorted(by_window)],
+    }
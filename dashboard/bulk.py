@@ -0,0 +1,83 @@
+# dashboard/bulk.py
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from tutor.models import ChatSession, ChatMessage
+from users.models import CachedRoles
+from users.roles import TEACHERS_GROUP, invalidate_user_roles
+from .cache import bump_class_version, bump_agreement_version
+
+# Upper bound of ids accepted by one bulk request
+MAX_BULK_IDS = 5000
+
+
+def _students(student_ids):
+    """Ids of the given users that are not teachers: bulk actions never touch teacher accounts."""
+    return list(
+        get_user_model().objects.filter(id__in=student_ids).exclude(groups__name=TEACHERS_GROUP).values_list('id', flat=True)
+    )
+
+
+def _class_ids_of(student_ids):
+    Membership = get_user_model().groups.through
+    return set(Membership.objects.filter(user_id__in=student_ids).values_list('group_id', flat=True))
+
+
+def _invalidate(class_ids):
+    """Invalidates the caches once for the whole batch, after the transaction."""
+    bump_class_version(*class_ids)
+    bump_agreement_version()
+
+
+def move_students(student_ids, target_class_id=None):
+    """
+    Moves students to a class (or leaves them unassigned), replacing all their memberships.
+    Runs one delete and one insert on the user-group table. Returns the number of students moved.
+    """
+    Membership = get_user_model().groups.through
+    with transaction.atomic():
+        if target_class_id:
+            target_class_id = Group.objects.exclude(name=TEACHERS_GROUP).values_list('id', flat=True).get(id=target_class_id)
+        student_ids = _students(student_ids)
+        previous_class_ids = _class_ids_of(student_ids)
+        Membership.objects.filter(user_id__in=student_ids).delete()
+        if target_class_id:
+            Membership.objects.bulk_create([Membership(user_id=student_id, group_id=target_class_id) for student_id in student_ids])
+
+    # Set-based changes do not send m2m_changed
+    invalidate_user_roles(*student_ids)
+    _invalidate(previous_class_ids | {target_class_id})
+    return len(student_ids)
+
+
+def delete_sessions(session_ids):
+    """Deletes sessions and their messages with set-based deletes. Returns the number of sessions deleted."""
+    with transaction.atomic():
+        sessions = ChatSession.objects.filter(id__in=session_ids)
+        class_ids = _class_ids_of(sessions.values('student_id'))
+        ChatMessage.objects.filter(session__in=sessions.values('id')).delete()
+        deleted, _ = sessions.delete()
+
+    _invalidate(class_ids)
+    return deleted
+
+
+def delete_students(student_ids):
+    """
+    Deletes students with all their data (sessions, messages, memberships).
+    The cascade is run table by table instead of object by object. Returns the number of students deleted.
+    """
+    User = get_user_model()
+    with transaction.atomic():
+        student_ids = _students(student_ids)
+        class_ids = _class_ids_of(student_ids)
+        sessions = ChatSession.objects.filter(student_id__in=student_ids)
+        ChatMessage.objects.filter(session__in=sessions.values('id')).delete()
+        sessions.delete()
+        User.groups.through.objects.filter(user_id__in=student_ids).delete()
+        CachedRoles.objects.filter(user_id__in=student_ids).delete()
+        deleted = User.objects.filter(id__in=student_ids).delete()[1].get(User._meta.label, 0)
+
+    _invalidate(class_ids)
+    return deleted
@@ -0,0 +1,108 @@
+# dashboard/cache.py
+
+import time
+import uuid
+from django.core.cache import cache
+from django.contrib.auth.models import Group
+
+# Cached payloads are invalidated by version bumps, the timeout only bounds memory usage.
+PAYLOAD_TIMEOUT = 60 * 60
+
+
+def _version_key(scope):
+    return f"dashboard:{scope}:version"
+
+
+def _fresh_version():
+    # A millisecond timestamp is always greater than any version issued before it,
+    # so a counter that was evicted from the cache can never resurrect stale payloads.
+    return int(time.time() * 1000)
+
+
+def get_version(scope):
+    """Returns the current data version of a scope (e.g. 'class:3'), initializing it if needed."""
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*scopes):
+    """Invalidates every cached payload of the given scopes."""
+    for scope in set(scopes):
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # The counter does not exist (yet, or anymore)
+            cache.set(key, _fresh_version(), None)
+
+
+def get_cached_payload(scope, name, builder, *key_parts):
+    """
+    Returns the payload `name` of a scope from the cache, or builds and stores it.
+    `key_parts` distinguishes the variants of a payload (e.g. a selected exercise).
+    """
+    suffix = ":".join(str(part) for part in key_parts)
+    key = f"dashboard:{scope}:v{get_version(scope)}:{name}:{suffix}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = builder()
+        cache.set(key, payload, PAYLOAD_TIMEOUT)
+    return payload
+
+
+def get_class_version(class_id):
+    """Returns the current data version of a class, initializing it if needed."""
+    return get_version(f"class:{class_id}")
+
+
+def bump_class_version(*class_ids):
+    """Invalidates every cached payload of the given classes."""
+    bump_version(*(f"class:{class_id}" for class_id in class_ids if class_id))
+
+
+def bump_student_classes(*student_ids):
+    """Invalidates the cached payloads of every class the given students belong to."""
+    class_ids = Group.objects.filter(user__id__in=student_ids).values_list('id', flat=True)
+    bump_class_version(*class_ids)
+
+
+def get_cached_class_payload(class_id, name, builder, *key_parts):
+    """Returns the payload `name` of a class from the cache, or builds and stores it."""
+    return get_cached_payload(f"class:{class_id}", name, builder, *key_parts)
+
+
+# Teacher-AI agreement analytics span every class and only depend on the co-analysed sessions
+AGREEMENT_SCOPE = 'agreement'
+
+
+def bump_agreement_version():
+    """Invalidates the agreement analytics (AI summaries, teacher analyses or class memberships changed)."""
+    bump_version(AGREEMENT_SCOPE)
+
+
+# Conversations (e.g. with the group creation assistant) are kept server-side for a working session
+CONVERSATION_TIMEOUT = 60 * 60 * 2
+
+
+def _conversation_key(conversation_id):
+    return f"dashboard:conversation:{conversation_id}"
+
+
+def create_conversation(data):
+    """Stores a new conversation and returns its id."""
+    conversation_id = uuid.uuid4().hex
+    cache.set(_conversation_key(conversation_id), data, CONVERSATION_TIMEOUT)
+    return conversation_id
+
+
+def load_conversation(conversation_id):
+    """Returns the stored conversation, or None if it does not exist or has expired."""
+    return cache.get(_conversation_key(conversation_id))
+
+
+def save_conversation(conversation_id, data):
+    cache.set(_conversation_key(conversation_id), data, CONVERSATION_TIMEOUT)
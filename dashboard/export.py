@@ -0,0 +1,184 @@
+# dashboard/export.py
+
+import csv
+import hashlib
+import hmac
+import json
+from django.conf import settings
+from django.urls import reverse
+from tutor.models import ChatSession, ChatMessage
+from .pagination import filter_sessions, with_message_count
+from .transcripts import get_image_url
+
+EXPORT_KINDS = ('sessions', 'messages', 'summaries', 'analyses')
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+# Number of rows fetched from the database at a time
+EXPORT_CHUNK_SIZE = 500
+
+AI_ERROR_COLUMNS = {
+    "Erreurs de calcul": "calcul", "Erreurs de substitution": "substitution",
+    "Erreurs de procédure": "procedure", "Erreurs conceptuelles": "conceptuelle",
+}
+
+EXPORT_COLUMNS = {
+    'sessions': [
+        'session_id', 'student', 'classes', 'document_id', 'document_title',
+        'start_time', 'end_time', 'duration_seconds', 'message_count', 'has_summary', 'has_teacher_analysis',
+    ],
+    'messages': ['message_id', 'session_id', 'student', 'role', 'timestamp', 'text', 'images'],
+    'summaries': ['session_id', 'student'] + [f'ai_{key}' for key in AI_ERROR_COLUMNS.values()] + ['summary_text'],
+    'analyses': ['session_id', 'student'] + [f'teacher_{key}' for key, _ in ChatSession.TEACHER_ERROR_CHOICES] + [
+        'notes', 'divergence_analysis', 'remediation_strategy', 'ai_influence_rating', 'general_notes',
+    ],
+}
+
+
+class Pseudonymizer:
+    """
+    Replaces usernames with stable pseudonyms (keyed HMAC), so that exports made
+    with the same salt can be joined together without revealing identities.
+    """
+    def __init__(self, enabled=False, salt=None):
+        self.enabled = enabled
+        self.key = (salt or settings.SECRET_KEY).encode()
+
+    def __call__(self, username):
+        if not self.enabled or username is None:
+            return username
+        digest = hmac.new(self.key, username.encode(), hashlib.sha256).hexdigest()
+        return f"eleve-{digest[:12]}"
+
+
+def split_message_content(message_id, content):
+    """
+    Splits the content of a message into its text and references to its images.
+    Images are referenced by URL and hash instead of being inlined as base64.
+    """
+    if isinstance(content, str):
+        return content, []
+
+    texts, images = [], []
+    for part in content if isinstance(content, list) else []:
+        if not isinstance(part, dict):
+            continue
+        if part.get('type') == 'text':
+            texts.append(part.get('text', ''))
+        elif part.get('type') == 'image_url':
+            url = get_image_url(part) or ''
+            images.append({
+                'message_id': message_id,
+                'index': len(images),
+                'url': reverse('dashboard:message-image', kwargs={'message_id': message_id, 'index': len(images)}),
+                'sha256': hashlib.sha256(url.encode()).hexdigest(),
+                'size': len(url),
+            })
+    return "\n".join(texts), images
+
+
+def _filtered_sessions(filters):
+    sessions, _ = filter_sessions(ChatSession.objects.all(), filters)
+    return sessions.order_by('start_time', 'id')
+
+
+def _session_rows(filters, pseudonymize):
+    sessions = with_message_count(_filtered_sessions(filters)).select_related(
+        'student', 'document'
+    ).prefetch_related('student__groups')
+    for session in sessions.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'session_id': session.id,
+            'student': pseudonymize(session.student.username),
+            'classes': [group.name for group in session.student.groups.all()],
+            'document_id': session.document_id,
+            'document_title': session.document.title if session.document else None,
+            'start_time': session.start_time.isoformat(),
+            'end_time': session.end_time.isoformat() if session.end_time else None,
+            'duration_seconds': int((session.end_time - session.start_time).total_seconds()) if session.end_time else None,
+            'message_count': session.message_count,
+            'has_summary': bool(session.summary_data),
+            'has_teacher_analysis': bool(session.teacher_analysis),
+        }
+
+
+def _message_rows(filters, pseudonymize):
+    messages = ChatMessage.objects.filter(
+        session__in=_filtered_sessions(filters).values('id')
+    ).order_by('session_id', 'timestamp', 'id').values_list(
+        'id', 'session_id', 'session__student__username', 'role', 'timestamp', 'content'
+    )
+    for message_id, session_id, username, role, timestamp, content in messages.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        text, images = split_message_content(message_id, content)
+        yield {
+            'message_id': message_id,
+            'session_id': session_id,
+            'student': pseudonymize(username),
+            'role': role,
+            'timestamp': timestamp.isoformat(),
+            'text': text,
+            'images': images,
+        }
+
+
+def _summary_rows(filters, pseudonymize):
+    sessions = _filtered_sessions(filters).filter(summary_data__isnull=False).values_list(
+        'id', 'student__username', 'summary_data'
+    )
+    for session_id, username, summary_data in sessions.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        error_analysis = summary_data.get('error_analysis') or {}
+        row = {'session_id': session_id, 'student': pseudonymize(username)}
+        for label, key in AI_ERROR_COLUMNS.items():
+            row[f'ai_{key}'] = error_analysis.get(label, 0)
+        row['summary_text'] = summary_data.get('summary_text', '')
+        yield row
+
+
+def _analysis_rows(filters, pseudonymize):
+    sessions = _filtered_sessions(filters).filter(teacher_analysis__isnull=False).exclude(
+        teacher_analysis__exact={}
+    ).values_list('id', 'student__username', 'teacher_analysis')
+    for session_id, username, analysis in sessions.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        error_analysis = analysis.get('error_analysis') or {}
+        row = {'session_id': session_id, 'student': pseudonymize(username)}
+        for key, _ in ChatSession.TEACHER_ERROR_CHOICES:
+            row[f'teacher_{key}'] = error_analysis.get(key, 0)
+        for key in ('notes', 'divergence_analysis', 'remediation_strategy', 'ai_influence_rating', 'general_notes'):
+            row[key] = analysis.get(key)
+        yield row
+
+
+ROW_GENERATORS = {
+    'sessions': _session_rows,
+    'messages': _message_rows,
+    'summaries': _summary_rows,
+    'analyses': _analysis_rows,
+}
+
+
+class _Echo:
+    """Pseudo-buffer for csv.writer: returns the written line instead of storing it."""
+    def write(self, value):
+        return value
+
+
+def stream_export(kind, export_format, filters=None, pseudonymize=False, salt=None):
+    """
+    Generates the lines of an export, one row at a time, so that memory usage
+    does not depend on the amount of exported data.
+    `filters` accepts the same keys as the session list (class_id, student_id, ...).
+    """
+    rows = ROW_GENERATORS[kind](filters or {}, Pseudonymizer(pseudonymize, salt))
+
+    if export_format == 'jsonl':
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+        return
+
+    columns = EXPORT_COLUMNS[kind]
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([
+            json.dumps(row[column], ensure_ascii=False) if isinstance(row[column], (list, dict)) else row[column]
+            for column in columns
+        ])
@@ -0,0 +1,314 @@
+# dashboard/grouping.py
+
+import json
+import math
+from collections import defaultdict
+from django.contrib.auth import get_user_model
+from tutor.models import ChatSession
+
+GROUPING_MODES = ('heterogeneous', 'homogeneous')
+
+ERROR_KEY_MAP = {
+    "Erreurs de calcul": "calcul", "Erreurs de substitution": "substitution",
+    "Erreurs de procédure": "procedure", "Erreurs conceptuelles": "conceptuelle",
+}
+ERROR_KEYS = list(ERROR_KEY_MAP.values())
+
+# Penalties weigh far more than any feature distance, so constraints always come first
+CONSTRAINT_PENALTY = 1000.0
+MAX_IMPROVEMENT_PASSES = 50
+
+
+class GroupingError(ValueError):
+    """Raised when the requested grouping cannot be computed."""
+
+
+def build_student_profiles(teacher_class):
+    """
+    Returns the activity and error profile of each student of a class, in two queries.
+    """
+    students = get_user_model().objects.filter(groups=teacher_class).order_by('username').values_list('id', 'username')
+    profiles = {
+        student_id: {'id': student_id, 'username': username, 'sessions': 0, 'duration_minutes': 0.0,
+                     'errors': dict.fromkeys(ERROR_KEYS, 0)}
+        for student_id, username in students
+    }
+
+    sessions = ChatSession.objects.filter(student_id__in=profiles.keys()).values_list(
+        'student_id', 'start_time', 'end_time', 'summary_data'
+    )
+    for student_id, start_time, end_time, summary_data in sessions:
+        profile = profiles[student_id]
+        profile['sessions'] += 1
+        if end_time:
+            profile['duration_minutes'] += (end_time - start_time).total_seconds() / 60
+        if summary_data and 'error_analysis' in summary_data:
+            for error, count in summary_data['error_analysis'].items():
+                short_key = ERROR_KEY_MAP.get(error)
+                if short_key and isinstance(count, (int, float)):
+                    profile['errors'][short_key] += count
+
+    return list(profiles.values())
+
+
+def _raw_features(profile):
+    total_errors = sum(profile['errors'].values())
+    shares = [profile['errors'][key] / total_errors if total_errors else 0.0 for key in ERROR_KEYS]
+    errors_per_session = total_errors / profile['sessions'] if profile['sessions'] else 0.0
+    return shares + [errors_per_session, math.log1p(profile['duration_minutes']), math.log1p(profile['sessions'])]
+
+
+def _standardize(rows):
+    """Centers and scales each feature column, so that every dimension weighs the same."""
+    if not rows:
+        return rows
+    columns = list(zip(*rows))
+    means = [sum(column) / len(column) for column in columns]
+    stds = [math.sqrt(sum((value - mean) ** 2 for value in column) / len(column)) for column, mean in zip(columns, means)]
+    return [[(value - mean) / std if std else 0.0 for value, mean, std in zip(row, means, stds)] for row in rows]
+
+
+class _GroupState:
+    """Size, feature sum and sum of squared norms of a group, for O(d) objective updates."""
+    __slots__ = ('size', 'total', 'squares')
+
+    def __init__(self, dimensions):
+        self.size = 0
+        self.total = [0.0] * dimensions
+        self.squares = 0.0
+
+    def add(self, block, sign=1):
+        self.size += sign * block.size
+        self.total = [t + sign * v for t, v in zip(self.total, block.total)]
+        self.squares += sign * block.squares
+
+
+class _Block:
+    """Students that must stay together and move as one unit."""
+    __slots__ = ('index', 'members', 'size', 'total', 'squares', 'score', 'apart')
+
+    def __init__(self, index, members, vectors, scores):
+        self.index = index
+        self.members = members
+        self.size = len(members)
+        self.total = [sum(column) for column in zip(*(vectors[m] for m in members))]
+        self.squares = sum(sum(v * v for v in vectors[m]) for m in members)
+        self.score = sum(scores[m] for m in members) / self.size
+        self.apart = set()
+
+
+def _union_find_blocks(count, together_pairs):
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b in together_pairs:
+        parent[find(a)] = find(b)
+
+    blocks = defaultdict(list)
+    for i in range(count):
+        blocks[find(i)].append(i)
+    return sorted(blocks.values())
+
+
+def _resolve_names(groups_of_names, index_by_name):
+    """Turns lists of usernames into lists of indices, ignoring unknown names."""
+    resolved = []
+    for names in groups_of_names or []:
+        indices = sorted({index_by_name[name] for name in names if name in index_by_name})
+        if len(indices) > 1:
+            resolved.append(indices)
+    return resolved
+
+
+def compute_groups(profiles, num_groups, mode='heterogeneous', min_size=None, max_size=None,
+                   keep_together=None, keep_apart=None):
+    """
+    Splits students into `num_groups` groups from their profiles.
+
+    - 'heterogeneous' mode: each group mirrors the class (group means close to the class mean).
+    - 'homogeneous' mode: students with similar profiles are put together (minimal within-group spread).
+
+    `keep_together` and `keep_apart` are lists of lists of usernames. Returns a list of
+    groups, each a list of usernames. The result only depends on the inputs.
+    """
+    if mode not in GROUPING_MODES:
+        raise GroupingError(f"Unknown grouping mode: {mode}.")
+    count = len(profiles)
+    if num_groups < 1 or num_groups > max(count, 1):
+        raise GroupingError("The number of groups must be between 1 and the number of students.")
+    if count == 0:
+        return [[] for _ in range(num_groups)]
+
+    names = [profile['username'] for profile in profiles]
+    index_by_name = {name: i for i, name in enumerate(names)}
+    vectors = _standardize([_raw_features(profile) for profile in profiles])
+    dimensions = len(vectors[0])
+    # errors_per_session, duration and sessions: the last three columns
+    scores = [vector[-2] + vector[-1] - vector[-3] for vector in vectors]
+
+    blocks = [_Block(i, members, vectors, scores)
+              for i, members in enumerate(_union_find_blocks(count, [
+                  (group[0], other) for group in _resolve_names(keep_together, index_by_name) for other in group[1:]
+              ]))]
+    block_of = {member: block for block in blocks for member in block.members}
+    for group in _resolve_names(keep_apart, index_by_name):
+        for a in group:
+            for b in group:
+                if block_of[a] is block_of[b] and a != b:
+                    raise GroupingError(f"{names[a]} and {names[b]} must be both together and apart.")
+                if a != b:
+                    block_of[a].apart.add(block_of[b].index)
+
+    largest_block = max(block.size for block in blocks)
+    max_size = max(max_size or math.ceil(count / num_groups), largest_block)
+    min_size = min(min_size if min_size is not None else count // num_groups, max_size)
+    if max_size * num_groups < count:
+        raise GroupingError("The maximum group size is too small for this class.")
+
+    class_mean = [sum(column) / count for column in zip(*vectors)]
+
+    def group_cost(state):
+        cost = CONSTRAINT_PENALTY * max(0, min_size - state.size)
+        if state.size == 0:
+            return cost
+        if mode == 'heterogeneous':
+            # Distance between the group mean and the class mean, weighted by the size of the group
+            return cost + sum((t / state.size - m) ** 2 for t, m in zip(state.total, class_mean)) * state.size
+        # Within-group sum of squares
+        return cost + state.squares - sum(t * t for t in state.total) / state.size
+
+    def apart_conflicts(block, group_index):
+        return sum(1 for other in block.apart if assignment.get(other) == group_index)
+
+    states = [_GroupState(dimensions) for _ in range(num_groups)]
+    assignment = {}
+
+    # 1. Greedy construction: biggest and most constrained blocks first
+    for block in sorted(blocks, key=lambda b: (-b.size, -len(b.apart), b.score, b.index)):
+        best = None
+        for g, state in enumerate(states):
+            if state.size + block.size > max_size:
+                continue
+            before = group_cost(state)
+            state.add(block)
+            delta = group_cost(state) - before + CONSTRAINT_PENALTY * apart_conflicts(block, g)
+            state.add(block, -1)
+            if best is None or delta < best[0] - 1e-12:
+                best = (delta, g)
+        if best is None:
+            raise GroupingError("The size constraints cannot be satisfied.")
+        assignment[block.index] = best[1]
+        states[best[1]].add(block)
+
+    # 2. Local search: move or swap blocks while the objective improves
+    def move_delta(block, source, target, incoming=None):
+        src, dst = states[source], states[target]
+        before = group_cost(src) + group_cost(dst)
+        src.add(block, -1); dst.add(block)
+        if incoming:
+            dst.add(incoming, -1); src.add(incoming)
+        valid = src.size <= max_size and dst.size <= max_size
+        after = group_cost(src) + group_cost(dst)
+        if incoming:
+            dst.add(incoming); src.add(incoming, -1)
+        src.add(block); dst.add(block, -1)
+        return valid, after - before
+
+    for _ in range(MAX_IMPROVEMENT_PASSES):
+        improved = False
+        for block in blocks:
+            source = assignment[block.index]
+            for target in range(num_groups):
+                if target == source:
+                    continue
+                valid, delta = move_delta(block, source, target)
+                delta += CONSTRAINT_PENALTY * (apart_conflicts(block, target) - apart_conflicts(block, source))
+                if valid and delta < -1e-9:
+                    states[source].add(block, -1); states[target].add(block)
+                    assignment[block.index] = target
+                    improved = True
+                    break
+            source = assignment[block.index]
+            for other in blocks:
+                target = assignment[other.index]
+                if target == source or other.index <= block.index:
+                    continue
+                valid, delta = move_delta(block, source, target, incoming=other)
+                # Conflicts are counted after the swap (the swapped pair is not in conflict with itself)
+                assignment[block.index], assignment[other.index] = target, source
+                after = apart_conflicts(block, target) + apart_conflicts(other, source)
+                assignment[block.index], assignment[other.index] = source, target
+                before = apart_conflicts(block, source) + apart_conflicts(other, target)
+                delta += CONSTRAINT_PENALTY * (after - before)
+                if valid and delta < -1e-9:
+                    states[source].add(block, -1); states[target].add(block)
+                    states[target].add(other, -1); states[source].add(other)
+                    assignment[block.index], assignment[other.index] = target, source
+                    source = target
+                    improved = True
+        if not improved:
+            break
+
+    groups = [[] for _ in range(num_groups)]
+    for block in blocks:
+        groups[assignment[block.index]].extend(names[m] for m in block.members)
+    return [sorted(group) for group in groups]
+
+
+def describe_groups(groups, profiles):
+    """Summarizes each group (size, average activity, dominant error type) for the teacher."""
+    by_name = {profile['username']: profile for profile in profiles}
+    descriptions = []
+    for members in groups:
+        members_profiles = [by_name[name] for name in members if name in by_name]
+        size = len(members_profiles) or 1
+        errors = {key: sum(p['errors'][key] for p in members_profiles) for key in ERROR_KEYS}
+        dominant = max(errors, key=errors.get) if any(errors.values()) else None
+        descriptions.append({
+            'members': members,
+            'average_sessions': round(sum(p['sessions'] for p in members_profiles) / size, 1),
+            'average_minutes': round(sum(p['duration_minutes'] for p in members_profiles) / size),
+            'errors': errors,
+            'dominant_error': dominant,
+        })
+    return descriptions
+
+
+ERROR_LABELS = {
+    'calcul': "de calcul", 'substitution': "de substitution",
+    'procedure': "de procédure", 'conceptuelle': "conceptuelles",
+}
+MODE_LABELS = {'heterogeneous': "hétérogène", 'homogeneous': "homogène"}
+
+
+def format_groups_text(groups, profiles):
+    """Lists the groups with their key figures, in French, for the teacher."""
+    lines = []
+    for index, description in enumerate(describe_groups(groups, profiles), start=1):
+        line = (
+            f"Groupe {index} ({len(description['members'])} élèves) : {', '.join(description['members'])} — "
+            f"{description['average_sessions']} sessions et {description['average_minutes']} min en moyenne"
+        )
+        if description['dominant_error']:
+            line += f", erreurs surtout {ERROR_LABELS[description['dominant_error']]}"
+        lines.append(line + ".")
+    return "\n".join(lines)
+
+
+def build_class_digest(teacher_class):
+    """
+    Performance digest of a class for the grouping conversation: the student profiles
+    and their serialization for the prompt. It only contains plain data, to be cached.
+    """
+    profiles = build_student_profiles(teacher_class)
+    prompt_lines = [
+        f"- {p['username']}: {p['sessions']} sessions, {int(p['duration_minutes'])} min au total, "
+        f"erreurs: {json.dumps(p['errors'])}"
+        for p in profiles
+    ]
+    return {'class_name': teacher_class.name, 'profiles': profiles, 'prompt': "\n".join(prompt_lines)}
@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from dashboard.export import EXPORT_KINDS, EXPORT_FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Exporte les données de recherche (sessions, messages, résumés, analyses) en CSV ou JSON Lines, en flux."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=EXPORT_KINDS, help="Type de données à exporter.")
+        parser.add_argument('--format', dest='export_format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', '-o', help="Fichier de sortie (sortie standard par défaut).")
+        parser.add_argument('--class-id', default='')
+        parser.add_argument('--student-id', default='')
+        parser.add_argument('--document-id', default='')
+        parser.add_argument('--status', choices=['', 'in-progress', 'completed'], default='')
+        parser.add_argument('--date-from', default='', help="Date de début (AAAA-MM-JJ).")
+        parser.add_argument('--date-to', default='', help="Date de fin (AAAA-MM-JJ).")
+        parser.add_argument('--pseudonymize', action='store_true', help="Remplace les noms d'utilisateur par des pseudonymes.")
+        parser.add_argument('--salt', help="Clé des pseudonymes (SECRET_KEY par défaut), à réutiliser pour joindre plusieurs exports.")
+
+    def handle(self, *args, **options):
+        filters = {key: str(options[key]) for key in ('class_id', 'student_id', 'document_id', 'status', 'date_from', 'date_to')}
+        lines = stream_export(
+            options['kind'], options['export_format'],
+            filters=filters, pseudonymize=options['pseudonymize'], salt=options['salt'],
+        )
+
+        output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            count = 0
+            for line in lines:
+                output.write(line)
+                count += 1
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            self.stderr.write(self.style.SUCCESS(f"{count} lignes écrites dans {options['output']}."))
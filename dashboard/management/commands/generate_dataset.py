@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.synthetic import DEFAULT_OPTIONS, DatasetError, delete_dataset, generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère une école synthétique (classes, élèves, sessions, messages, résumés et analyses) "
+        "sur les exercices du programme, pour les tests de charge. Même graine, mêmes données."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classes', type=int, default=DEFAULT_OPTIONS['classes'])
+        parser.add_argument('--students', type=int, default=DEFAULT_OPTIONS['students'], help="Nombre total d'élèves.")
+        parser.add_argument('--sessions', type=int, default=DEFAULT_OPTIONS['sessions'], help="Nombre total de sessions.")
+        parser.add_argument('--messages', type=float, default=DEFAULT_OPTIONS['messages'], help="Nombre moyen de messages par session.")
+        parser.add_argument('--image-rate', type=float, default=DEFAULT_OPTIONS['image_rate'], help="Part des messages d'élèves avec une image.")
+        parser.add_argument('--image-size', type=int, default=DEFAULT_OPTIONS['image_size'], help="Taille des images en octets (0 : aucune image).")
+        parser.add_argument('--summary-rate', type=float, default=DEFAULT_OPTIONS['summary_rate'], help="Part des sessions terminées avec un résumé.")
+        parser.add_argument('--analysis-rate', type=float, default=DEFAULT_OPTIONS['analysis_rate'], help="Part des résumés analysés par un enseignant.")
+        parser.add_argument('--ongoing-rate', type=float, default=DEFAULT_OPTIONS['ongoing_rate'], help="Part des sessions encore en cours.")
+        parser.add_argument('--days', type=int, default=DEFAULT_OPTIONS['days'], help="Période couverte par les sessions, en jours.")
+        parser.add_argument('--seed', type=int, default=DEFAULT_OPTIONS['seed'])
+        parser.add_argument('--prefix', default=DEFAULT_OPTIONS['prefix'], help="Préfixe des noms d'utilisateurs et de classes générés.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_OPTIONS['batch_size'])
+        parser.add_argument('--replace', action='store_true', help="Supprime d'abord les données générées avec le même préfixe.")
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        if options['replace']:
+            deleted = delete_dataset(options['prefix'])
+            self.stderr.write(f"{deleted} lignes supprimées.")
+
+        settings = {key: options[key] for key in DEFAULT_OPTIONS}
+        try:
+            for event in generate_dataset(**settings):
+                if event['stage'] == 'users':
+                    self.stderr.write(
+                        f"{event['classes']} classes, {event['teachers']} enseignants, {event['students']} élèves créés."
+                    )
+                elif event['stage'] == 'sessions':
+                    self.stderr.write(
+                        f"\rSessions : {event['done']}/{event['total']} ({event['messages']} messages)", ending=''
+                    )
+                elif event['stage'] == 'done':
+                    self.stderr.write("")
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{event['sessions']} sessions et {event['messages']} messages générés "
+                        f"en {time.monotonic() - start:.0f} s."
+                    ))
+        except DatasetError as e:
+            raise CommandError(str(e))
@@ -0,0 +1,40 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.roster import ROSTER_FORMATS, RosterError, parse_roster, import_roster
+
+
+class Command(BaseCommand):
+    help = "Importe une liste d'élèves (CSV ou JSON avec les colonnes username, password, class) en une seule fois."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier de la liste d'élèves.")
+        parser.add_argument('--format', dest='roster_format', choices=ROSTER_FORMATS, help="Format du fichier (déduit de l'extension par défaut).")
+        parser.add_argument('--create-classes', action='store_true', help="Crée les classes qui n'existent pas encore.")
+        parser.add_argument('--workers', type=int, help="Nombre de processus pour le hachage des mots de passe (ROSTER_HASHING_WORKERS par défaut, au plus un par cœur).")
+
+    def handle(self, *args, **options):
+        roster_format = options['roster_format'] or ('json' if options['path'].lower().endswith('.json') else 'csv')
+        if not os.path.exists(options['path']):
+            raise CommandError(f"Fichier introuvable : {options['path']}")
+        with open(options['path'], encoding='utf-8') as roster_file:
+            content = roster_file.read()
+
+        try:
+            for event in import_roster(parse_roster(content, roster_format), options['create_classes'], options['workers']):
+                if event['stage'] == 'validated':
+                    self.stderr.write(f"{event['total']} élèves à importer.")
+                elif event['stage'] == 'hashing':
+                    self.stderr.write(f"\rMots de passe : {event['done']}/{event['total']}", ending='')
+                elif event['stage'] == 'done':
+                    self.stderr.write("")
+                    if event['classes_created']:
+                        self.stderr.write(f"Classes créées : {', '.join(event['classes_created'])}")
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{event['created']} élèves créés, dont {event['assigned']} assignés à une classe."
+                    ))
+        except RosterError as e:
+            for error in e.errors:
+                self.stderr.write(f"Ligne {error['line']} : {error['error']}" if error['line'] else error['error'])
+            raise CommandError(f"Import annulé : {len(e.errors)} erreur(s), aucun élève n'a été créé.")
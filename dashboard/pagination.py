@@ -0,0 +1,118 @@
+# dashboard/pagination.py
+
+import base64
+import json
+from datetime import datetime, time
+from django.contrib.auth import get_user_model
+from django.db.models import Q, Count, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from documents.models import Category
+from tutor.models import ChatMessage
+
+SESSION_PAGE_SIZE = 50
+MAX_SESSION_PAGE_SIZE = 200
+
+
+def encode_cursor(session):
+    """Encodes the position of a session in the (start_time, id) ordering."""
+    raw = json.dumps([session.start_time.isoformat(), session.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decodes a cursor created by `encode_cursor`. Returns None if it is invalid."""
+    try:
+        start_time, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        start_time = parse_datetime(start_time)
+        if start_time is None:
+            return None
+        return start_time, int(session_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def _day_bound(value, end_of_day=False):
+    day = parse_date(value or '')
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.max if end_of_day else time.min))
+
+
+def filter_sessions(sessions, params):
+    """
+    Applies the session list filters found in `params` (usually request.GET).
+    Returns the filtered queryset and the cleaned filter values for the template.
+    """
+    filters = {
+        'class_id': params.get('class_id', ''),
+        'student_id': params.get('student_id', ''),
+        'document_id': params.get('document_id', ''),
+        'category_id': params.get('category_id', ''),
+        'status': params.get('status', ''),
+        'date_from': params.get('date_from', ''),
+        'date_to': params.get('date_to', ''),
+    }
+
+    if filters['class_id'].isdigit():
+        # Subquery on the membership table, so that a student in several classes is not duplicated
+        memberships = get_user_model().groups.through.objects.filter(group_id=filters['class_id'])
+        sessions = sessions.filter(student_id__in=memberships.values('user_id'))
+    if filters['student_id'].isdigit():
+        sessions = sessions.filter(student_id=filters['student_id'])
+    if filters['document_id'].isdigit():
+        sessions = sessions.filter(document_id=filters['document_id'])
+    if filters['category_id'].isdigit():
+        # Every exercise under the category, at any depth, with one prefix match on the materialized path
+        path = Category.objects.filter(pk=filters['category_id']).values_list('path', flat=True).first()
+        sessions = sessions.filter(document__category__path__startswith=path) if path else sessions.none()
+    if filters['status'] == 'in-progress':
+        sessions = sessions.filter(end_time__isnull=True)
+    elif filters['status'] == 'completed':
+        sessions = sessions.filter(end_time__isnull=False)
+
+    date_from = _day_bound(filters['date_from'])
+    if date_from:
+        sessions = sessions.filter(start_time__gte=date_from)
+    date_to = _day_bound(filters['date_to'], end_of_day=True)
+    if date_to:
+        sessions = sessions.filter(start_time__lte=date_to)
+
+    return sessions, filters
+
+
+def with_message_count(sessions):
+    """
+    Annotates the number of messages of each session. A correlated subquery is used
+    rather than a JOIN + GROUP BY so that it is only evaluated for the rows of the page.
+    """
+    message_count = ChatMessage.objects.filter(session=OuterRef('pk')).order_by().values('session').annotate(
+        count=Count('pk')
+    ).values('count')
+    return sessions.annotate(message_count=Coalesce(Subquery(message_count, output_field=IntegerField()), 0))
+
+
+def paginate_sessions(sessions, cursor=None, page_size=SESSION_PAGE_SIZE):
+    """
+    Returns one page of sessions, newest first, and the cursor of the next page (or None).
+    Keyset pagination on (start_time, id): the cost of a page does not depend on
+    how many sessions come before it.
+    """
+    sessions = sessions.order_by('-start_time', '-id')
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        start_time, session_id = position
+        sessions = sessions.filter(Q(start_time__lt=start_time) | Q(start_time=start_time, id__lt=session_id))
+
+    page = list(sessions[:page_size + 1])
+    next_cursor = encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+    return page[:page_size], next_cursor
+
+
+def get_page_size(params):
+    """Reads the requested page size, bounded to a sensible maximum."""
+    try:
+        return max(1, min(int(params.get('page_size', SESSION_PAGE_SIZE)), MAX_SESSION_PAGE_SIZE))
+    except ValueError:
+        return SESSION_PAGE_SIZE
@@ -0,0 +1,206 @@
+# dashboard/roster.py
+
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from users.roles import TEACHERS_GROUP
+from .cache import bump_class_version
+
+ROSTER_FORMATS = ('csv', 'json')
+ROSTER_COLUMNS = ('username', 'password', 'class')
+
+# Below this size, starting worker processes costs more than hashing in place
+PARALLEL_HASHING_THRESHOLD = 20
+HASHING_CHUNK_SIZE = 25
+BULK_BATCH_SIZE = 500
+MEMBERS_PAGE_SIZE = 200
+
+
+class RosterError(ValueError):
+    """Raised when a roster file is invalid. `errors` lists the problems, line by line."""
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} error(s) in the roster.")
+        self.errors = errors
+
+
+def parse_roster(content, roster_format):
+    """
+    Reads a roster file (text) into a list of rows with the keys username, password and class,
+    plus the line (CSV) or item number (JSON) of each row for error reporting.
+    CSV files need a header line; JSON files hold a list of objects.
+    """
+    if roster_format == 'json':
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise RosterError([{'line': None, 'error': f"Invalid JSON: {e}"}])
+        if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+            raise RosterError([{'line': None, 'error': "The JSON file must contain a list of objects."}])
+        numbered = [(number, item) for number, item in enumerate(data, start=1)]
+    else:
+        reader = csv.DictReader(io.StringIO(content.lstrip('\ufeff')))
+        if not reader.fieldnames or 'username' not in reader.fieldnames:
+            raise RosterError([{'line': 1, 'error': f"The CSV header must contain the columns {', '.join(ROSTER_COLUMNS)}."}])
+        numbered = [(reader.line_num, row) for row in reader]
+
+    return [
+        {'line': number, **{column: str(row.get(column) or '').strip() for column in ROSTER_COLUMNS}}
+        for number, row in numbered
+    ]
+
+
+def validate_roster(rows, create_classes=False):
+    """
+    Checks the whole roster before anything is written, in two queries.
+    Returns the classes by name (existing ones only); raises RosterError listing every problem.
+    """
+    errors = []
+    seen = {}
+    for row in rows:
+        line = row.get('line')
+        if not row['username']:
+            errors.append({'line': line, 'error': "The username is required."})
+        elif row['username'] in seen:
+            errors.append({'line': line, 'error': f"Duplicate username {row['username']} (line {seen[row['username']]})."})
+        else:
+            seen[row['username']] = line
+        if not row['password']:
+            errors.append({'line': line, 'error': "The password is required."})
+        if row['class'] == TEACHERS_GROUP:
+            errors.append({'line': line, 'error': f"Students cannot be added to {TEACHERS_GROUP}."})
+
+    existing = get_user_model().objects.filter(username__in=seen.keys()).values_list('username', flat=True)
+    for username in existing:
+        errors.append({'line': seen[username], 'error': f"The user {username} already exists."})
+
+    class_names = {row['class'] for row in rows if row['class']}
+    classes = {group.name: group for group in Group.objects.filter(name__in=class_names)}
+    if not create_classes:
+        for row in rows:
+            if row['class'] and row['class'] not in classes:
+                errors.append({'line': row.get('line'), 'error': f"Unknown class {row['class']}."})
+
+    if errors:
+        raise RosterError(sorted(errors, key=lambda error: error['line'] or 0))
+    return classes
+
+
+def _init_hashing_worker():
+    # Workers started with the 'spawn' method do not inherit the loaded Django apps
+    from django.apps import apps
+    if not apps.ready:
+        import django
+        django.setup()
+
+
+def _available_cpus():
+    # The CPUs this process may run on; on a PaaS os.cpu_count() reports the whole host
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hashes passwords with the configured hasher, in a process pool for large rosters.
+    The pool has `workers` processes (ROSTER_HASHING_WORKERS by default), at most one per available CPU.
+    Yields progress events while hashing and returns the hashes (use `yield from`).
+    """
+    total = len(passwords)
+    workers = min(workers or settings.ROSTER_HASHING_WORKERS, _available_cpus())
+    if total < PARALLEL_HASHING_THRESHOLD or workers <= 1:
+        hashed = map(make_password, passwords)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_hashing_worker)
+        hashed = executor.map(make_password, passwords, chunksize=HASHING_CHUNK_SIZE)
+
+    hashes = []
+    try:
+        for value in hashed:
+            hashes.append(value)
+            if len(hashes) % HASHING_CHUNK_SIZE == 0 or len(hashes) == total:
+                yield {'stage': 'hashing', 'done': len(hashes), 'total': total}
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+    return hashes
+
+
+def import_roster(rows, create_classes=False, workers=None):
+    """
+    Creates the students of a roster and their class memberships.
+
+    The roster is validated first, passwords are hashed in parallel, then users and
+    memberships are inserted with bulk_create in one transaction. This generator
+    yields progress events (dicts with a 'stage' key); the last one reports the result.
+    """
+    classes = validate_roster(rows, create_classes)
+    total = len(rows)
+    yield {'stage': 'validated', 'total': total}
+
+    hashes = yield from hash_passwords([row['password'] for row in rows], workers)
+
+    User = get_user_model()
+    with transaction.atomic():
+        missing_classes = sorted({row['class'] for row in rows if row['class']} - classes.keys())
+        for name in missing_classes:
+            classes[name] = Group.objects.create(name=name)
+
+        User.objects.bulk_create(
+            [User(username=row['username'], password=hashed) for row, hashed in zip(rows, hashes)],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        # Some backends do not return the primary keys of bulk-created rows
+        user_ids = dict(User.objects.filter(username__in=[row['username'] for row in rows]).values_list('username', 'id'))
+
+        Membership = User.groups.through
+        Membership.objects.bulk_create(
+            [Membership(user_id=user_ids[row['username']], group_id=classes[row['class']].id) for row in rows if row['class']],
+            batch_size=BULK_BATCH_SIZE,
+        )
+
+    bump_class_version(*(group.id for group in classes.values()))
+    yield {
+        'stage': 'done',
+        'created': total,
+        'classes_created': missing_classes,
+        'assigned': sum(1 for row in rows if row['class']),
+    }
+
+
+def classes_with_counts():
+    """Every class with its number of members, in one query."""
+    return Group.objects.exclude(name=TEACHERS_GROUP).annotate(member_count=Count('user')).order_by('name')
+
+
+def _students_page(students, after, limit):
+    """Keyset page of students ordered by username (unique and indexed). Returns (students, next_after)."""
+    if after:
+        students = students.filter(username__gt=after)
+    page = list(students.order_by('username').values('id', 'username')[:limit + 1])
+    if len(page) > limit:
+        return page[:limit], page[limit - 1]['username']
+    return page, None
+
+
+def class_members(class_id, after=None, limit=MEMBERS_PAGE_SIZE):
+    """Members of a class, one page at a time."""
+    return _students_page(get_user_model().objects.filter(groups__id=class_id), after, limit)
+
+
+def unassigned_students(after=None, limit=MEMBERS_PAGE_SIZE):
+    """
+    Users without any group membership, one page at a time. The anti-join only reads the
+    indexed user-group table, so its cost does not depend on the number of sessions or messages.
+    Teachers are members of the teachers group, so they are never listed.
+    """
+    User = get_user_model()
+    memberships = User.groups.through.objects.filter(user_id=OuterRef('pk'))
+    return _students_page(User.objects.filter(~Exists(memberships)), after, limit)
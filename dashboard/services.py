@@ -1,14 +1,25 @@
 # dashboard/services.py
 
 import json
+from datetime import timedelta
+from django.db.models import Count, Min
+from django.utils import timezone
 from openai import OpenAI
+from core import metrics
+from core.llm import chat_completion
 from tutor.models import ChatSession
+from .cache import bump_student_classes, bump_agreement_version
+
+# Ended sessions still without a summary after this long are counted in the backlog
+SUMMARY_BACKLOG_WINDOW = timedelta(days=1)
 
 def generate_and_save_session_summary(session_id):
     """
     Generates a summary for a given chat session using OpenAI and saves it to the database.
     This function is designed to be run in the background so as not to block the main request.
     """
+    metrics.inc('catalyst_summaries_in_progress')
+    metrics.flush()
     try:
         session = ChatSession.objects.get(id=session_id)
         
@@ -45,10 +56,29 @@ def generate_and_save_session_summary(session_id):
         """
 
         client = OpenAI()
-        response = client.chat.completions.create(model="gpt-4o", messages=[{"role": "system", "content": prompt}], response_format={"type": "json_object"})
+        response = chat_completion(client, 'summary', model="gpt-4o", messages=[{"role": "system", "content": prompt}], response_format={"type": "json_object"})
         summary_data = json.loads(response.choices[0].message.content)
         session.summary_data = summary_data
         session.save()
+        bump_student_classes(session.student_id)
+        bump_agreement_version()
+        metrics.inc('catalyst_summaries_total', {'outcome': 'success'})
 
     except Exception as e:
-        print(f"Error during automatic summary generation for session {session_id}: {e}")
\ No newline at end of file
+        print(f"Error during automatic summary generation for session {session_id}: {e}")
+        metrics.inc('catalyst_summaries_total', {'outcome': 'error'})
+    finally:
+        metrics.inc('catalyst_summaries_in_progress', amount=-1)
+        metrics.flush()
+
+
+def summary_backlog(window=SUMMARY_BACKLOG_WINDOW):
+    """
+    (number, age in seconds of the oldest) of the sessions ended without a summary, among
+    those started in the last `window`: older ones are not retried, they would hide a new backlog.
+    """
+    backlog = ChatSession.objects.filter(
+        start_time__gte=timezone.now() - window, end_time__isnull=False, summary_data__isnull=True
+    ).aggregate(count=Count('id'), oldest=Min('end_time'))
+    age = (timezone.now() - backlog['oldest']).total_seconds() if backlog['oldest'] else 0
+    return backlog['count'], age
\ No newline at end of file
@@ -0,0 +1,150 @@
+// /static/dashboard/agreement.js
+document.addEventListener('DOMContentLoaded', () => {
+    const container = document.getElementById('agreementContainer');
+    const windowSelect = document.getElementById('windowSelect');
+    if (!container || !windowSelect) return;
+
+    let trendChart = null;
+
+    const categoryLabels = {
+        calcul: 'Calcul',
+        substitution: 'Substitution',
+        procedure: 'Procédure',
+        conceptuelle: 'Conceptuelle',
+        autre: 'Autre',
+        aucune: 'Aucune'
+    };
+
+    const formatRate = (value) => `${Math.round(value * 100)} %`;
+    const formatKappa = (value) => value === null ? '—' : value.toFixed(2);
+    const escapeHtml = (text) => String(text).replace(/[&<>"']/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' })[c]);
+
+    const renderStats = (overall) => `
+        <div class="agreement-summary">
+            <div class="agreement-stat"><div class="value">${overall.sessions}</div>Sessions co-analysées</div>
+            <div class="agreement-stat"><div class="value">${formatRate(overall.exact_agreement)}</div>Diagnostics identiques</div>
+            <div class="agreement-stat"><div class="value">${formatRate(overall.dominant.agreement)}</div>Même erreur principale</div>
+            <div class="agreement-stat"><div class="value">${formatKappa(overall.dominant.kappa)}</div>Kappa (erreur principale)</div>
+        </div>`;
+
+    const renderCategories = (data) => {
+        const rows = data.categories.map(key => {
+            const category = data.overall.categories[key];
+            const [[neither, teacherOnly], [aiOnly, both]] = category.confusion;
+            return `<tr>
+                <td>${categoryLabels[key]}</td>
+                <td>${formatRate(category.agreement)}</td>
+                <td>${formatKappa(category.kappa)}</td>
+                <td>${both}</td><td>${aiOnly}</td><td>${teacherOnly}</td><td>${neither}</td>
+            </tr>`;
+        }).join('');
+        return `
+            <div class="agreement-section">
+                <h3><i class="fas fa-th"></i> Accord par type d'erreur</h3>
+                <table class="agreement-table">
+                    <thead><tr>
+                        <th>Type d'erreur</th><th>Accord</th><th>Kappa</th>
+                        <th>Relevée par les deux</th><th>IA seulement</th><th>Professeur seulement</th><th>Aucun des deux</th>
+                    </tr></thead>
+                    <tbody>${rows}</tbody>
+                </table>
+            </div>`;
+    };
+
+    const renderDominantMatrix = (data) => {
+        const labels = data.dominant_labels;
+        const header = labels.map(label => `<th>${categoryLabels[label]}</th>`).join('');
+        const rows = data.overall.dominant.confusion.map((row, i) =>
+            `<tr><td>${categoryLabels[labels[i]]}</td>${row.map((count, j) =>
+                `<td style="${i === j ? 'font-weight: 700; background-color: #eaf6ee;' : ''}">${count}</td>`
+            ).join('')}</tr>`
+        ).join('');
+        return `
+            <div class="agreement-section">
+                <h3><i class="fas fa-table"></i> Erreur principale : IA (lignes) / Professeur (colonnes)</h3>
+                <table class="agreement-table">
+                    <thead><tr><th></th>${header}</tr></thead>
+                    <tbody>${rows}</tbody>
+                </table>
+            </div>`;
+    };
+
+    const renderBreakdown = (title, icon, items) => {
+        const rows = items.map(item => `<tr>
+            <td>${escapeHtml(item.name)}</td>
+            <td>${item.sessions}</td>
+            <td>${formatRate(item.exact_agreement)}</td>
+            <td>${formatRate(item.dominant.agreement)}</td>
+            <td>${formatKappa(item.dominant.kappa)}</td>
+        </tr>`).join('');
+        return `
+            <div class="agreement-section">
+                <h3><i class="fas ${icon}"></i> ${title}</h3>
+                <table class="agreement-table">
+                    <thead><tr><th></th><th>Sessions</th><th>Diagnostics identiques</th><th>Même erreur principale</th><th>Kappa</th></tr></thead>
+                    <tbody>${rows}</tbody>
+                </table>
+            </div>`;
+    };
+
+    const createTrendChart = (byWindow) => {
+        if (trendChart) trendChart.destroy();
+        const ctx = document.getElementById('agreementTrendChart').getContext('2d');
+        trendChart = new Chart(ctx, {
+            type: 'line',
+            data: {
+                labels: byWindow.map(item => item.window),
+                datasets: [
+                    {
+                        label: 'Taux de divergence',
+                        data: byWindow.map(item => item.divergence_rate),
+                        borderColor: '#e74c3c',
+                        backgroundColor: 'rgba(231, 76, 60, 0.1)',
+                        fill: true
+                    },
+                    {
+                        label: 'Kappa (erreur principale)',
+                        data: byWindow.map(item => item.dominant.kappa),
+                        borderColor: '#3498db',
+                        fill: false
+                    }
+                ]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                scales: { y: { suggestedMin: 0, suggestedMax: 1 } }
+            }
+        });
+    };
+
+    const fetchData = async () => {
+        container.innerHTML = '<div class="spinner" style="margin: 50px auto;"></div>';
+        try {
+            const response = await fetch(`${window.AGREEMENT_CONFIG.apiUrl}?window=${windowSelect.value}`);
+            const data = await response.json();
+            if (data.error) throw new Error(data.error);
+
+            if (!data.overall) {
+                container.innerHTML = `<p class="empty-state"><i class="fas fa-info-circle"></i> Aucune session n'a encore été co-analysée.</p>`;
+                return;
+            }
+
+            container.innerHTML = renderStats(data.overall)
+                + `<div class="agreement-section">
+                        <h3><i class="fas fa-chart-line"></i> Évolution de la divergence</h3>
+                        <div class="chart-wrapper"><canvas id="agreementTrendChart"></canvas></div>
+                   </div>`
+                + renderCategories(data)
+                + renderDominantMatrix(data)
+                + renderBreakdown('Par classe', 'fa-users', data.by_class)
+                + renderBreakdown('Par professeur', 'fa-chalkboard-teacher', data.by_teacher);
+            createTrendChart(data.by_window);
+        } catch (error) {
+            container.innerHTML = `<p style="color: red; text-align: center;">Erreur lors du chargement des données : ${error.message}</p>`;
+        }
+    };
+
+    windowSelect.addEventListener('change', fetchData);
+    fetchData();
+});
@@ -7,6 +7,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const finalizeBtn = document.getElementById('finalizeGroupsBtn');
     const saveManualBtn = document.getElementById('saveManualGroupsBtn');
     const numGroupsInput = document.getElementById('numGroupsInput');
+    const groupingModeInput = document.getElementById('groupingModeInput');
     const chatbox = document.getElementById('groupCreatorChatbox');
     const messageInput = document.getElementById('groupCreatorInput');
     const configStep = document.getElementById('groupConfigStep');
@@ -16,6 +17,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const groupColumnsContainerEl = document.getElementById('groupColumnsContainer');
 
     let chatHistory = [];
+    // Répartition proposée, renvoyée par le serveur ; l'historique de la conversation est conservé côté serveur
+    let currentGroups = null;
+    let conversationId = null;
 
     const getSelectedClassId = () => {
         return document.getElementById('class_id').value;
@@ -47,13 +51,15 @@ document.addEventListener('DOMContentLoaded', () => {
     };
 
     // --- LOGIQUE API ---
-    const callGroupCreatorAPI = async () => {
+    const callGroupCreatorAPI = async (message = null) => {
         sendBtn.disabled = true;
         messageInput.disabled = true;
         displayLoading(true);
-        
-        const classId = getSelectedClassId();
-        const numGroups = numGroupsInput.value;
+
+        // Le premier appel ouvre la conversation, les suivants n'envoient que le nouveau message
+        const payload = conversationId
+            ? { conversation_id: conversationId, message }
+            : { class_id: getSelectedClassId(), num_groups: numGroupsInput.value, mode: groupingModeInput.value };
 
         try {
             const response = await fetch(window.GROUP_CREATOR_CONFIG.apiUrl, {
@@ -62,33 +68,16 @@ document.addEventListener('DOMContentLoaded', () => {
                     'Content-Type': 'application/json',
                     'X-CSRFToken': window.GROUP_CREATOR_CONFIG.csrfToken
                 },
-                body: JSON.stringify({
-                    class_id: classId,
-                    num_groups: numGroups,
-                    messages: chatHistory
-                })
+                body: JSON.stringify(payload)
             });
             const data = await response.json();
             if (data.error) throw new Error(data.error);
 
-            // Détecter si la réponse de l'IA est le JSON final
-            try {
-                const finalGroups = JSON.parse(data.reply);
-                if (finalGroups.groups) {
-                    chatHistory.push({ role: 'assistant', content: "Voici la répartition finale des groupes. Vous pouvez la valider." });
-                    finalizeBtn.style.display = 'block';
-                    finalizeBtn.onclick = async () => {
-                        const configName = prompt("Donnez un nom à cette configuration de groupes (ex: Projet Volcans):");
-                        if (configName) {
-                            await saveGroups(configName, finalGroups.groups);
-                            window.location.reload(); // Recharger pour voir les groupes
-                        }
-                    };
-                    sendBtn.style.display = 'none';
-                    messageInput.style.display = 'none';
-                }
-            } catch (e) {
-                // Ce n'est pas le JSON final, c'est un message normal
+            // Le serveur renvoie toujours une répartition, que l'enseignant peut valider à tout moment
+            conversationId = data.conversation_id;
+            if (data.groups) {
+                currentGroups = data.groups;
+                finalizeBtn.style.display = 'block';
             }
 
             chatHistory.push({ role: 'assistant', content: data.reply });
@@ -106,7 +95,19 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
+    finalizeBtn.addEventListener('click', async () => {
+        if (!currentGroups) return;
+        const configName = prompt("Donnez un nom à cette configuration de groupes (ex: Projet Volcans):");
+        if (configName) {
+            await saveGroups(configName, currentGroups);
+            window.location.reload(); // Recharger pour voir les groupes
+        }
+    });
+
     startBtn.addEventListener('click', () => {
+        chatHistory = [];
+        currentGroups = null;
+        conversationId = null;
         configStep.style.display = 'none';
         chatStep.style.display = 'block';
         callGroupCreatorAPI(); // Premier appel pour obtenir la suggestion initiale
@@ -120,7 +121,7 @@ document.addEventListener('DOMContentLoaded', () => {
         chatHistory.push({ role: 'user', content: userMessage });
         renderGroupChat();
         messageInput.value = '';
-        callGroupCreatorAPI();
+        callGroupCreatorAPI(userMessage);
     });
 
     messageInput.addEventListener('keydown', (e) => {
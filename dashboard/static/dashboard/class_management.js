@@ -2,7 +2,9 @@ document.addEventListener('DOMContentLoaded', () => {
     // --- MODAL HANDLING ---
     const studentModal = document.getElementById('studentModal');
     const moveStudentModal = document.getElementById('moveStudentModal');
-    const modals = [studentModal, moveStudentModal];
+    const importRosterModal = document.getElementById('importRosterModal');
+    const moveClassModal = document.getElementById('moveClassModal');
+    const modals = [studentModal, moveStudentModal, importRosterModal, moveClassModal];
 
     modals.forEach(modal => {
         if (!modal) return;
@@ -81,6 +83,33 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
+    document.querySelectorAll('.move-class-btn').forEach(btn => {
+        btn.addEventListener('click', (e) => {
+            const classCard = e.target.closest('.class-card');
+            document.getElementById('moveClassId').value = classCard.dataset.classId;
+            document.getElementById('moveClassName').textContent = classCard.querySelector('.class-name').textContent;
+            moveClassModal.style.display = 'block';
+        });
+    });
+
+    document.getElementById('moveClassForm').addEventListener('submit', (e) => {
+        e.preventDefault();
+        const formData = new FormData(e.target);
+
+        // Un seul appel pour toute la classe, même si tous ses élèves ne sont pas encore affichés
+        fetch(studentBulkActionUrl, {
+            method: 'POST',
+            headers: { 'X-CSRFToken': csrfToken, 'Content-Type': 'application/json' },
+            body: JSON.stringify({ action: 'move', from_class_id: formData.get('class_id'), target_class_id: formData.get('target_class_id') })
+        })
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) throw new Error(data.error || 'Une erreur est survenue.');
+                window.location.reload();
+            })
+            .catch(err => alert(`Erreur : ${err.message}`));
+    });
+
     // --- STUDENT ACTIONS ---
     document.getElementById('addStudentBtn').addEventListener('click', () => {
         document.getElementById('studentForm').reset();
@@ -96,16 +125,139 @@ document.addEventListener('DOMContentLoaded', () => {
             .catch(err => alert(`Erreur : ${err.message}`));
     });
 
-    document.querySelectorAll('.move-student-btn').forEach(btn => {
-        btn.addEventListener('click', (e) => {
-            const studentItem = e.target.closest('.student-item');
-            const studentId = studentItem.dataset.studentId;
-            const studentName = studentItem.querySelector('span').textContent.trim();
+    // --- ROSTER IMPORT ---
+    const importStatus = document.getElementById('importRosterStatus');
+
+    document.getElementById('importRosterBtn').addEventListener('click', () => {
+        document.getElementById('importRosterForm').reset();
+        importStatus.innerHTML = '';
+        importRosterModal.style.display = 'block';
+    });
+
+    document.getElementById('importRosterForm').addEventListener('submit', async (e) => {
+        e.preventDefault();
+        const submitBtn = e.target.querySelector('button[type="submit"]');
+        submitBtn.disabled = true;
+        importStatus.textContent = 'Vérification du fichier...';
+
+        try {
+            const response = await fetch(studentImportUrl, {
+                method: 'POST',
+                headers: { 'X-CSRFToken': csrfToken },
+                body: new FormData(e.target)
+            });
+            if (!response.ok) {
+                const errorData = await response.json();
+                const list = document.createElement('ul');
+                (errorData.errors || []).forEach(err => {
+                    const li = document.createElement('li');
+                    li.textContent = `${err.line ? `Ligne ${err.line} : ` : ''}${err.error}`;
+                    list.appendChild(li);
+                });
+                importStatus.innerHTML = `<p style="color: red;"></p>`;
+                importStatus.firstChild.textContent = errorData.error;
+                importStatus.appendChild(list);
+                return;
+            }
+
+            // La progression arrive ligne par ligne (JSON Lines)
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.filter(line => line).forEach(line => {
+                    const event = JSON.parse(line);
+                    if (event.stage === 'hashing') {
+                        importStatus.textContent = `Création des comptes : ${event.done}/${event.total}`;
+                    } else if (event.stage === 'done') {
+                        importStatus.textContent = `${event.created} élèves importés.`;
+                        window.location.reload();
+                    } else if (event.stage === 'error') {
+                        importStatus.innerHTML = `<p style="color: red;"></p>`;
+                        importStatus.firstChild.textContent = `Erreur : ${event.error}`;
+                    }
+                });
+            }
+        } catch (err) {
+            importStatus.innerHTML = `<p style="color: red;">Erreur : ${err.message}</p>`;
+        } finally {
+            submitBtn.disabled = false;
+        }
+    });
+
+    // --- CHARGEMENT DES ÉLÈVES (à l'affichage de chaque carte) ---
+    function createStudentItem(student) {
+        const li = document.createElement('li');
+        li.className = 'student-item';
+        li.dataset.studentId = student.id;
+        li.innerHTML = `
+            <span><i class="fas fa-user"></i> </span>
+            <div class="student-actions">
+                <button class="icon-btn move-student-btn" title="Déplacer"><i class="fas fa-random"></i></button>
+                <button class="icon-btn delete-student-btn" title="Supprimer"><i class="fas fa-user-minus"></i></button>
+            </div>`;
+        li.querySelector('span').append(student.username);
+        return li;
+    }
 
+    async function loadMembers(list, after = null) {
+        const url = after ? `${list.dataset.membersUrl}?after=${encodeURIComponent(after)}` : list.dataset.membersUrl;
+        try {
+            const response = await fetch(url);
+            const data = await response.json();
+            if (data.error) throw new Error(data.error);
+
+            list.querySelector('.load-more-item')?.remove();
+            data.students.forEach(student => list.appendChild(createStudentItem(student)));
+            if (data.next_after) {
+                const more = document.createElement('li');
+                more.className = 'load-more-item';
+                more.innerHTML = `<button class="icon-btn" title="Afficher plus" style="width: 100%;"><i class="fas fa-ellipsis-h"></i></button>`;
+                more.querySelector('button').addEventListener('click', () => loadMembers(list, data.next_after));
+                list.appendChild(more);
+            } else if (!list.children.length && list.dataset.emptyText) {
+                list.innerHTML = `<li class="empty-list">${list.dataset.emptyText}</li>`;
+            }
+        } catch (err) {
+            list.innerHTML = `<li class="empty-list">Erreur : ${err.message}</li>`;
+        }
+    }
+
+    const membersObserver = new IntersectionObserver((entries, observer) => {
+        entries.filter(entry => entry.isIntersecting).forEach(entry => {
+            observer.unobserve(entry.target);
+            loadMembers(entry.target);
+        });
+    });
+    document.querySelectorAll('.student-list[data-members-url]').forEach(list => membersObserver.observe(list));
+
+    // Délégation des événements : les élèves sont ajoutés après le chargement de la page
+    const managementGrid = document.querySelector('.management-grid');
+    managementGrid.addEventListener('click', (e) => {
+        const moveBtn = e.target.closest('.move-student-btn');
+        const deleteBtn = e.target.closest('.delete-student-btn');
+        if (!moveBtn && !deleteBtn) return;
+
+        const studentItem = e.target.closest('.student-item');
+        const studentId = studentItem.dataset.studentId;
+        const studentName = studentItem.querySelector('span').textContent.trim();
+
+        if (moveBtn) {
             document.getElementById('moveStudentId').value = studentId;
             document.getElementById('moveStudentName').textContent = studentName;
             moveStudentModal.style.display = 'block';
-        });
+        } else if (confirm(`Êtes-vous sûr de vouloir supprimer l'élève "${studentName}" ? Toutes ses données (sessions, etc.) seront perdues.`)) {
+            const formData = new FormData();
+            formData.append('action', 'delete');
+            apiCall(`${studentActionUrlTemplate}${studentId}/action/`, 'POST', formData)
+                .then(() => studentItem.remove())
+                .catch(err => alert(`Erreur : ${err.message}`));
+        }
     });
 
     document.getElementById('moveStudentForm').addEventListener('submit', (e) => {
@@ -118,21 +270,5 @@ document.addEventListener('DOMContentLoaded', () => {
             .then(() => window.location.reload())
             .catch(err => alert(`Erreur : ${err.message}`));
     });
-
-    document.querySelectorAll('.delete-student-btn').forEach(btn => {
-        btn.addEventListener('click', (e) => {
-            const studentItem = e.target.closest('.student-item');
-            const studentId = studentItem.dataset.studentId;
-            const studentName = studentItem.querySelector('span').textContent.trim();
-
-            if (confirm(`Êtes-vous sûr de vouloir supprimer l'élève "${studentName}" ? Toutes ses données (sessions, etc.) seront perdues.`)) {
-                const formData = new FormData();
-                formData.append('action', 'delete');
-                apiCall(`${studentActionUrlTemplate}${studentId}/action/`, 'POST', formData)
-                    .then(() => studentItem.remove())
-                    .catch(err => alert(`Erreur : ${err.message}`));
-            }
-        });
-    });
 });
 
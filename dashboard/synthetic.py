@@ -0,0 +1,270 @@
+# dashboard/synthetic.py
+
+import base64
+import math
+import random
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.utils import timezone
+from documents.models import Category, Document
+from tutor.models import ChatMessage, ChatSession
+from users.roles import STUDENTS_GROUP, TEACHERS_GROUP
+from .cache import bump_agreement_version, bump_class_version
+
+# AI summary labels and the matching keys of the teacher diagnosis
+ERROR_LABELS = {
+    'calcul': "Erreurs de calcul",
+    'substitution': "Erreurs de substitution",
+    'procedure': "Erreurs de procédure",
+    'conceptuelle': "Erreurs conceptuelles",
+}
+# Share of each error type across all sessions: calculation errors dominate
+ERROR_WEIGHTS = {'calcul': 0.45, 'procedure': 0.25, 'conceptuelle': 0.2, 'substitution': 0.1}
+# How often the teacher reports exactly what the AI found
+TEACHER_AGREEMENT = 0.7
+IMAGE_POOL_SIZE = 16
+DEFAULT_OPTIONS = {
+    'classes': 50,
+    'students': 1500,
+    'sessions': 200000,
+    'messages': 6,
+    'image_rate': 0.3,
+    'image_size': 30 * 1024,
+    'summary_rate': 0.9,
+    'analysis_rate': 0.1,
+    'ongoing_rate': 0.03,
+    'days': 300,
+    'seed': 42,
+    'prefix': 'synth',
+    'batch_size': 2000,
+}
+
+STUDENT_LINES = [
+    "Je ne comprends pas comment commencer.", "J'ai trouvé {n}, c'est juste ?", "Voici ma réponse.",
+    "Il faut d'abord simplifier ?", "Je pense que c'est {n}/{d}.", "Je me suis trompé dans le calcul.",
+    "Pourquoi on divise par {n} ?", "Je crois que j'ai compris !",
+]
+TUTOR_LINES = [
+    "Bonne idée ! Que peux-tu faire ensuite ?", "Regarde bien l'énoncé : que demande-t-on exactement ?",
+    "Vérifie ton calcul à la deuxième ligne.", "Presque ! Que se passe-t-il si tu factorises par {n} ?",
+    "Très bien, peux-tu m'expliquer ton raisonnement avec tes mots ?", "Attention au signe devant la parenthèse.",
+]
+SUMMARY_SENTENCES = [
+    "L'élève a commencé l'exercice avec hésitation.", "Il a rapidement identifié la méthode.",
+    "Des erreurs de calcul ont ralenti la résolution.", "La notion de fraction irréductible reste fragile.",
+    "Avec quelques indices, l'élève a corrigé sa démarche.", "Il a su expliquer son raisonnement à la fin.",
+]
+
+
+class DatasetError(Exception):
+    pass
+
+
+def _restore_timestamps(model, objects, field, values, batch_size):
+    """
+    bulk_create stamps auto_now_add fields with the current time: writes the generated
+    values back with batched UPDATEs, without touching the model fields' definitions.
+    """
+    for obj, value in zip(objects, values):
+        setattr(obj, field, value)
+    model.objects.bulk_update(objects, [field], batch_size=batch_size)
+
+
+def _poisson(rng, mean):
+    # Knuth's method: the means used here are small
+    threshold, count, product = math.exp(-mean), 0, rng.random()
+    while product > threshold:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def _image_pool(rng, size):
+    """A few random PNG-like payloads of about `size` bytes, reused by the messages."""
+    if size <= 0:
+        return []
+    return [
+        "data:image/png;base64," + base64.b64encode(rng.randbytes(size * 3 // 4)).decode('ascii')
+        for _ in range(IMAGE_POOL_SIZE)
+    ]
+
+
+def _student_profile(rng):
+    """Skill (0: struggling, 1: strong) and preferred error types of a student."""
+    skill = rng.betavariate(2.5, 2)
+    weights = {key: weight * rng.gammavariate(2, 1) for key, weight in ERROR_WEIGHTS.items()}
+    return skill, weights
+
+
+def _error_analysis(rng, profile):
+    """Error counts of one session, by error key: fewer and rarer for strong students."""
+    skill, weights = profile
+    errors = {}
+    keys, key_weights = list(weights), list(weights.values())
+    for _ in range(_poisson(rng, 3 * (1 - skill) + 0.2)):
+        key = rng.choices(keys, key_weights)[0]
+        errors[key] = errors.get(key, 0) + 1
+    return errors
+
+
+def _teacher_errors(rng, ai_errors):
+    """The teacher's diagnosis: usually the AI's, otherwise one count moved or changed."""
+    errors = dict(ai_errors)
+    if rng.random() < TEACHER_AGREEMENT:
+        return errors
+    key = rng.choice(list(ERROR_WEIGHTS))
+    if errors and rng.random() < 0.5:
+        moved = rng.choice(list(errors))
+        errors[moved] -= 1
+        if not errors[moved]:
+            del errors[moved]
+    errors[key] = errors.get(key, 0) + 1
+    return errors
+
+
+def _message_content(rng, role, images):
+    line = rng.choice(STUDENT_LINES if role == 'user' else TUTOR_LINES)
+    content = [{'type': 'text', 'text': line.format(n=rng.randint(2, 99), d=rng.randint(2, 99))}]
+    if role == 'user' and images[1] and rng.random() < images[0]:
+        content.append({'type': 'image_url', 'url': rng.choice(images[1])})
+    return content
+
+
+def _grade_exercises():
+    """Exercise ids of the curriculum, by top-level category (grade)."""
+    roots = list(Category.objects.filter(parent__isnull=True).order_by('order', 'sort_key').values_list('id', 'path'))
+    exercises = {}
+    for root_id, path in roots:
+        ids = list(Document.objects.filter(
+            solution_for__isnull=True, category__path__startswith=path
+        ).values_list('id', flat=True))
+        if ids:
+            exercises[root_id] = ids
+    return list(exercises.values())
+
+
+def delete_dataset(prefix):
+    """Deletes the users and classes of a previous dataset (their sessions and messages cascade)."""
+    User = get_user_model()
+    deleted, _ = User.objects.filter(username__startswith=f"{prefix}-").delete()
+    Group.objects.filter(name__startswith=f"{prefix}-").delete()
+    return deleted
+
+
+def generate_dataset(**options):
+    """
+    Generates a synthetic school over the real curriculum: classes (each working on the
+    exercises of one grade), students with a skill profile, sessions spread over the last
+    `days` days, messages with images of `image_size` bytes, AI summaries whose
+    error_analysis follows the student profiles, and teacher analyses mostly agreeing
+    with them. The same seed gives the same data. Everything is written with bulk
+    inserts, `batch_size` rows at a time.
+    Yields progress events like import_roster: {'stage': ..., ...}.
+    """
+    options = {**DEFAULT_OPTIONS, **options}
+    rng = random.Random(options['seed'])
+    prefix, batch_size = options['prefix'], options['batch_size']
+    User = get_user_model()
+
+    grades = _grade_exercises()
+    if not grades:
+        raise DatasetError("Aucun exercice : lancez d'abord sync_curriculum.")
+    if User.objects.filter(username__startswith=f"{prefix}-").exists():
+        raise DatasetError(f"Des données « {prefix} » existent déjà (option --replace pour les remplacer).")
+
+    class_count = max(1, options['classes'])
+    student_count = max(class_count, options['students'])
+    with transaction.atomic():
+        teachers_group, _ = Group.objects.get_or_create(name=TEACHERS_GROUP)
+        students_group, _ = Group.objects.get_or_create(name=STUDENTS_GROUP)
+        classes = Group.objects.bulk_create([
+            Group(name=f"{prefix}-{index + 1:03d}") for index in range(class_count)
+        ], batch_size=batch_size)
+        # All the accounts share one password hash: hashing 1,500 passwords would take minutes
+        password = make_password(prefix)
+        teachers = User.objects.bulk_create([
+            User(username=f"{prefix}-prof-{index + 1:02d}", password=password)
+            for index in range(max(1, class_count // 5))
+        ], batch_size=batch_size)
+        # Students are dealt round-robin into the classes
+        students = User.objects.bulk_create([
+            User(username=f"{prefix}-{index % class_count + 1:03d}-{index + 1:05d}", password=password)
+            for index in range(student_count)
+        ], batch_size=batch_size)
+        Membership = User.groups.through
+        class_of = {student.id: classes[index % class_count] for index, student in enumerate(students)}
+        Membership.objects.bulk_create(
+            [Membership(user_id=teacher.id, group_id=teachers_group.id) for teacher in teachers]
+            + [Membership(user_id=student.id, group_id=students_group.id) for student in students]
+            + [Membership(user_id=student_id, group_id=group.id) for student_id, group in class_of.items()],
+            batch_size=batch_size,
+        )
+    yield {'stage': 'users', 'classes': len(classes), 'teachers': len(teachers), 'students': len(students)}
+
+    grade_of = {group.id: grades[index % len(grades)] for index, group in enumerate(classes)}
+    teacher_of = {group.id: teachers[index % len(teachers)].id for index, group in enumerate(classes)}
+    profiles = {student.id: _student_profile(rng) for student in students}
+    # Strong students work more: sessions are drawn with weights
+    student_ids = [student.id for student in students]
+    activity = [0.5 + profiles[student_id][0] for student_id in student_ids]
+    images = (options['image_rate'], _image_pool(rng, options['image_size']))
+    now = timezone.now()
+    span = timedelta(days=options['days']).total_seconds()
+
+    total, done, messages_done = options['sessions'], 0, 0
+    while done < total:
+        size = min(batch_size, total - done)
+        sessions, pending = [], []
+        for student_id in rng.choices(student_ids, activity, k=size):
+            group_id = class_of[student_id].id
+            start = now - timedelta(seconds=rng.random() * span)
+            ongoing = rng.random() < options['ongoing_rate']
+            duration = timedelta(minutes=rng.lognormvariate(2.5, 0.5))
+            session = ChatSession(
+                student_id=student_id, document_id=rng.choice(grade_of[group_id]),
+                question_context="Exercice synthétique", solution_context="Solution synthétique",
+                start_time=start, end_time=None if ongoing else start + duration,
+            )
+            ai_errors = _error_analysis(rng, profiles[student_id])
+            if not ongoing and rng.random() < options['summary_rate']:
+                session.summary_data = {
+                    'error_analysis': {ERROR_LABELS[key]: count for key, count in ai_errors.items()},
+                    'summary_text': " ".join(rng.sample(SUMMARY_SENTENCES, 3)),
+                }
+                if rng.random() < options['analysis_rate']:
+                    session.teacher_analysis = {
+                        'error_analysis': _teacher_errors(rng, ai_errors),
+                        'notes': "Analyse synthétique.",
+                        'teacher_id': teacher_of[group_id],
+                        'analysed_at': (start + duration + timedelta(days=rng.random() * 7)).isoformat(),
+                    }
+            sessions.append(session)
+            pending.append((session, max(1, _poisson(rng, options['messages'])), duration))
+
+        starts = [session.start_time for session in sessions]
+        with transaction.atomic():
+            ChatSession.objects.bulk_create(sessions, batch_size=batch_size)
+            _restore_timestamps(ChatSession, sessions, 'start_time', starts, batch_size)
+            messages, timestamps = [], []
+            for session, count, duration in pending:
+                step = duration / count
+                for position in range(count):
+                    # The tutor opens the session, then the student and the tutor take turns
+                    role = 'assistant' if position % 2 == 0 else 'user'
+                    messages.append(ChatMessage(
+                        session_id=session.id, role=role, content=_message_content(rng, role, images),
+                    ))
+                    timestamps.append(session.start_time + step * position)
+            ChatMessage.objects.bulk_create(messages, batch_size=batch_size)
+            _restore_timestamps(ChatMessage, messages, 'timestamp', timestamps, batch_size)
+        done += size
+        messages_done += len(messages)
+        yield {'stage': 'sessions', 'done': done, 'total': total, 'messages': messages_done}
+
+    # Bulk inserts send no signal: the cached dashboards are invalidated here
+    bump_class_version(*[group.id for group in classes])
+    bump_agreement_version()
+    yield {'stage': 'done', 'sessions': done, 'messages': messages_done}
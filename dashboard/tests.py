@@ -1,3 +1,567 @@
-from django.test import TestCase
+import base64
+import json
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
\ No newline at end of file
+from core.bench import StubOpenAI, stub_llm
+from core.testing import TEST_SETTINGS, QueryBudgetTestCase, build_curriculum
+from documents.models import Document
+from tutor.models import ChatMessage, ChatSession
+from users.roles import TEACHERS_GROUP
+from .cache import create_conversation, get_class_version
+from .export import Pseudonymizer
+from .pagination import decode_cursor, encode_cursor, paginate_sessions
+from .roster import class_members, unassigned_students
+from .synthetic import generate_dataset
+
+
+class DashboardQueryBudgetTests(QueryBudgetTestCase):
+    """Query and row budgets of the dashboard views (see core/testing.py)."""
+
+    def test_teacher_dashboard(self):
+        self.assertQueryBudget(lambda f: {'url': reverse('dashboard:dashboard'), 'user': f['teacher']}, 4, 10)
+
+    def test_student_dashboard(self):
+        self.assertQueryBudget(lambda f: {'url': reverse('dashboard:dashboard'), 'user': f['student']}, 5, 100)
+
+    def test_student_progression(self):
+        self.assertQueryBudget(lambda f: {'url': reverse('dashboard:my-progression'), 'user': f['student']}, 4, 60)
+
+    def test_logbook_list(self):
+        self.assertQueryBudget(lambda f: {'url': reverse('dashboard:logbook-list'), 'user': f['teacher']}, 5, 130)
+
+    def test_class_dashboard(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('dashboard:class-dashboard'), 'user': f['teacher'], 'data': {'class_id': f['class_id']},
+        }, 10, 300)
+
+    def test_class_dashboard_exercise(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('dashboard:class-dashboard'), 'user': f['teacher'],
+            'data': {'class_id': f['class_id'], 'exercise_id': f['document_id']},
+        }, 10, 300)
+
+    def test_saved_groups(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('dashboard:saved-groups'), 'user': f['teacher'], 'data': {'class_id': f['class_id']},
+        }, 6, 20)
+
+    def test_session_list(self):
+        self.assertQueryBudget(lambda f: {'url': reverse('dashboard:session-list'), 'user': f['teacher']}, 9, 200)
+
+    def test_session_list_json(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('dashboard:session-list'), 'user': f['teacher'], 'data': {'format': 'json', 'class_id': f['class_id']},
+        }, 5, 100)
+
+    def test_session_detail(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('dashboard:session-detail', args=[f['session'].id]), 'user': f['teacher'],
+        }, 6, 30)
+
+    def test_session_chat_content(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('dashboard:session-chat-content', args=[f['session'].id]), 'user': f['teacher'],
+        }, 7, 30)
+
+    def test_message_image(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('dashboard:message-image', args=[f['image_message_id'], 0]), 'user': f['teacher'],
+        }, 4, 10)
+
+    def test_co_analysis(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('dashboard:co-analysis', args=[f['session'].id]), 'user': f['teacher'],
+        }, 7, 20)
+
+    def test_agreement_dashboard(self):
+        self.assertQueryBudget(lambda f: {'url': reverse('dashboard:agreement'), 'user': f['teacher']}, 3, 10)
+
+    def test_agreement_analytics(self):
+        self.assertQueryBudget(lambda f: {'url': reverse('dashboard:agreement-api'), 'user': f['teacher']}, 6, 460)
+
+    def test_class_management(self):
+        self.assertQueryBudget(lambda f: {'url': reverse('dashboard:manage-classes'), 'user': f['teacher']}, 4, 15)
+
+    def test_class_roster(self):
+        self.assertQueryBudget(lambda f: {'url': reverse('dashboard:class-roster'), 'user': f['teacher']}, 4, 15)
+
+    def test_class_members(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('dashboard:class-members', args=[f['class_id']]), 'user': f['teacher'],
+        }, 5, 20)
+
+    def test_class_analytics(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('dashboard:class-analytics-api', args=[f['class_id']]), 'user': f['teacher'],
+        }, 8, 1200)
+
+    def test_research_export(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('dashboard:research-export', args=['messages']), 'user': f['teacher'],
+            'data': {'class_id': f['class_id']},
+        }, 4, 950)
+
+
+@override_settings(**TEST_SETTINGS)
+class MessageImageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.teacher = User.objects.create_user('prof', password='prof')
+        cls.teacher.groups.add(Group.objects.get_or_create(name=TEACHERS_GROUP)[0])
+        session = ChatSession.objects.create(student=User.objects.create_user('eleve', password='eleve'))
+        cls.message = ChatMessage.objects.create(session=session, role='user', content=[
+            {'type': 'image_url', 'url': "data:image/png;base64," + base64.b64encode(b'png').decode()},
+            {'type': 'image_url', 'url': "javascript:alert(1)"},
+            {'type': 'image_url', 'url': "https://example.com/image.png"},
+            {'type': 'image_url', 'url': "/media/whiteboards/1.png"},
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+
+    def get(self, index, **headers):
+        return self.client.get(reverse('dashboard:message-image', args=[self.message.id, index]), **headers)
+
+    def test_data_image(self):
+        response = self.get(0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response.content, b'png')
+        self.assertEqual(self.get(0, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_missing_image_is_never_not_modified(self):
+        etag = self.get(0)['ETag']
+        self.assertEqual(self.get(9, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+        self.assertEqual(self.get(9, HTTP_IF_NONE_MATCH='*').status_code, 404)
+        response = self.client.get(reverse('dashboard:message-image', args=[0, 0]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 404)
+
+    def test_no_redirect_outside_media(self):
+        self.assertEqual(self.get(1).status_code, 404)
+        self.assertEqual(self.get(2).status_code, 404)
+        self.assertRedirects(self.get(3), '/media/whiteboards/1.png', fetch_redirect_response=False)
+
+
+@override_settings(**TEST_SETTINGS, PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RosterImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = get_user_model().objects.create_user('prof', password='prof')
+        cls.teacher.groups.add(Group.objects.get_or_create(name=TEACHERS_GROUP)[0])
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+
+    def post(self, rows):
+        content = "username,password,class\n" + "".join(f"{row}\n" for row in rows)
+        roster = SimpleUploadedFile('roster.csv', content.encode())
+        return self.client.post(reverse('dashboard:student-import'), {'roster': roster, 'create_classes': '1'})
+
+    def events(self, response):
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_import(self):
+        response = self.post([f"eleve{number},secret,3A" for number in range(30)])
+        self.assertEqual(response.status_code, 200)
+        events = self.events(response)
+        self.assertEqual(events[0], {'stage': 'validated', 'total': 30})
+        self.assertEqual(events[-1]['stage'], 'done')
+        self.assertEqual(events[-1]['created'], 30)
+        self.assertEqual(get_user_model().objects.filter(groups__name='3A').count(), 30)
+
+    def test_progress_is_streamed(self):
+        response = self.post([f"eleve{number},secret,3A" for number in range(30)])
+        # Nothing is hashed before the first event is read
+        self.assertTrue(response.streaming)
+        self.assertFalse(get_user_model().objects.filter(groups__name='3A').exists())
+        self.assertEqual(json.loads(next(iter(response.streaming_content))), {'stage': 'validated', 'total': 30})
+
+    def test_invalid_roster(self):
+        response = self.post(["eleve1,secret,3A", "eleve1,secret,3A"])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['line'], 3)
+
+    def test_failure_is_reported(self):
+        with mock.patch('dashboard.roster.Group.objects.create', side_effect=DatabaseError("boom")):
+            response = self.post(["eleve1,secret,3A"])
+            with self.assertLogs('catalyst.roster', 'ERROR'):
+                events = self.events(response)
+        self.assertEqual(events[-1]['stage'], 'error')
+        self.assertFalse(get_user_model().objects.filter(username='eleve1').exists())
+
+    @override_settings(ROSTER_HASHING_WORKERS=1)
+    def test_worker_count_is_capped(self):
+        with mock.patch('dashboard.roster.ProcessPoolExecutor') as executor:
+            self.assertEqual(self.events(self.post([f"eleve{number},secret," for number in range(30)]))[-1]['stage'], 'done')
+        executor.assert_not_called()
+
+
+@override_settings(**TEST_SETTINGS)
+class StudentGroupsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = get_user_model().objects.create_user('prof', password='prof')
+        cls.teacher.groups.add(Group.objects.get_or_create(name=TEACHERS_GROUP)[0])
+        cls.group = Group.objects.create(name="3A")
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+
+    def post(self, data):
+        return self.client.post(reverse('dashboard:create-student-groups'), data, content_type='application/json')
+
+    def test_invalid_number_of_groups(self):
+        for num_groups in ('abc', [2], -1):
+            response = self.post({'class_id': self.group.id, 'num_groups': num_groups})
+            self.assertEqual(response.status_code, 400, num_groups)
+
+    def test_malformed_body(self):
+        for body in ('{"class_id": ', '[]', 'null'):
+            response = self.client.post(reverse('dashboard:create-student-groups'), body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_malformed_ai_settings(self):
+        conversation_id = create_conversation({
+            'teacher_id': self.teacher.id,
+            'digest': {'class_name': "3A", 'prompt': "", 'profiles': []},
+            'settings': {'num_groups': 1, 'mode': 'heterogeneous', 'keep_together': [], 'keep_apart': []},
+            'groups': [[]],
+            'messages': [],
+        })
+        for num_groups in ("trois", [3]):
+            answer = {'reply': "D'accord.", 'num_groups': num_groups}
+            with mock.patch.object(StubOpenAI, 'create', lambda *args, **kwargs: SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(answer)))]
+            )), stub_llm():
+                response = self.post({'conversation_id': conversation_id, 'message': "Trois groupes"})
+            self.assertEqual(response.status_code, 200, num_groups)
+            self.assertIn("reformuler", response.json()['reply'])
+            self.assertEqual(response.json()['num_groups'], 1)
+
+
+@override_settings(**TEST_SETTINGS)
+class ClassPayloadCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.teacher = User.objects.create_user('prof', password='prof')
+        cls.teacher.groups.add(Group.objects.get_or_create(name=TEACHERS_GROUP)[0])
+        cls.group = Group.objects.create(name="3A")
+        cls.student = User.objects.create_user('eleve', password='eleve')
+        cls.student.groups.add(cls.group)
+        cls.document = Document.objects.create(title="ES1")
+
+    def setUp(self):
+        cache.clear()
+        stub = stub_llm()
+        stub.__enter__()
+        self.addCleanup(stub.__exit__, None, None, None)
+
+    def performance(self):
+        response = self.client.get(reverse('dashboard:class-dashboard'), {'class_id': self.group.id})
+        return response.context['student_performance'][0]['performance_data']
+
+    def test_invalid_exercise_shows_all(self):
+        ChatSession.objects.create(student=self.student, document=self.document)
+        self.client.force_login(self.teacher)
+        response = self.client.get(
+            reverse('dashboard:class-dashboard'), {'class_id': self.group.id, 'exercise_id': "abc"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['selected_exercise_id'])
+        self.assertEqual(response.context['student_performance'][0]['performance_data'][0]['attempts'], 1)
+
+    def test_messages_do_not_invalidate_the_class(self):
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.performance(), [])
+        version = get_class_version(self.group.id)
+
+        student = Client()
+        student.force_login(self.student)
+        student.get(reverse('start-session', args=[self.document.id]))
+        response = student.post(
+            reverse('tutor-interact'), {'messages': [{'role': 'user', 'content': "Bonjour"}]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_class_version(self.group.id), version)
+
+        # The new session shows from the live overlay, without rebuilding the payload
+        self.assertEqual(self.performance()[0]['attempts'], 1)
+
+        with mock.patch('tutor.views.threading.Thread'):
+            student.post(reverse('end-session'))
+        self.assertNotEqual(get_class_version(self.group.id), version)
+
+
+@override_settings(**TEST_SETTINGS)
+class StudentBulkActionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.teacher = User.objects.create_user('prof', password='prof')
+        cls.teacher.groups.add(Group.objects.get_or_create(name=TEACHERS_GROUP)[0])
+        cls.source = Group.objects.create(name="2A")
+        cls.target = Group.objects.create(name="1A")
+        for index in range(3):
+            User.objects.create_user(f'eleve{index}', password='eleve').groups.add(cls.source)
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+
+    def move_class(self):
+        return self.client.post(
+            reverse('dashboard:student-bulk-action'),
+            {'action': 'move', 'from_class_id': self.source.id, 'target_class_id': self.target.id},
+            content_type='application/json',
+        )
+
+    def test_move_whole_class(self):
+        response = self.move_class()
+        self.assertEqual(response.json()['moved'], 3)
+        self.assertEqual(self.target.user_set.count(), 3)
+        self.assertFalse(self.source.user_set.exists())
+
+    def test_class_over_the_limit(self):
+        with mock.patch('dashboard.views.MAX_BULK_IDS', 2):
+            response = self.move_class()
+        self.assertEqual(response.status_code, 400)
+        # Nobody is moved, rather than the first students only
+        self.assertEqual(self.source.user_set.count(), 3)
+
+    def test_malformed_body(self):
+        for body in ('{"action": "move", ', '[]', '"delete"', '{"action": "move", "from_class_id": "abc"}'):
+            with self.subTest(body):
+                response = self.client.post(
+                    reverse('dashboard:student-bulk-action'), body, content_type='application/json'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+        self.assertEqual(self.source.user_set.count(), 3)
+
+    def test_session_bulk_delete_malformed_body(self):
+        for body in ('{"session_ids": [1', '[1, 2]', '{"session_ids": "1"}'):
+            with self.subTest(body):
+                response = self.client.post(
+                    reverse('dashboard:session-bulk-delete'), body, content_type='application/json'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+@override_settings(**TEST_SETTINGS)
+class SessionPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.teacher = User.objects.create_user('prof', password='prof')
+        cls.teacher.groups.add(Group.objects.get_or_create(name=TEACHERS_GROUP)[0])
+        student = User.objects.create_user('eleve', password='eleve')
+        base = timezone.now()
+        # Pairs of sessions started at the same instant: the id breaks the tie
+        for index in range(7):
+            session = ChatSession.objects.create(student=student)
+            ChatSession.objects.filter(pk=session.pk).update(start_time=base - timedelta(minutes=index // 2))
+        cls.expected = list(ChatSession.objects.order_by('-start_time', '-id').values_list('id', flat=True))
+
+    def test_cursor_round_trip(self):
+        session = ChatSession.objects.get(pk=self.expected[3])
+        self.assertEqual(decode_cursor(encode_cursor(session)), (session.start_time, session.id))
+        for cursor in ("", "not-base64!", encode_cursor(session)[:-4], base64.urlsafe_b64encode(b'["x", 1]').decode()):
+            self.assertIsNone(decode_cursor(cursor), cursor)
+
+    def test_pages_cover_every_session_once(self):
+        for page_size in (1, 2, 3, 7):
+            with self.subTest(page_size=page_size):
+                ids, cursor = [], None
+                while True:
+                    page, cursor = paginate_sessions(ChatSession.objects.all(), cursor, page_size)
+                    ids += [session.id for session in page]
+                    if cursor is None:
+                        break
+                self.assertEqual(ids, self.expected)
+
+    def test_session_list_json(self):
+        self.client.force_login(self.teacher)
+        ids, cursor = [], None
+        while True:
+            data = self.client.get(
+                reverse('dashboard:session-list'), {'format': 'json', 'page_size': 3, **({'cursor': cursor} if cursor else {})}
+            ).json()
+            ids += [session['id'] for session in data['sessions']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(ids, self.expected)
+
+
+@override_settings(**TEST_SETTINGS)
+class ResearchExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.teacher = User.objects.create_user('prof', password='prof')
+        cls.teacher.groups.add(Group.objects.get_or_create(name=TEACHERS_GROUP)[0])
+        for username in ('alice', 'bob'):
+            student = User.objects.create_user(username, password=username)
+            for _ in range(3):
+                session = ChatSession.objects.create(student=student)
+                ChatMessage.objects.create(session=session, role='user', content=[{'type': 'text', 'text': "Bonjour"}])
+                ChatMessage.objects.create(session=session, role='assistant', content="Salut")
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+
+    def export(self, kind, export_format='jsonl', **params):
+        response = self.client.get(
+            reverse('dashboard:research-export', args=[kind]), {'format': export_format, **params}
+        )
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_row_counts(self):
+        self.assertEqual(len(self.export('sessions')), 6)
+        self.assertEqual(len(self.export('messages')), 12)
+        # The header, then one line per row
+        self.assertEqual(len(self.export('messages', 'csv')), 13)
+        self.assertEqual(len(self.export('sessions', student_id=ChatSession.objects.first().student_id)), 3)
+
+    def test_pseudonyms_are_stable(self):
+        students = {json.loads(line)['student'] for line in self.export('sessions', pseudonymize='1')}
+        self.assertEqual(len(students), 2)
+        self.assertFalse(students & {'alice', 'bob'})
+        # The same student gets the same pseudonym in every export, and in every kind of export
+        self.assertEqual({json.loads(line)['student'] for line in self.export('messages', pseudonymize='1')}, students)
+        self.assertEqual(Pseudonymizer(True)('alice'), Pseudonymizer(True)('alice'))
+        self.assertNotEqual(Pseudonymizer(True, salt="autre")('alice'), Pseudonymizer(True)('alice'))
+
+
+@override_settings(**TEST_SETTINGS)
+class AgreementAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.teacher = User.objects.create_user('prof', password='prof')
+        cls.teacher.groups.add(Group.objects.get_or_create(name=TEACHERS_GROUP)[0])
+        student = User.objects.create_user('eleve', password='eleve')
+        # (analysed on, AI report, teacher report): two sessions in January, one in March
+        for analysed_at, ai_errors, teacher_errors in (
+            ('2026-01-05T10:00:00+00:00', {"Erreurs de calcul": 2}, {'calcul': 1}),
+            ('2026-01-06T10:00:00+00:00', {"Erreurs de calcul": 1}, {'procedure': 1}),
+            ('2026-03-02T10:00:00+00:00', {}, {}),
+        ):
+            ChatSession.objects.create(
+                student=student, summary_data={'error_analysis': ai_errors},
+                teacher_analysis={'error_analysis': teacher_errors, 'analysed_at': analysed_at, 'teacher_id': cls.teacher.id},
+            )
+        # Not co-analysed: left out of every breakdown
+        ChatSession.objects.create(student=student, summary_data={'error_analysis': {"Erreurs de calcul": 1}})
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.teacher)
+
+    def analytics(self, window):
+        response = self.client.get(reverse('dashboard:agreement-api'), {'window': window})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_windows(self):
+        analytics = self.analytics('month')
+        self.assertEqual(analytics['overall']['sessions'], 3)
+        self.assertEqual(analytics['overall']['exact_agreement'], 0.667)
+        january, march = analytics['by_window']
+        self.assertEqual((january['window'], january['sessions'], january['exact_agreement']), ('2026-01', 2, 0.5))
+        self.assertEqual((march['window'], march['sessions'], march['divergence_rate']), ('2026-03', 1, 0.0))
+        # Both raters saw a calculation error once, only the AI saw it the second time
+        self.assertEqual(january['categories']['calcul'], {'agreement': 0.5, 'kappa': 0.0, 'confusion': [[0, 0], [1, 1]]})
+        self.assertEqual(january['categories']['procedure']['confusion'], [[1, 1], [0, 0]])
+        self.assertEqual(january['dominant']['agreement'], 0.5)
+
+        self.assertEqual(
+            [(item['window'], item['sessions']) for item in self.analytics('week')['by_window']],
+            [('2026-W02', 2), ('2026-W10', 1)],
+        )
+        self.assertEqual([item['name'] for item in analytics['by_teacher']], ['prof'])
+
+    def test_invalid_window(self):
+        response = self.client.get(reverse('dashboard:agreement-api'), {'window': 'year'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(**TEST_SETTINGS)
+class ClassRosterAPITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.teacher = User.objects.create_user('prof', password='prof')
+        cls.teacher.groups.add(Group.objects.get_or_create(name=TEACHERS_GROUP)[0])
+        cls.group = Group.objects.create(name="3A")
+        Group.objects.create(name="3B")
+        for index in range(5):
+            User.objects.create_user(f'eleve{index}', password='eleve').groups.add(cls.group)
+        for username in ('libre1', 'libre2'):
+            User.objects.create_user(username, password=username)
+
+    def setUp(self):
+        self.client.force_login(self.teacher)
+
+    def test_classes_with_counts(self):
+        response = self.client.get(reverse('dashboard:class-roster'))
+        self.assertEqual(
+            [(item['name'], item['member_count']) for item in response.json()['classes']], [("3A", 5), ("3B", 0)]
+        )
+
+    def test_member_pages(self):
+        usernames, after = [], None
+        while True:
+            page, after = class_members(self.group.id, after, limit=2)
+            usernames += [student['username'] for student in page]
+            if after is None:
+                break
+        self.assertEqual(usernames, [f'eleve{index}' for index in range(5)])
+
+        response = self.client.get(reverse('dashboard:class-members', args=[self.group.id]), {'after': 'eleve2'})
+        self.assertEqual([student['username'] for student in response.json()['students']], ['eleve3', 'eleve4'])
+        self.assertEqual(self.client.get(reverse('dashboard:class-members', args=[0])).status_code, 404)
+
+    def test_unassigned_students(self):
+        # Teachers belong to their group: only the students without a class are listed
+        response = self.client.get(reverse('dashboard:unassigned-students'))
+        self.assertEqual([student['username'] for student in response.json()['students']], ['libre1', 'libre2'])
+        page, after = unassigned_students('libre1')
+        self.assertEqual(([student['username'] for student in page], after), (['libre2'], None))
+
+
+@override_settings(**TEST_SETTINGS)
+class SyntheticDatasetTests(TestCase):
+    def test_generated_timestamps(self):
+        build_curriculum()
+        now = timezone.now()
+        for _ in generate_dataset(prefix='synth', classes=1, students=3, sessions=20, days=30, batch_size=8):
+            pass
+
+        sessions = ChatSession.objects.filter(student__username__startswith='synth-')
+        starts = list(sessions.values_list('start_time', flat=True))
+        self.assertEqual(len(starts), 20)
+        # Spread over the last 30 days, not stamped with the time of the insert
+        self.assertLess(min(starts), now - timedelta(days=1))
+        self.assertTrue(all(now - timedelta(days=30) <= start <= now for start in starts))
+        for session in sessions.prefetch_related('messages'):
+            timestamps = [message.timestamp for message in session.messages.all()]
+            self.assertEqual(min(timestamps), session.start_time)
+
+        # The model fields are left alone: other rows are still stamped on creation
+        self.assertTrue(ChatSession._meta.get_field('start_time').auto_now_add)
+        self.assertGreaterEqual(ChatSession.objects.create(student=sessions[0].student).start_time, now)
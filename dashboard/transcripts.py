@@ -0,0 +1,130 @@
+# dashboard/transcripts.py
+
+import base64
+import binascii
+import hashlib
+from urllib.parse import urlparse
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.urls import reverse
+from django.utils.html import escape
+from tutor.models import ChatMessage
+
+# Increase when the markup of the fragments changes, to discard the cached ones
+TRANSCRIPT_RENDER_VERSION = 1
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+IMAGE_ALT = "Réponse de l'élève sur le tableau blanc"
+
+
+def get_image_url(part):
+    """Returns the URL of an image part, whichever of the two stored formats it uses."""
+    return part.get('url') or (part.get('image_url') or {}).get('url')
+
+
+def render_content_html(content, image_src=None):
+    """
+    Renders the content of a chat message, which can be a string or a list of
+    text/image parts. `image_src(index, url)` can replace the source of the images,
+    e.g. to reference them by URL instead of inlining their base64 data.
+    """
+    if isinstance(content, list):
+        html_parts = []
+        image_index = 0
+        for part in content:
+            if not isinstance(part, dict):
+                continue
+            if part.get('type') == 'text':
+                text = escape(part.get('text', '')).replace('\n', '<br>')
+                html_parts.append(f'<div class="comment-text">{text}</div>')
+            elif part.get('type') == 'image_url':
+                url = get_image_url(part)
+                if url:
+                    src = image_src(image_index, url) if image_src else url
+                    html_parts.append(f'<img src="{escape(src)}" alt="{escape(IMAGE_ALT)}" style="max-width: 100%; border-radius: 8px; margin-top: 10px;">')
+                image_index += 1
+        return "".join(html_parts)
+    elif isinstance(content, str):
+        # A plain string (old format or AI message)
+        return escape(content).replace('\n', '<br>')
+    return ""
+
+
+def render_message_fragment(message):
+    """Renders the HTML of one message, with its images referenced by URL."""
+    css_class = 'tutor' if message.role == 'assistant' else 'user'
+
+    def image_src(index, url):
+        if not url.startswith('data:'):
+            return url
+        return reverse('dashboard:message-image', kwargs={'message_id': message.id, 'index': index})
+
+    return f'<div class="chat-message {css_class}">{render_content_html(message.content, image_src)}</div>'
+
+
+def _fragment_key(message_id):
+    return f"transcript:message:{message_id}:v{TRANSCRIPT_RENDER_VERSION}"
+
+
+def get_transcript_html(session):
+    """
+    Assembles the transcript of a session from per-message fragments.
+    Messages are immutable once written, so their fragments are cached by id and
+    only the messages missing from the cache are loaded with their content.
+    """
+    message_ids = list(ChatMessage.objects.filter(session=session).order_by('timestamp', 'id').values_list('id', flat=True))
+    fragments = cache.get_many([_fragment_key(message_id) for message_id in message_ids])
+
+    missing_ids = [message_id for message_id in message_ids if _fragment_key(message_id) not in fragments]
+    if missing_ids:
+        rendered = {
+            _fragment_key(message.id): render_message_fragment(message)
+            for message in ChatMessage.objects.filter(id__in=missing_ids)
+        }
+        cache.set_many(rendered, FRAGMENT_CACHE_TIMEOUT)
+        fragments.update(rendered)
+
+    return "\n".join(fragments[_fragment_key(message_id)] for message_id in message_ids)
+
+
+def get_transcript_etag(session_id):
+    """ETag of a transcript: it only changes when messages are added or deleted."""
+    state = ChatMessage.objects.filter(session_id=session_id).aggregate(count=Count('id'), last_id=Max('id'))
+    return f"transcript-{session_id}-{state['count']}-{state['last_id']}-v{TRANSCRIPT_RENDER_VERSION}"
+
+
+def decode_data_url(url):
+    """Decodes a base64 data URL. Returns (content_type, bytes), or None if it is not one."""
+    if not url or not url.startswith('data:') or ';base64,' not in url:
+        return None
+    header, data = url[len('data:'):].split(';base64,', 1)
+    try:
+        return header or 'application/octet-stream', base64.b64decode(data)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def get_message_image(message_id, index):
+    """Returns the URL of the `index`-th image of a message, or None."""
+    content = ChatMessage.objects.filter(id=message_id).values_list('content', flat=True).first()
+    if not isinstance(content, list):
+        return None
+    images = [get_image_url(part) for part in content if isinstance(part, dict) and part.get('type') == 'image_url']
+    return images[index] if index < len(images) else None
+
+
+def get_message_image_etag(url):
+    """ETag of a loaded image, derived from its data: a missing image has none."""
+    if not url:
+        return None
+    return f'"{hashlib.sha256(url.encode()).hexdigest()[:32]}"'
+
+
+def is_media_url(url):
+    """True for a URL of the stored media of this site (relative, under MEDIA_URL), the only ones redirected to."""
+    parsed = urlparse(url)
+    return (
+        not parsed.scheme and not parsed.netloc and parsed.path.startswith(settings.MEDIA_URL)
+        and '..' not in parsed.path.split('/') and '\\' not in url
+    )
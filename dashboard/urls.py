@@ -14,20 +14,31 @@ urlpatterns = [
     path('sessions/', SessionListView.as_view(), name='session-list'),
     path('sessions/<int:session_id>/', SessionDetailView.as_view(), name='session-detail'),
     path('sessions/<int:pk>/co-analysis/', CoAnalysisView.as_view(), name='co-analysis'),
+    path('co-analysis/agreement/', AgreementDashboardView.as_view(), name='agreement'),
+    path('api/co-analysis/agreement/', AgreementAnalyticsAPIView.as_view(), name='agreement-api'),
     # NOUVELLE URL: API pour récupérer le contenu du chat
     path('api/sessions/<int:session_id>/content/', SessionChatContentView.as_view(), name='session-chat-content'),
+    path('api/messages/<int:message_id>/images/<int:index>/', MessageImageView.as_view(), name='message-image'),
     # NOUVELLE URL: API pour générer un résumé de la session
     path('api/sessions/<int:session_id>/summary/', SessionSummaryView.as_view(), name='session-summary'),
     # NOUVELLE URL: API pour supprimer une session
     path('api/sessions/<int:session_id>/delete/', DeleteSessionView.as_view(), name='session-delete'),
+    path('api/sessions/bulk-delete/', SessionBulkDeleteView.as_view(), name='session-bulk-delete'),
+    # API d'export des données de recherche (CSV / JSON Lines)
+    path('api/export/<str:kind>/', ResearchExportView.as_view(), name='research-export'),
 
     # URLs pour la gestion des classes et des élèves
     path('manage-classes/', ClassManagementView.as_view(), name='manage-classes'),
     path('saved-groups/', SavedGroupsView.as_view(), name='saved-groups'),
+    path('api/classes/', ClassRosterAPIView.as_view(), name='class-roster'),
     path('api/classes/create/', ClassCreateView.as_view(), name='class-create'),
+    path('api/classes/<int:class_id>/members/', ClassMembersAPIView.as_view(), name='class-members'),
+    path('api/classes/unassigned/', ClassMembersAPIView.as_view(), name='unassigned-students'),
     path('api/classes/<int:group_id>/action/', ClassActionView.as_view(), name='class-action'),
     path('api/students/create/', StudentCreateView.as_view(), name='student-create'),
+    path('api/students/import/', RosterImportView.as_view(), name='student-import'),
     path('api/students/<int:user_id>/action/', StudentActionView.as_view(), name='student-action'),
+    path('api/students/bulk-action/', StudentBulkActionView.as_view(), name='student-bulk-action'),
     path('api/create-student-groups/', CreateStudentGroupsView.as_view(), name='create-student-groups'),
     path('api/save-group-configuration/', SaveGroupConfigurationView.as_view(), name='save-group-configuration'),
     path('api/class-analytics/<int:class_id>/', ClassAnalyticsAPIView.as_view(), name='class-analytics-api'),
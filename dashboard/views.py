@@ -6,21 +6,47 @@ from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import user_passes_test
 from django.urls import reverse
 from datetime import timedelta
-from documents.models import Document, Category
-from django.db.models import Q
+from documents.models import Document
+from django.db.models import Count, Max, Q, Exists, OuterRef, Prefetch, prefetch_related_objects
 from django.contrib.auth.models import Group
 import json
 from django.contrib.auth import get_user_model
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, HttpResponse, Http404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition
 from openai import OpenAI
+from core.llm import chat_completion
 from collections import defaultdict
-from tutor.models import ChatSession, ChatMessage
+from tutor.models import ChatSession
 from .models import GroupConfiguration
-
+from .cache import (
+    get_cached_class_payload, bump_class_version, bump_student_classes,
+    AGREEMENT_SCOPE, get_cached_payload, bump_agreement_version,
+    create_conversation, load_conversation, save_conversation,
+)
+from .pagination import filter_sessions, with_message_count, paginate_sessions, get_page_size
+from .agreement import AGREEMENT_WINDOWS, build_agreement_analytics
+from .bulk import MAX_BULK_IDS, move_students, delete_students, delete_sessions
+from .roster import (
+    RosterError, parse_roster, import_roster,
+    classes_with_counts, class_members, unassigned_students, MEMBERS_PAGE_SIZE,
+)
+from .export import EXPORT_KINDS, EXPORT_FORMATS, stream_export
+from .grouping import GROUPING_MODES, GroupingError, MODE_LABELS, build_class_digest, compute_groups, format_groups_text
+from .transcripts import (
+    get_transcript_html, get_transcript_etag, get_message_image, get_message_image_etag, decode_data_url, is_media_url,
+)
+from users.roles import get_user_roles, is_teacher
+from documents.tree import get_tree_snapshot, category_options
+import logging
+
+logger = logging.getLogger('catalyst.roster')
 
 def is_user_in_group(user, group_name):
     """Checks if a user belongs to a specific group."""
-    return user.groups.filter(name=group_name).exists()
+    return group_name in get_user_roles(user)
 
 class DashboardView(LoginRequiredMixin, View):
     """
@@ -31,7 +57,7 @@ class DashboardView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         user = request.user
 
-        if is_user_in_group(user, 'Professeurs'):
+        if request.user_roles.is_teacher:
             context = {
                 'user': user,
                 'documents': Document.objects.filter(uploaded_by=user).order_by('-uploaded_at')
@@ -55,10 +81,6 @@ class DashboardView(LoginRequiredMixin, View):
             return render(request, 'dashboard/student_dashboard.html', context)
 
 
-def is_teacher(user):
-    """Checks if the user is a teacher."""
-    return is_user_in_group(user, 'Professeurs')
-
 
 class StudentProgressionView(LoginRequiredMixin, TemplateView):
     """
@@ -69,12 +91,13 @@ class StudentProgressionView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         student = self.request.user
-        sessions = ChatSession.objects.filter(student=student).order_by('start_time')
+        # The message counts are annotated: no query per session
+        sessions = list(with_message_count(ChatSession.objects.filter(student=student)).order_by('start_time'))
 
         # --- 1. General statistics ---
-        total_sessions = sessions.count()
+        total_sessions = len(sessions)
         total_duration_seconds = sum(((s.end_time - s.start_time).total_seconds() for s in sessions if s.end_time), 0)
-        total_messages = sum(s.messages.count() for s in sessions)
+        total_messages = sum(s.message_count for s in sessions)
 
         context['total_sessions'] = total_sessions
         context['total_duration_minutes'] = int(total_duration_seconds / 60)
@@ -135,24 +158,105 @@ class StudentProgressionView(LoginRequiredMixin, TemplateView):
         return context
 
 
+class SessionPageMixin:
+    """
+    Shared logic of the paginated session lists: filtering and keyset pagination.
+    """
+    rows_template_name = None
+
+    def get_base_queryset(self):
+        return ChatSession.objects.all()
+
+    def get_page(self):
+        params = self.request.GET
+        sessions, filters = filter_sessions(self.get_base_queryset(), params)
+        sessions = with_message_count(sessions).select_related('student', 'document')
+        page, next_cursor = paginate_sessions(sessions, params.get('cursor'), get_page_size(params))
+        # Only the classes of the students of this page are loaded
+        prefetch_related_objects(page, 'student__groups')
+        return page, next_cursor, filters
+
+    def render_page_json(self, page, next_cursor):
+        """JSON variant used by the infinite scroll: rendered rows plus raw data."""
+        html = render_to_string(self.rows_template_name, {'sessions': page}, request=self.request)
+        return JsonResponse({
+            'html': html,
+            'next_cursor': next_cursor,
+            'sessions': [{
+                'id': session.id,
+                'student_id': session.student_id,
+                'student': session.student.username,
+                'document_id': session.document_id,
+                'document': session.document.title if session.document else None,
+                'start_time': session.start_time.isoformat(),
+                'end_time': session.end_time.isoformat() if session.end_time else None,
+                'message_count': session.message_count,
+            } for session in page],
+        })
+
+
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
-class LogbookListView(LoginRequiredMixin, TemplateView):
+class LogbookListView(LoginRequiredMixin, SessionPageMixin, TemplateView):
     """
     Displays a list of all pedagogical logbooks filled out by the teacher.
     """
     template_name = "dashboard/logbook_list.html"
+    rows_template_name = "dashboard/partials/logbook_rows.html"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+    def get_base_queryset(self):
         # We only retrieve sessions where the teacher has filled at least part of the logbook
-        # and which belong to that teacher's students (implicitly via documents)
-        sessions_with_logbooks = ChatSession.objects.filter(
+        return ChatSession.objects.filter(
             teacher_analysis__isnull=False
         ).exclude(
             teacher_analysis__exact={}
-        ).select_related('student', 'document').order_by('-start_time')
-        context['sessions'] = sessions_with_logbooks
-        return context
+        )
+
+    def get(self, request, *args, **kwargs):
+        page, next_cursor, filters = self.get_page()
+        if request.GET.get('format') == 'json':
+            return self.render_page_json(page, next_cursor)
+        context = self.get_context_data(**kwargs)
+        context.update({'sessions': page, 'next_cursor': next_cursor, 'filters': filters})
+        return self.render_to_response(context)
+
+
+def live_session_activity(class_id, exercise_id=None):
+    """
+    Number of sessions and latest start of each student of a class, in one aggregate
+    query on the sessions (their messages are not read).
+    """
+    sessions = ChatSession.objects.filter(student__groups__id=class_id)
+    if exercise_id:
+        sessions = sessions.filter(document_id=exercise_id)
+    return {
+        row['student_id']: row
+        for row in sessions.values('student_id').annotate(attempts=Count('id'), last_start=Max('start_time'))
+    }
+
+
+def overlay_live_attempts(student_performance, class_id, exercise_id=None):
+    """
+    The cached performance payload is only rebuilt when sessions end, get a summary or
+    students move: the sessions started since then are added from `live_session_activity`.
+    Their messages, duration and errors are counted once they end.
+    """
+    activity = live_session_activity(class_id, exercise_id)
+    document_title = None
+    for entry in student_performance:
+        live = activity.get(entry['student']['id'])
+        if live is None:
+            continue
+        details = entry['performance_data']
+        if not details:
+            if exercise_id and document_title is None:
+                document_title = Document.objects.filter(pk=exercise_id).values_list('title', flat=True).first() or ''
+            details.append({
+                **({'doc_title': document_title} if exercise_id else {'is_aggregated': True, 'error_percentages': {}}),
+                'message_count': 0, 'total_duration_seconds': 0, 'aggregated_errors': {},
+            })
+        details[0]['attempts'] = live['attempts']
+        details[0]['last_activity'] = live['last_start'].strftime("%d/%m/%Y %H:%M")
+    return student_performance
 
 
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
@@ -164,44 +268,59 @@ class ClassDashboardView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        User = get_user_model()
 
         # 1. Prepare context for filters
         context['classes'] = Group.objects.exclude(name='Professeurs')
-        context['exercise_categories'] = Category.objects.filter(parent__isnull=True).prefetch_related(
-            'children__children__documents'
-        ).order_by('order', 'name')
+        context['tree'] = get_tree_snapshot()
 
         selected_class_id = self.request.GET.get('class_id')
-        selected_exercise_id = self.request.GET.get('exercise_id')
+        selected_exercise_id = self.request.GET.get('exercise_id', '')
+        if not selected_exercise_id.isdigit():
+            # An invalid exercise shows all the exercises
+            selected_exercise_id = None
         context['selected_class_id'] = selected_class_id
         context['selected_exercise_id'] = selected_exercise_id
 
-        # 2. Retrieve students if a class is selected
-        students = []
-        selected_group = None
+        # 2. Retrieve the performance of the students if a class is selected
+        student_performance = []
         if selected_class_id:
             try:
                 selected_group = Group.objects.get(id=selected_class_id)
                 context['selected_group'] = selected_group
-                students = User.objects.filter(groups=selected_group).prefetch_related(
-                    'chatsession_set__document', 
-                    'chatsession_set__messages'
+                student_performance = get_cached_class_payload(
+                    selected_group.id, 'student-performance',
+                    lambda: self.build_student_performance(selected_group, selected_exercise_id),
+                    selected_exercise_id or 'all'
                 )
             except Group.DoesNotExist:
                 pass # The group does not exist, return an empty student list
 
-        # 3. Aggregate performance data for the found students
+        context['student_performance'] = overlay_live_attempts(
+            student_performance, selected_class_id, selected_exercise_id
+        ) if student_performance else student_performance
+        return context
+
+    def build_student_performance(self, selected_group, selected_exercise_id):
+        """
+        Aggregates performance data for the students of a class.
+        Only plain data is returned so that the result can be cached.
+        """
+        # The sessions of all the students in one query, with their message counts:
+        # everything below works on these lists, without a query per student
+        students = get_user_model().objects.filter(groups=selected_group).prefetch_related(
+            Prefetch('chatsession_set', queryset=with_message_count(ChatSession.objects.select_related('document')))
+        )
+
         student_performance = []
         for student in students:
             performance_details = []
-            sessions_for_student = student.chatsession_set.all()
+            sessions_for_student = list(student.chatsession_set.all())
 
             if selected_exercise_id:
                 # View by exercise
-                sessions_for_doc = sessions_for_student.filter(document_id=selected_exercise_id)
-                if sessions_for_doc.exists():
-                    latest_session = sessions_for_doc.latest('start_time')
+                sessions_for_doc = [s for s in sessions_for_student if str(s.document_id) == str(selected_exercise_id)]
+                if sessions_for_doc:
+                    latest_session = max(sessions_for_doc, key=lambda s: s.start_time)
                     total_duration = sum(((s.end_time - s.start_time).total_seconds() for s in sessions_for_doc if s.end_time), 0)
                     aggregated_errors = defaultdict(int)
                     for s in sessions_for_doc:
@@ -211,15 +330,15 @@ class ClassDashboardView(LoginRequiredMixin, TemplateView):
 
                     performance_details.append({
                         'doc_title': latest_session.document.title,
-                        'attempts': sessions_for_doc.count(),
-                        'message_count': sum(s.messages.count() for s in sessions_for_doc),
+                        'attempts': len(sessions_for_doc),
+                        'message_count': sum(s.message_count for s in sessions_for_doc),
                         'total_duration_seconds': total_duration,
                         'aggregated_errors': dict(aggregated_errors),
                         'last_activity': latest_session.start_time.strftime("%d/%m/%Y %H:%M"),
                     })
             else:
                 # Aggregated view "All exercises"
-                if sessions_for_student.exists():
+                if sessions_for_student:
                     error_key_map = {
                         "Erreurs de calcul": "calcul",
                         "Erreurs de substitution": "substitution",
@@ -240,21 +359,19 @@ class ClassDashboardView(LoginRequiredMixin, TemplateView):
 
                     performance_details.append({
                         'is_aggregated': True,
-                        'attempts': sessions_for_student.count(),
-                        'message_count': sum(s.messages.count() for s in sessions_for_student),
+                        'attempts': len(sessions_for_student),
+                        'message_count': sum(s.message_count for s in sessions_for_student),
                         'total_duration_seconds': total_duration,
                         'aggregated_errors': dict(aggregated_errors),
                         'error_percentages': error_percentages,
-                        'last_activity': sessions_for_student.latest('start_time').start_time.strftime("%d/%m/%Y %H:%M"),
+                        'last_activity': max(s.start_time for s in sessions_for_student).strftime("%d/%m/%Y %H:%M"),
                     })
 
             student_performance.append({
-                'student': student,
+                'student': {'id': student.id, 'username': student.username, 'first_name': student.first_name},
                 'performance_data': performance_details
             })
-            
-        context['student_performance'] = student_performance
-        return context
+        return student_performance
 
 
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
@@ -286,34 +403,30 @@ class SavedGroupsView(LoginRequiredMixin, TemplateView):
 
 
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
-class SessionListView(LoginRequiredMixin, TemplateView):
+class SessionListView(LoginRequiredMixin, SessionPageMixin, TemplateView):
     """
-    Displays a list of all tutoring sessions for teachers.
+    Displays a paginated list of the tutoring sessions for teachers.
     """
     template_name = "dashboard/session_list.html"
+    rows_template_name = "dashboard/partials/session_rows.html"
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        student_id = self.request.GET.get('student_id')
-        document_id = self.request.GET.get('document_id')
-        sessions = ChatSession.objects.select_related('student', 'document').prefetch_related('student__groups').all().order_by('-start_time')
-
-        # Get all documents for the filter
-        all_documents = Document.objects.all().order_by('title')
-        context['all_documents'] = all_documents
-
-        # If a student_id is passed as a parameter, use it for filtering
-        context['filtered_student_id'] = student_id if student_id else ''
-        context['filtered_document_id'] = document_id if document_id else ''
-
-        if student_id:
-            sessions = sessions.filter(student_id=student_id)
-
-        if document_id:
-            sessions = sessions.filter(document_id=document_id)
-
-        context['sessions'] = sessions
-        return context
+    def get(self, request, *args, **kwargs):
+        page, next_cursor, filters = self.get_page()
+        if request.GET.get('format') == 'json':
+            return self.render_page_json(page, next_cursor)
+
+        context = self.get_context_data(**kwargs)
+        context.update({'sessions': page, 'next_cursor': next_cursor, 'filters': filters})
+        # Options of the filters
+        context['all_classes'] = Group.objects.exclude(name='Professeurs').order_by('name')
+        # Only the documents that have been worked on, checked with the (document, start_time, id) index
+        context['all_documents'] = Document.objects.filter(
+            Exists(ChatSession.objects.filter(document=OuterRef('pk')))
+        ).order_by('sort_key').values('id', 'title')
+        context['filtered_student_id'] = filters['student_id']
+        context['filtered_document_id'] = filters['document_id']
+        context['all_categories'] = category_options(get_tree_snapshot())
+        return self.render_to_response(context)
 
 
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
@@ -328,12 +441,13 @@ class SessionDetailView(LoginRequiredMixin, DetailView):
     pk_url_kwarg = 'session_id'
 
     def get_queryset(self):
-        # Ensure that related data is loaded efficiently
-        return ChatSession.objects.select_related('student', 'document').prefetch_related('messages')
+        # Messages are not loaded here: the transcript is assembled from cached fragments
+        return ChatSession.objects.select_related('student', 'document')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['ai_influence_choices'] = ChatSession.AI_INFLUENCE_CHOICES
+        context['transcript_html'] = mark_safe(get_transcript_html(self.object))
         return context
 
     def post(self, request, *args, **kwargs):
@@ -354,23 +468,72 @@ class SessionDetailView(LoginRequiredMixin, DetailView):
         # Redirect to the same page to see the confirmation
         return redirect('dashboard:session-detail', session_id=session.id)
 
+def parse_json_object(request):
+    """The JSON object sent as the request body, or None if the body is not one."""
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        # Not JSON (json.JSONDecodeError), or not UTF-8
+        return None
+    return data if isinstance(data, dict) else None
+
+def parse_bulk_ids(data, key):
+    """Reads a list of ids from a JSON body. Returns None if it is missing or invalid."""
+    ids = data.get(key)
+    if not isinstance(ids, list) or not ids or len(ids) > MAX_BULK_IDS:
+        return None
+    try:
+        return [int(value) for value in ids]
+    except (TypeError, ValueError):
+        return None
+
+
+def transcript_etag(request, session_id, *args, **kwargs):
+    return get_transcript_etag(session_id)
+
+
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
 class SessionChatContentView(LoginRequiredMixin, View):
     """
     API view that returns the HTML content of a conversation for PDF generation.
+    Supports conditional GET: an unchanged transcript is answered with a 304.
     """
+    @method_decorator(condition(etag_func=transcript_etag))
     def get(self, request, *args, **kwargs):
-        session_id = kwargs.get('session_id')
-        session = get_object_or_404(
-            ChatSession.objects.prefetch_related('messages'),
-            id=session_id
-        )
-        # Use a partial template to render only the chat
-        html_content = render_to_string(
-            'dashboard/partials/chat_content.html', 
-            {'session': session, 'is_pdf_render': True}
-        )
-        return JsonResponse({'html': html_content})
+        session = get_object_or_404(ChatSession, id=kwargs.get('session_id'))
+        response = JsonResponse({'html': get_transcript_html(session)})
+        # The browser must revalidate, which is cheap thanks to the ETag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+@method_decorator(user_passes_test(is_teacher), name='dispatch')
+class MessageImageView(LoginRequiredMixin, View):
+    """
+    Serves an image of a chat message, so that transcripts can reference images
+    by URL instead of inlining their base64 data.
+    """
+    def get(self, request, message_id, index, *args, **kwargs):
+        url = get_message_image(message_id, index)
+        decoded = decode_data_url(url)
+        if decoded is None:
+            # Not an inline image: only the media of this site are redirected to, never
+            # a URL of the student's choosing (open redirect, javascript: URLs)
+            if url and is_media_url(url):
+                return redirect(url)
+            raise Http404("Image not found.")
+        content_type, data = decoded
+        if not content_type.startswith('image/'):
+            raise Http404("Image not found.")
+
+        # The ETag is the image's own: a missing image never gets a 304
+        response = get_conditional_response(request, etag=get_message_image_etag(url))
+        if response is None:
+            response = HttpResponse(data, content_type=content_type)
+        response['ETag'] = get_message_image_etag(url)
+        # Messages are immutable, so are their images
+        patch_cache_control(response, private=True, max_age=60 * 60 * 24 * 365, immutable=True)
+        return response
 
 
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
@@ -402,14 +565,46 @@ class CoAnalysisView(LoginRequiredMixin, DetailView):
 
         teacher_analysis_data = {
             'error_analysis': error_analysis,
-            'notes': request.POST.get('teacher_diagnostic_notes', '')
+            'notes': request.POST.get('teacher_diagnostic_notes', ''),
+            # Who analysed the session and when, for the agreement analytics
+            'teacher_id': request.user.id,
+            'analysed_at': timezone.now().isoformat(),
         }
         session.teacher_analysis = teacher_analysis_data
         session.save()
+        bump_agreement_version()
         # Redirect to the same page to see the comparison result
         return redirect('dashboard:co-analysis', pk=session.pk)
 
 
+@method_decorator(user_passes_test(is_teacher), name='dispatch')
+class AgreementDashboardView(LoginRequiredMixin, TemplateView):
+    """
+    Displays how often the teachers' diagnoses agree with the AI's, over all co-analysed sessions.
+    """
+    template_name = 'dashboard/agreement.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['windows'] = AGREEMENT_WINDOWS
+        return context
+
+
+@method_decorator(user_passes_test(is_teacher), name='dispatch')
+class AgreementAnalyticsAPIView(LoginRequiredMixin, View):
+    """
+    Provides the teacher-AI agreement analytics (kappa, confusion matrices, trends).
+    ?window=week|month sets the time window of the trend.
+    """
+    def get(self, request, *args, **kwargs):
+        window = request.GET.get('window', 'month')
+        if window not in AGREEMENT_WINDOWS:
+            return JsonResponse({'error': 'Invalid time window.'}, status=400)
+
+        analytics = get_cached_payload(AGREEMENT_SCOPE, 'analytics', lambda: build_agreement_analytics(window), window)
+        return JsonResponse(analytics)
+
+
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
 class DeleteSessionView(LoginRequiredMixin, View):
     """
@@ -420,11 +615,50 @@ class DeleteSessionView(LoginRequiredMixin, View):
         try:
             session = ChatSession.objects.get(id=session_id)
             session.delete()
+            bump_student_classes(session.student_id)
+            bump_agreement_version()
             return JsonResponse({'success': True, 'message': 'Session deleted successfully.'})
         except ChatSession.DoesNotExist:
             return JsonResponse({'error': 'Session not found.'}, status=404)
 
 
+@method_decorator(user_passes_test(is_teacher), name='dispatch')
+class SessionBulkDeleteView(LoginRequiredMixin, View):
+    """
+    API view to delete several sessions (and their messages) at once.
+    """
+    def post(self, request, *args, **kwargs):
+        data = parse_json_object(request)
+        session_ids = parse_bulk_ids(data, 'session_ids') if data is not None else None
+        if session_ids is None:
+            return JsonResponse({'error': f'A list of at most {MAX_BULK_IDS} session ids is required.'}, status=400)
+
+        deleted = delete_sessions(session_ids)
+        return JsonResponse({'success': True, 'deleted': deleted})
+
+
+@method_decorator(user_passes_test(is_teacher), name='dispatch')
+class ResearchExportView(LoginRequiredMixin, View):
+    """
+    Streams the research data (sessions, messages, summaries or teacher analyses)
+    as CSV or JSON Lines. Accepts the filters of the session list.
+    """
+    def get(self, request, kind, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
+        if kind not in EXPORT_KINDS or export_format not in EXPORT_FORMATS:
+            return JsonResponse({'error': 'Invalid export type or format.'}, status=400)
+
+        lines = stream_export(
+            kind, export_format,
+            filters=request.GET,
+            pseudonymize=request.GET.get('pseudonymize') in ('1', 'true', 'on'),
+        )
+        content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(lines, content_type=f'{content_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="catalyst-{kind}.{export_format}"'
+        return response
+
+
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
 class SessionSummaryView(LoginRequiredMixin, View):
     """
@@ -457,25 +691,37 @@ class ClassManagementView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        User = get_user_model()
+        # Only the classes and their sizes: the members are loaded per class by the roster API
+        context['classes'] = classes_with_counts()
+        return context
 
-        # Get all classes (Groups except 'Professeurs')
-        classes = Group.objects.exclude(name='Professeurs').prefetch_related('user_set').order_by('name')
-        
-        # Get unassigned students
-        assigned_student_ids = ChatMessage.objects.filter(
-            session__student__groups__isnull=False
-        ).values_list('session__student_id', flat=True).distinct()
 
-        unassigned_students = User.objects.exclude(
-            groups__name='Professeurs'
-        ).exclude(
-            id__in=assigned_student_ids
-        ).filter(groups__isnull=True).order_by('username')
+@method_decorator(user_passes_test(is_teacher), name='dispatch')
+class ClassRosterAPIView(LoginRequiredMixin, View):
+    """
+    API view listing the classes with their number of members.
+    """
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({
+            'classes': list(classes_with_counts().values('id', 'name', 'member_count')),
+        })
 
-        context['classes'] = classes
-        context['unassigned_students'] = unassigned_students
-        return context
+
+@method_decorator(user_passes_test(is_teacher), name='dispatch')
+class ClassMembersAPIView(LoginRequiredMixin, View):
+    """
+    API view listing the members of a class, or the unassigned students when no class is given.
+    Paginated by username: ?after=<last username of the previous page>.
+    """
+    def get(self, request, class_id=None, *args, **kwargs):
+        after = request.GET.get('after')
+        if class_id is None:
+            students, next_after = unassigned_students(after, MEMBERS_PAGE_SIZE)
+        else:
+            if not Group.objects.filter(id=class_id).exists():
+                return JsonResponse({'error': 'Class not found.'}, status=404)
+            students, next_after = class_members(class_id, after, MEMBERS_PAGE_SIZE)
+        return JsonResponse({'students': students, 'next_after': next_after})
 
 
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
@@ -503,6 +749,8 @@ class ClassActionView(LoginRequiredMixin, View):
                 return JsonResponse({'error': 'New name is required.'}, status=400)
             group.name = new_name
             group.save()
+            bump_class_version(group.id)
+            bump_agreement_version()
             return JsonResponse({'id': group.id, 'name': group.name})
 
         elif action == 'delete':
@@ -534,6 +782,7 @@ class StudentCreateView(LoginRequiredMixin, View):
             try:
                 group = Group.objects.get(id=class_id)
                 student.groups.add(group)
+                bump_class_version(group.id)
             except Group.DoesNotExist:
                 pass # The student is created but not assigned
 
@@ -544,6 +793,44 @@ class StudentCreateView(LoginRequiredMixin, View):
         })
 
 
+@method_decorator(user_passes_test(is_teacher), name='dispatch')
+class RosterImportView(LoginRequiredMixin, View):
+    """
+    Imports a roster of students (CSV or JSON file with the columns username, password, class).
+    The file is validated before the response starts (errors get a 400), then the progress
+    events of the import are streamed as JSON Lines. A failure during the import ends the
+    stream with an 'error' record.
+    """
+    def post(self, request, *args, **kwargs):
+        roster_file = request.FILES.get('roster')
+        if not roster_file:
+            return JsonResponse({'error': 'A roster file is required.'}, status=400)
+
+        roster_format = 'json' if roster_file.name.lower().endswith('.json') else 'csv'
+        create_classes = request.POST.get('create_classes') in ('1', 'true', 'on')
+        try:
+            rows = parse_roster(roster_file.read().decode('utf-8'), roster_format)
+            events = import_roster(rows, create_classes)
+            # The first event comes once the roster is validated
+            first_event = next(events)
+        except UnicodeDecodeError:
+            return JsonResponse({'error': 'The roster file must be encoded in UTF-8.'}, status=400)
+        except RosterError as e:
+            return JsonResponse({'error': str(e), 'errors': e.errors}, status=400)
+
+        return StreamingHttpResponse(self.stream(first_event, events), content_type='application/x-ndjson')
+
+    def stream(self, first_event, events):
+        yield json.dumps(first_event) + "\n"
+        try:
+            for event in events:
+                yield json.dumps(event) + "\n"
+        except Exception:
+            # The import runs in one transaction: nothing was created
+            logger.exception("Roster import failed")
+            yield json.dumps({'stage': 'error', 'error': 'The import failed: no student was created.'}) + "\n"
+
+
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
 class StudentActionView(LoginRequiredMixin, View):
     def post(self, request, user_id, *args, **kwargs):
@@ -552,86 +839,218 @@ class StudentActionView(LoginRequiredMixin, View):
 
         if action == 'move':
             target_class_id = request.POST.get('target_class_id')
+            previous_class_ids = list(student.groups.values_list('id', flat=True))
             student.groups.clear() # Remove the student from all current classes
             if target_class_id:
                 target_class = get_object_or_404(Group, id=target_class_id)
                 student.groups.add(target_class)
+            bump_class_version(target_class_id, *previous_class_ids)
+            bump_agreement_version()
             return JsonResponse({'success': True, 'student_id': user_id, 'target_class_id': target_class_id or ''})
 
         elif action == 'delete':
             # Warning: this deletes the user and all associated data (sessions, etc.)
+            previous_class_ids = list(student.groups.values_list('id', flat=True))
             student.delete()
+            bump_class_version(*previous_class_ids)
+            bump_agreement_version()
             return JsonResponse({'success': True, 'student_id': user_id})
 
         return JsonResponse({'error': 'Invalid action.'}, status=400)
 
 
+@method_decorator(user_passes_test(is_teacher), name='dispatch')
+class StudentBulkActionView(LoginRequiredMixin, View):
+    """
+    API view to move or delete several students at once (e.g. moving a class up a year).
+    Takes a list of student_ids, or from_class_id to act on every member of a class.
+    """
+    def post(self, request, *args, **kwargs):
+        data = parse_json_object(request)
+        if data is None:
+            return JsonResponse({'error': 'A JSON object is required.'}, status=400)
+        if any(data.get(key) and not str(data[key]).isdigit() for key in ('from_class_id', 'target_class_id')):
+            return JsonResponse({'error': 'Invalid class id.'}, status=400)
+        action = data.get('action')
+        if data.get('from_class_id'):
+            data['student_ids'] = list(get_user_model().objects.filter(
+                groups__id=data['from_class_id']
+            ).values_list('id', flat=True)[:MAX_BULK_IDS + 1])
+            if not data['student_ids']:
+                return JsonResponse({'success': True, 'moved': 0, 'deleted': 0})
+            if len(data['student_ids']) > MAX_BULK_IDS:
+                # Never act on part of a class: the rest would be silently left behind
+                return JsonResponse({'error': f'The class has more than {MAX_BULK_IDS} students; select them in batches.'}, status=400)
+        student_ids = parse_bulk_ids(data, 'student_ids')
+        if student_ids is None:
+            return JsonResponse({'error': f'A list of at most {MAX_BULK_IDS} student ids is required.'}, status=400)
+
+        if action == 'move':
+            try:
+                moved = move_students(student_ids, data.get('target_class_id') or None)
+            except Group.DoesNotExist:
+                return JsonResponse({'error': 'Class not found.'}, status=404)
+            return JsonResponse({'success': True, 'moved': moved, 'target_class_id': data.get('target_class_id') or ''})
+
+        elif action == 'delete':
+            # Warning: this deletes the users and all associated data (sessions, etc.)
+            deleted = delete_students(student_ids)
+            return JsonResponse({'success': True, 'deleted': deleted})
+
+        return JsonResponse({'error': 'Invalid action.'}, status=400)
+
+
+GROUPING_SYSTEM_PROMPT = """
+Tu es un assistant pédagogique expert. Un enseignant crée des groupes de travail pour sa classe "{class_name}".
+Les groupes sont calculés par un algorithme de répartition à partir des profils des élèves. Ton rôle est d'expliquer la répartition
+et de traduire les demandes de l'enseignant en paramètres pour l'algorithme. Toutes tes réponses doivent être en français.
+
+Voici les données des élèves de la classe :
+{students}
+
+Réponds UNIQUEMENT avec un objet JSON contenant les clés :
+- "reply" : ta réponse à l'enseignant ;
+- "mode" : "heterogeneous" ou "homogeneous" ;
+- "num_groups" : le nombre de groupes ;
+- "keep_together" : liste de listes de noms d'élèves à garder ensemble ;
+- "keep_apart" : liste de listes de noms d'élèves à séparer.
+Reprends les paramètres actuels et ne les modifie que si l'enseignant le demande.
+"""
+
+
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
 class CreateStudentGroupsView(LoginRequiredMixin, View):
     """
-    Vue API pour interagir avec l'IA afin de créer des groupes d'élèves.
+    Vue API pour créer des groupes d'élèves.
+    La répartition est calculée localement par le moteur de regroupement ; l'IA n'intervient
+    que pour expliquer la répartition et traduire les demandes de l'enseignant en contraintes.
+
+    Le premier appel (class_id, num_groups, mode) calcule la synthèse de la classe une fois par
+    version des données et ouvre une conversation côté serveur. Les appels suivants n'envoient
+    que conversation_id et le nouveau message de l'enseignant.
     """
     def post(self, request, *args, **kwargs):
-        data = json.loads(request.body)
+        data = parse_json_object(request)
+        if data is None:
+            return JsonResponse({'error': 'A JSON object is required.'}, status=400)
+        if data.get('conversation_id'):
+            return self.continue_conversation(request, data)
+        return self.start_conversation(request, data)
+
+    def start_conversation(self, request, data):
         class_id = data.get('class_id')
         num_groups = data.get('num_groups')
-        messages = data.get('messages', [])
 
         if not class_id or not num_groups:
             return JsonResponse({'error': 'Class ID and number of groups are required.'}, status=400)
+        try:
+            num_groups = int(num_groups)
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'The number of groups must be an integer.'}, status=400)
+        mode = data.get('mode') or 'heterogeneous'
+        if mode not in GROUPING_MODES:
+            return JsonResponse({'error': f"Unknown grouping mode: {mode}."}, status=400)
 
         try:
             teacher_class = Group.objects.get(id=class_id)
         except Group.DoesNotExist:
             return JsonResponse({'error': 'Class not found.'}, status=404)
 
-        # 1. Get students and their overall performance
-        students = get_user_model().objects.filter(groups=teacher_class)
-        student_data_for_prompt = []
-        for student in students:
-            all_sessions = list(student.chatsession_set.all())
-            if not all_sessions:
-                student_data_for_prompt.append(f"- {student.username}: Aucune session.")
-                continue
-
-            total_duration = sum(((s.end_time - s.start_time).total_seconds() for s in all_sessions if s.end_time), 0)
-            aggregated_errors = defaultdict(int)
-            for s in all_sessions:
-                if s.summary_data and 'error_analysis' in s.summary_data:
-                    for error, count in s.summary_data['error_analysis'].items():
-                        aggregated_errors[error] += count
-            
-            student_data_for_prompt.append(
-                f"- {student.username}: {len(all_sessions)} sessions, "
-                f"{int(total_duration / 60)} min au total, "
-                f"erreurs fréquentes: {json.dumps(dict(aggregated_errors))}"
-            )
-
-        # 2. Build the prompt for the AI
-        system_prompt = f"""
-        Tu es un assistant pédagogique expert. Un enseignant souhaite créer {num_groups} groupes de travail pour sa classe "{teacher_class.name}".
-        Ton objectif est de proposer une répartition équilibrée (hétérogène par défaut) en te basant sur leurs performances. Toutes tes réponses doivent être en français.
-
-        Voici les données des élèves de la classe :
-        {chr(10).join(student_data_for_prompt)}
+        digest = get_cached_class_payload(teacher_class.id, 'grouping-digest', lambda: build_class_digest(teacher_class))
+        grouping_settings = {
+            'num_groups': num_groups,
+            'mode': mode,
+            'keep_together': data.get('keep_together') or [],
+            'keep_apart': data.get('keep_apart') or [],
+        }
 
-        Interagis avec l'enseignant pour affiner la répartition.
-        À la fin, tu dois fournir la répartition finale UNIQUEMENT sous forme d'un objet JSON avec la clé "groups", qui est une liste de listes de noms d'élèves.
-        Exemple pour 2 groupes: {{"groups": [["Alice", "Bob"], ["Charlie", "David"]]}}
-        
-        Commence la conversation en proposant une première répartition et en expliquant brièvement ta logique.
-        """
+        # The initial partition is computed locally, without the AI
+        try:
+            groups = compute_groups(digest['profiles'], **grouping_settings)
+        except GroupingError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'keep_together and keep_apart must be lists of lists of usernames.'}, status=400)
+        reply = (
+            f"Voici une première répartition {MODE_LABELS[grouping_settings['mode']]} calculée à partir des profils des élèves :\n"
+            f"{format_groups_text(groups, digest['profiles'])}\n\n"
+            "Vous pouvez me demander des ajustements, par exemple garder deux élèves ensemble ou les séparer."
+        )
 
-        api_messages = [{"role": "system", "content": system_prompt}] + messages
+        conversation_id = create_conversation({
+            'teacher_id': request.user.id,
+            'digest': digest,
+            'settings': grouping_settings,
+            'groups': groups,
+            'messages': [{'role': 'assistant', 'content': reply}],
+        })
+        return JsonResponse({'conversation_id': conversation_id, 'reply': reply, 'groups': groups, **grouping_settings})
+
+    def continue_conversation(self, request, data):
+        conversation_id = data.get('conversation_id')
+        message = (data.get('message') or '').strip()
+        if not message:
+            return JsonResponse({'error': 'A message is required.'}, status=400)
+
+        conversation = load_conversation(conversation_id)
+        if conversation is None or conversation['teacher_id'] != request.user.id:
+            return JsonResponse({'error': 'Conversation not found or expired.'}, status=404)
+
+        digest = conversation['digest']
+        grouping_settings = conversation['settings']
+        conversation['messages'].append({'role': 'user', 'content': message})
+
+        # Stable prefix first (class digest and instructions, then the history, which only grows),
+        # so that the provider can reuse its prompt cache; the current state comes last.
+        system_prompt = GROUPING_SYSTEM_PROMPT.format(class_name=digest['class_name'], students=digest['prompt'])
+        current_state = (
+            f"Répartition actuelle : {json.dumps(conversation['groups'], ensure_ascii=False)}\n"
+            f"Paramètres actuels : {json.dumps(grouping_settings, ensure_ascii=False)}"
+        )
+        api_messages = (
+            [{"role": "system", "content": system_prompt}]
+            + conversation['messages']
+            + [{"role": "system", "content": current_state}]
+        )
 
         try:
             client = OpenAI()
-            response = client.chat.completions.create(model="gpt-4o", messages=api_messages)
-            ai_response = response.choices[0].message.content
-            return JsonResponse({'reply': ai_response})
+            response = chat_completion(
+                client, 'grouping', model="gpt-4o", messages=api_messages, response_format={"type": "json_object"}
+            )
+            ai_data = json.loads(response.choices[0].message.content)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
+        if not isinstance(ai_data, dict):
+            ai_data = {}
+        reply = str(ai_data.get('reply') or '')
+        # The settings come from the AI: malformed values keep the previous partition
+        try:
+            new_settings = {
+                'num_groups': int(ai_data.get('num_groups') or grouping_settings['num_groups']),
+                'mode': ai_data.get('mode') if ai_data.get('mode') in GROUPING_MODES else grouping_settings['mode'],
+                'keep_together': ai_data.get('keep_together', grouping_settings['keep_together']) or [],
+                'keep_apart': ai_data.get('keep_apart', grouping_settings['keep_apart']) or [],
+            }
+            conversation['groups'] = compute_groups(digest['profiles'], **new_settings)
+            conversation['settings'] = grouping_settings = new_settings
+            reply += f"\n\n{format_groups_text(conversation['groups'], digest['profiles'])}"
+        except GroupingError as e:
+            reply += f"\n\nCes contraintes ne peuvent pas être respectées ({e}). La répartition précédente est conservée."
+        except (TypeError, ValueError):
+            reply += (
+                "\n\nJe n'ai pas pu traduire cette demande en paramètres de répartition. "
+                "Pouvez-vous la reformuler (nombre de groupes, élèves à réunir ou à séparer) ? "
+                "La répartition précédente est conservée."
+            )
+
+        conversation['messages'].append({'role': 'assistant', 'content': reply})
+        save_conversation(conversation_id, conversation)
+        return JsonResponse({
+            'conversation_id': conversation_id, 'reply': reply, 'groups': conversation['groups'], **grouping_settings
+        })
+
 
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
 class SaveGroupConfigurationView(LoginRequiredMixin, View):
@@ -662,6 +1081,21 @@ class ClassAnalyticsAPIView(LoginRequiredMixin, View):
         except Group.DoesNotExist:
             return JsonResponse({'error': 'Class not found.'}, status=404)
 
+        analytics_data = get_cached_class_payload(
+            teacher_class.id, 'analytics', lambda: self.build_analytics(teacher_class)
+        )
+        # Sessions started since the payload was built (it is rebuilt when they end)
+        activity = live_session_activity(teacher_class.id)
+        for entry in analytics_data:
+            if entry.get('student_id') in activity:
+                entry['total_sessions'] = activity[entry['student_id']]['attempts']
+        return JsonResponse({
+            'class_name': teacher_class.name,
+            'analytics': analytics_data
+        })
+
+    def build_analytics(self, teacher_class):
+        """Computes the per-student analytics of a class."""
         # Preload all sessions and messages for students in the class in 2 queries
         students = get_user_model().objects.filter(
             groups=teacher_class
@@ -686,6 +1120,7 @@ class ClassAnalyticsAPIView(LoginRequiredMixin, View):
                             error_counts[short_key] += count
 
             analytics_data.append({
+                'student_id': student.id,
                 'student_name': student.username,
                 'total_sessions': len(sessions),
                 'total_duration_minutes': int(total_duration / 60),
@@ -694,7 +1129,4 @@ class ClassAnalyticsAPIView(LoginRequiredMixin, View):
                 'error_distribution': dict(error_counts)
             })
 
-        return JsonResponse({
-            'class_name': teacher_class.name,
-            'analytics': analytics_data
-        })
+        return analytics_data
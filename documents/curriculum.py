@@ -0,0 +1,212 @@
+# documents/curriculum.py
+
+from django.db import transaction
+from .models import Category, Document, natural_sort_key
+from .search import index_documents
+from .tree import bump_tree_version, deferred_tree_invalidation
+
+SOLUTION_SUFFIX = " (Corrigé)"
+BULK_BATCH_SIZE = 500
+
+
+class CurriculumDiff:
+    """
+    Changes that bring the database in line with the curriculum: categories are identified
+    by their path of names (grade, chapter), exercises by their chapter and title, and
+    solutions by their exercise.
+    """
+    def __init__(self):
+        # Categories: (names, order) to create, (id, names, old order, new order) to reorder, (id, names) to delete
+        self.categories_to_create = []
+        self.categories_to_reorder = []
+        self.categories_to_delete = []
+        # Exercises: (chapter names, title) to create; solutions: (exercise, title, chapter names)
+        # where the exercise is an id, or the (chapter names, title) of an exercise to create
+        self.exercises_to_create = []
+        self.solutions_to_create = []
+        # Existing solutions to rename or move: (id, title, chapter names)
+        self.solutions_to_update = []
+        # Documents: (id, title, has a file)
+        self.documents_to_delete = []
+
+    def __bool__(self):
+        return any(self.counts().values())
+
+    def counts(self):
+        return {
+            'categories_created': len(self.categories_to_create),
+            'categories_reordered': len(self.categories_to_reorder),
+            'categories_deleted': len(self.categories_to_delete),
+            'documents_created': len(self.exercises_to_create) + len(self.solutions_to_create),
+            'documents_updated': len(self.solutions_to_update),
+            'documents_deleted': len(self.documents_to_delete),
+        }
+
+    def describe(self):
+        """Yields one human-readable line per change, for the dry run."""
+        for names, order in self.categories_to_create:
+            yield f"+ catégorie {' > '.join(names)} (ordre {order})"
+        for _, names, old_order, order in self.categories_to_reorder:
+            yield f"~ catégorie {' > '.join(names)} : ordre {old_order} -> {order}"
+        for _, names in self.categories_to_delete:
+            yield f"- catégorie {' > '.join(names)}"
+        for names, title in self.exercises_to_create:
+            yield f"+ exercice {' > '.join(names)} > {title}"
+        for _, title, names in self.solutions_to_create:
+            yield f"+ corrigé {' > '.join(names)} > {title}"
+        for _, title, names in self.solutions_to_update:
+            yield f"~ corrigé {' > '.join(names)} > {title}"
+        for _, title, has_file in self.documents_to_delete:
+            yield f"- document {title}" + (" (avec un fichier)" if has_file else "")
+
+
+def _category_names(categories):
+    """Path of names of every existing category, from its root."""
+    names = {}
+
+    def resolve(category_id):
+        if category_id not in names:
+            name, parent_id = categories[category_id][:2]
+            names[category_id] = (resolve(parent_id) if parent_id else ()) + (name,)
+        return names[category_id]
+
+    for category_id in categories:
+        resolve(category_id)
+    return names
+
+
+def diff_curriculum(curriculum_data):
+    """
+    Compares the curriculum (the 'curriculum' list of curriculum.json) with the database,
+    read with two queries, and returns the CurriculumDiff. Nothing is written.
+    Documents that are not in any category are left alone.
+    """
+    diff = CurriculumDiff()
+    categories = {
+        category_id: (name, parent_id, order)
+        for category_id, name, parent_id, order in Category.objects.values_list('id', 'name', 'parent_id', 'order')
+    }
+    existing_ids = {names: category_id for category_id, names in _category_names(categories).items()}
+
+    exercises, solutions, others = {}, {}, []
+    documents = Document.objects.filter(category__isnull=False).order_by('id').values_list(
+        'id', 'title', 'category_id', 'solution_for_id', 'file'
+    )
+    for document_id, title, category_id, solution_for_id, file_name in documents:
+        if solution_for_id:
+            solutions[solution_for_id] = (document_id, title, category_id, bool(file_name))
+        elif (category_id, title) not in exercises:
+            exercises[category_id, title] = (document_id, bool(file_name))
+        else:
+            # Duplicate exercise: the oldest one is kept
+            others.append((document_id, title, bool(file_name)))
+
+    kept_categories, kept_documents = set(), set()
+
+    def sync_category(names, order):
+        category_id = existing_ids.get(names)
+        if category_id is None:
+            diff.categories_to_create.append((names, order))
+        else:
+            kept_categories.add(category_id)
+            if categories[category_id][2] != order:
+                diff.categories_to_reorder.append((category_id, names, categories[category_id][2], order))
+        return category_id
+
+    for grade_index, grade_data in enumerate(curriculum_data):
+        grade = (grade_data['grade'],)
+        sync_category(grade, grade_index)
+        for chapter_index, chapter_data in enumerate(grade_data['chapters']):
+            chapter = grade + (chapter_data['name'],)
+            chapter_id = sync_category(chapter, chapter_index)
+
+            for exercise_name in sorted(chapter_data['exercises'], key=natural_sort_key):
+                solution_title = f"{exercise_name}{SOLUTION_SUFFIX}"
+                exercise_id, _ = exercises.get((chapter_id, exercise_name), (None, False))
+                if exercise_id is None:
+                    diff.exercises_to_create.append((chapter, exercise_name))
+                    diff.solutions_to_create.append(((chapter, exercise_name), solution_title, chapter))
+                    continue
+                kept_documents.add(exercise_id)
+                solution = solutions.get(exercise_id)
+                if solution is None:
+                    diff.solutions_to_create.append((exercise_id, solution_title, chapter))
+                    continue
+                solution_id, title, category_id, _ = solution
+                kept_documents.add(solution_id)
+                if title != solution_title or category_id != chapter_id:
+                    diff.solutions_to_update.append((solution_id, solution_title, chapter))
+
+    for names, category_id in sorted(existing_ids.items()):
+        if category_id not in kept_categories:
+            diff.categories_to_delete.append((category_id, names))
+    stale = [(document_id, title, has_file) for (_, title), (document_id, has_file) in exercises.items()]
+    stale += [(document_id, title, has_file) for document_id, title, _, has_file in solutions.values()]
+    diff.documents_to_delete = sorted(
+        (document for document in stale + others if document[0] not in kept_documents), key=lambda document: document[0]
+    )
+    return diff
+
+
+def _delete_in_batches(queryset, ids):
+    for start in range(0, len(ids), BULK_BATCH_SIZE):
+        queryset.filter(id__in=ids[start:start + BULK_BATCH_SIZE]).delete()
+
+
+def apply_curriculum_diff(diff):
+    """
+    Applies a CurriculumDiff in one transaction with bulk inserts, bulk updates and
+    batched deletes. The category paths are rebuilt and the tree snapshot is
+    invalidated once at the end.
+    """
+    with deferred_tree_invalidation(), transaction.atomic():
+        # Documents first: deleting their categories would only detach them
+        _delete_in_batches(Document.objects.all(), [document[0] for document in diff.documents_to_delete])
+        _delete_in_batches(Category.objects.all(), [category[0] for category in diff.categories_to_delete])
+
+        Category.objects.bulk_update(
+            [Category(id=category_id, order=order) for category_id, _, _, order in diff.categories_to_reorder],
+            ['order'], batch_size=BULK_BATCH_SIZE,
+        )
+
+        category_ids = {
+            names: category_id
+            for category_id, names in _category_names({
+                category_id: (name, parent_id)
+                for category_id, name, parent_id in Category.objects.values_list('id', 'name', 'parent_id')
+            }).items()
+        }
+        # Parents before children: one insert per level
+        for depth in sorted({len(names) for names, _ in diff.categories_to_create}):
+            level = [(names, order) for names, order in diff.categories_to_create if len(names) == depth]
+            created = Category.objects.bulk_create([
+                Category(
+                    name=names[-1], parent_id=category_ids.get(names[:-1]), order=order,
+                    sort_key=natural_sort_key(names[-1]),
+                )
+                for names, order in level
+            ], batch_size=BULK_BATCH_SIZE)
+            category_ids.update((names, category.id) for (names, _), category in zip(level, created))
+
+        created = Document.objects.bulk_create([
+            Document(category_id=category_ids[names], title=title, sort_key=natural_sort_key(title))
+            for names, title in diff.exercises_to_create
+        ], batch_size=BULK_BATCH_SIZE)
+        exercise_ids = {exercise: document.id for exercise, document in zip(diff.exercises_to_create, created)}
+        created += Document.objects.bulk_create([
+            Document(
+                category_id=category_ids[names], title=title, sort_key=natural_sort_key(title),
+                solution_for_id=exercise_ids.get(exercise, exercise),
+            )
+            for exercise, title, names in diff.solutions_to_create
+        ], batch_size=BULK_BATCH_SIZE)
+        Document.objects.bulk_update([
+            Document(id=solution_id, title=title, sort_key=natural_sort_key(title), category_id=category_ids[names])
+            for solution_id, title, names in diff.solutions_to_update
+        ], ['title', 'sort_key', 'category'], batch_size=BULK_BATCH_SIZE)
+
+        # Bulk writes bypass Category.save() and the signals
+        Category.rebuild_paths()
+        index_documents([document.id for document in created] + [solution[0] for solution in diff.solutions_to_update])
+        if diff:
+            bump_tree_version()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from documents.search import PdfReader, index_documents
+
+
+class Command(BaseCommand):
+    help = "Met à jour l'index de recherche des documents (titres, catégories et texte des PDF)."
+
+    def handle(self, *args, **options):
+        if PdfReader is None:
+            self.stdout.write(self.style.WARNING("pypdf n'est pas installé : le texte des PDF ne sera pas indexé."))
+        # Seules les entrées modifiées sont réécrites, les PDF inchangés ne sont pas relus
+        updated = index_documents()
+        self.stdout.write(self.style.SUCCESS(f"{updated} entrées de l'index mises à jour."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from documents.models import Document
+from documents.previews import render_previews, renderer_available
+
+
+class Command(BaseCommand):
+    help = "Prépare les aperçus (images des pages) des PDF des documents."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Refait aussi les aperçus déjà préparés.")
+
+    def handle(self, *args, **options):
+        if not renderer_available():
+            self.stdout.write(self.style.ERROR("Ni PyMuPDF ni pdftoppm n'est installé : aucun aperçu ne peut être préparé."))
+            return
+
+        documents = Document.objects.exclude(file='').exclude(file_hash='')
+        if not options['force']:
+            documents = documents.filter(page_count=0)
+        rendered = failed = 0
+        done = set()
+        for document_id, file_hash in documents.order_by('id').values_list('id', 'file_hash').iterator():
+            # Les fichiers identiques ne sont rendus qu'une fois
+            force = options['force'] and file_hash not in done
+            done.add(file_hash)
+            if render_previews(document_id, force=force):
+                rendered += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f"{rendered} documents prêts, {failed} PDF illisibles ou absents."))
@@ -1,16 +1,17 @@
 import json
-import re
 from pathlib import Path
 
 from django.core.management.base import BaseCommand
-from django.db import transaction
 
-from documents.models import Category, Document
+from documents.curriculum import diff_curriculum, apply_curriculum_diff
 
 
 class Command(BaseCommand):
     help = "Synchronise la structure du programme scolaire depuis un fichier JSON vers la base de données."
 
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Affiche les changements sans modifier la base de données.")
+
     def handle(self, *args, **options):
         # Chemin vers le fichier JSON
         json_path = Path(__file__).resolve().parent.parent.parent.parent / 'data' / 'curriculum.json'
@@ -24,54 +25,30 @@ class Command(BaseCommand):
 
         self.stdout.write("Début de la synchronisation du programme scolaire...")
 
+        # La base est lue une seule fois, les changements sont calculés en mémoire
+        diff = diff_curriculum(data['curriculum'])
+        counts = diff.counts()
+        report = (
+            f"Catégories : {counts['categories_created']} ajoutées, {counts['categories_reordered']} réordonnées, "
+            f"{counts['categories_deleted']} supprimées. Documents : {counts['documents_created']} ajoutés, "
+            f"{counts['documents_updated']} modifiés, {counts['documents_deleted']} supprimés."
+        )
+
+        if options['dry_run']:
+            for line in diff.describe():
+                self.stdout.write(line)
+            self.stdout.write(report)
+            self.stdout.write(self.style.WARNING("Simulation : aucune modification n'a été enregistrée."))
+            return
+
+        if not diff:
+            self.stdout.write(self.style.SUCCESS("La base de données est déjà à jour."))
+            return
+
         try:
-            # Utiliser une transaction pour assurer l'intégrité des données
-            with transaction.atomic():
-                self._sync_curriculum(data['curriculum'])
+            # Les changements sont appliqués en une seule transaction
+            apply_curriculum_diff(diff)
+            self.stdout.write(report)
             self.stdout.write(self.style.SUCCESS("Synchronisation terminée avec succès !"))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Une erreur est survenue : {e}"))
-
-    def _sync_curriculum(self, curriculum_data):
-        """Logique de synchronisation."""
-
-        # Helper pour le tri naturel (gère "NO2" avant "NO10")
-        def natural_sort_key(s):
-            return [int(text) if text.isdigit() else text.lower() for text in re.split('([0-9]+)', s)]
-
-        # On garde une trace des IDs pour nettoyer les anciens éléments
-        processed_category_ids = set()
-        processed_document_ids = set()
-
-        for grade_index, grade_data in enumerate(curriculum_data):
-            grade_name = grade_data['grade']
-            grade_cat, _ = Category.objects.update_or_create(name=grade_name, parent=None, defaults={'order': grade_index})
-            processed_category_ids.add(grade_cat.id)
-
-            for chapter_index, chapter_data in enumerate(grade_data['chapters']):
-                chapter_name = chapter_data['name']
-                chapter_cat, _ = Category.objects.update_or_create(name=chapter_name, parent=grade_cat, defaults={'order': chapter_index})
-                processed_category_ids.add(chapter_cat.id)
-
-                for exercise_name in sorted(chapter_data['exercises'], key=natural_sort_key):
-                    # Créer ou récupérer l'exercice
-                    exercise_doc, _ = Document.objects.get_or_create(
-                        category=chapter_cat,
-                        title=exercise_name,
-                        solution_for=None,
-                    )
-                    processed_document_ids.add(exercise_doc.id)
-
-                    # Créer ou récupérer le corrigé associé
-                    solution_doc, _ = Document.objects.get_or_create(
-                        category=chapter_cat,
-                        title=f"{exercise_name} (Corrigé)",
-                        solution_for=exercise_doc,
-                    )
-                    processed_document_ids.add(solution_doc.id)
-
-        # Nettoyage : supprimer les catégories et documents qui ne sont plus dans le JSON
-        Document.objects.exclude(id__in=processed_document_ids).delete()
-        Category.objects.exclude(id__in=processed_category_ids).delete()
-
-        self.stdout.write(f"{len(processed_category_ids)} catégories et {len(processed_document_ids)} documents traités.")
\ No newline at end of file
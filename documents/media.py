@@ -0,0 +1,153 @@
+# documents/media.py
+
+import hashlib
+import os
+import re
+from urllib.parse import quote, urlparse
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import Resolver404, resolve, reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+CHUNK_SIZE = 64 * 1024
+# Hashed URLs never change content: they can be cached for a year
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+# Digest used in the URL of a file whose hash is not known yet (its URL is not cacheable)
+UNHASHED_DIGEST = 'latest'
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Uploaded files are stored once per content, at a path derived from their SHA-256
+CONTENT_ROOT = 'documents/sha256'
+
+
+def file_digest(file):
+    """SHA-256 of a file (uploaded or stored), read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in file.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_path(file_hash, extension='.pdf'):
+    return f"{CONTENT_ROOT}/{file_hash[:2]}/{file_hash}{extension}"
+
+
+def store_content(file, file_hash):
+    """
+    Stores a file in the content-addressed store and returns its name. Content that is
+    already stored (uploaded for another document) is not written again.
+    """
+    name = content_path(file_hash, os.path.splitext(file.name or '')[1].lower() or '.pdf')
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, file)
+
+
+def document_file_url(document_id, file_hash, file_name):
+    """URL of a document's file. It contains the content hash, so it changes with the content."""
+    if not file_name:
+        return None
+    return reverse('documents:file', args=[document_id, file_hash or UNHASHED_DIGEST, os.path.basename(file_name)])
+
+
+def document_id_from_url(url):
+    """Id of the document served at `url` (as built by `document_file_url`), or None."""
+    try:
+        match = resolve(urlparse(url or '').path)
+    except Resolver404:
+        return None
+    return match.kwargs.get('pk') if match.view_name == 'documents:file' else None
+
+
+def parse_range(header, size):
+    """
+    Reads a single-range "Range: bytes=start-end" header. Returns (start, end) inclusive,
+    None if the header should be ignored (absent, malformed or multiple ranges), and
+    raises ValueError if the range cannot be satisfied.
+    """
+    match = RANGE_PATTERN.match(header or '')
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        # Suffix range: the last `end` bytes
+        length = int(end)
+        if not length:
+            raise ValueError("Empty suffix range.")
+        return max(size - length, 0), size - 1
+    start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range out of the file.")
+    return start, end
+
+
+def _stream(file_name, start, length):
+    with default_storage.open(file_name, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _sendfile_response(file_name):
+    """
+    Lets the front-end server send the file (and handle ranges) when it is configured
+    for it (MEDIA_SENDFILE = 'nginx' or 'apache') and the files are on the local disk.
+    """
+    backend = getattr(settings, 'MEDIA_SENDFILE', '')
+    if not backend or not isinstance(default_storage, FileSystemStorage):
+        return None
+    response = HttpResponse()
+    if backend == 'nginx':
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_SENDFILE_PREFIX + file_name)
+    else:
+        response['X-Sendfile'] = default_storage.path(file_name)
+    return response
+
+
+def serve_file(request, file_name, etag, immutable, content_type='application/pdf'):
+    """
+    Serves a stored file with a strong ETag (and 304 responses), single HTTP range
+    requests (206/416) and long-lived caching for immutable URLs. The transfer itself
+    is delegated to the front-end server when sendfile is configured.
+    """
+    def finish(response):
+        response['ETag'] = etag
+        response['Accept-Ranges'] = 'bytes'
+        if immutable:
+            patch_cache_control(response, private=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    conditional = get_conditional_response(request, etag=etag)
+    if conditional is not None:
+        return finish(conditional)
+
+    response = _sendfile_response(file_name)
+    if response is not None:
+        response['Content-Type'] = content_type
+        return finish(response)
+
+    size = default_storage.size(file_name)
+    byte_range = None
+    # If-Range: a range of another version of the file is not sent
+    if request.headers.get('If-Range', etag) == etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            return finish(response)
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    response = StreamingHttpResponse(_stream(file_name, start, length), content_type=content_type)
+    response['Content-Length'] = str(length)
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    return finish(response)
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.24 on 2026-10-19 11:22
+
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    """Computes the materialized path of the existing categories from their parent links."""
+    Category = apps.get_model("documents", "Category")
+    parents = dict(Category.objects.values_list("pk", "parent_id"))
+    paths = {}
+
+    def compute(pk):
+        if pk not in paths:
+            parent_id = parents[pk]
+            paths[pk] = (compute(parent_id) if parent_id else "") + f"{pk:08d}/"
+        return paths[pk]
+
+    categories = [
+        Category(pk=pk, path=compute(pk), depth=compute(pk).count("/") - 1) for pk in parents
+    ]
+    Category.objects.bulk_update(categories, ["path", "depth"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0004_alter_category_options_category_order"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="path",
+            field=models.CharField(
+                db_index=True,
+                default="",
+                editable=False,
+                max_length=255,
+                verbose_name="Materialized Path",
+            ),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="depth",
+            field=models.PositiveSmallIntegerField(
+                default=0, editable=False, verbose_name="Depth"
+            ),
+        ),
+        migrations.RunPython(populate_paths, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.24 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+from documents.models import natural_sort_key
+
+
+def populate_sort_keys(apps, schema_editor):
+    """Computes the natural sort key of the existing categories and documents."""
+    for model_name, field in (("Category", "name"), ("Document", "title")):
+        model = apps.get_model("documents", model_name)
+        objects = [
+            model(pk=pk, sort_key=natural_sort_key(value)) for pk, value in model.objects.values_list("pk", field)
+        ]
+        model.objects.bulk_update(objects, ["sort_key"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0005_category_path"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="sort_key",
+            field=models.CharField(
+                default="", editable=False, max_length=255, verbose_name="Natural Sort Key"
+            ),
+        ),
+        migrations.AddField(
+            model_name="document",
+            name="sort_key",
+            field=models.CharField(
+                default="", editable=False, max_length=255, verbose_name="Natural Sort Key"
+            ),
+        ),
+        migrations.RunPython(populate_sort_keys, reverse_code=migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="category",
+            index=models.Index(
+                fields=["parent", "order", "sort_key"], name="category_parent_sort_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="document",
+            index=models.Index(
+                fields=["category", "sort_key"], name="document_category_sort_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="document",
+            index=models.Index(fields=["sort_key"], name="document_sort_idx"),
+        ),
+    ]
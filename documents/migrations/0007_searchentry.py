@@ -0,0 +1,121 @@
+# Generated by Django 4.2.24 on 2026-10-19 12:40
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_INDEX = [
+    """CREATE VIRTUAL TABLE documents_search USING fts5(
+        title_terms, path_terms, content,
+        content='documents_searchentry', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER documents_search_insert AFTER INSERT ON documents_searchentry BEGIN
+        INSERT INTO documents_search(rowid, title_terms, path_terms, content)
+        VALUES (new.id, new.title_terms, new.path_terms, new.content);
+    END""",
+    """CREATE TRIGGER documents_search_delete AFTER DELETE ON documents_searchentry BEGIN
+        INSERT INTO documents_search(documents_search, rowid, title_terms, path_terms, content)
+        VALUES ('delete', old.id, old.title_terms, old.path_terms, old.content);
+    END""",
+    """CREATE TRIGGER documents_search_update AFTER UPDATE ON documents_searchentry BEGIN
+        INSERT INTO documents_search(documents_search, rowid, title_terms, path_terms, content)
+        VALUES ('delete', old.id, old.title_terms, old.path_terms, old.content);
+        INSERT INTO documents_search(rowid, title_terms, path_terms, content)
+        VALUES (new.id, new.title_terms, new.path_terms, new.content);
+    END""",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS documents_search_insert",
+    "DROP TRIGGER IF EXISTS documents_search_delete",
+    "DROP TRIGGER IF EXISTS documents_search_update",
+    "DROP TABLE IF EXISTS documents_search",
+]
+POSTGRES_INDEX = [
+    """CREATE INDEX documents_searchentry_fts_idx ON documents_searchentry USING GIN ((
+        setweight(to_tsvector('simple', title_terms), 'A') ||
+        setweight(to_tsvector('simple', path_terms), 'B') ||
+        setweight(to_tsvector('simple', content), 'D')
+    ))""",
+]
+POSTGRES_DROP = ["DROP INDEX IF EXISTS documents_searchentry_fts_idx"]
+
+
+def normalize_terms(text):
+    """
+    Frozen copy of documents.search.normalize_terms as of this migration: folded text
+    (lower case, no accents), with the numbers also split from the letters.
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    split = re.sub(r"(\d+)", r" \1 ", text)
+    return " ".join(text.split() + (split.split() if split != text else []))
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    """Full-text index of the entries: FTS5 on SQLite, GIN on Postgres, none elsewhere."""
+    _run(schema_editor, {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRES_INDEX})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP})
+
+
+def populate_entries(apps, schema_editor):
+    """
+    Indexes the titles and category paths of the existing documents. The PDF text is
+    added by `manage.py index_documents`.
+    """
+    Category = apps.get_model("documents", "Category")
+    Document = apps.get_model("documents", "Document")
+    SearchEntry = apps.get_model("documents", "SearchEntry")
+    labels = {}
+    for category_id, name, parent_id in Category.objects.order_by("depth").values_list("id", "name", "parent_id"):
+        labels[category_id] = f"{labels[parent_id]} > {name}" if parent_id in labels else name
+    entries = []
+    for document_id, title, category_id in Document.objects.values_list("id", "title", "category_id"):
+        path = labels.get(category_id, "")
+        entries.append(SearchEntry(
+            document_id=document_id, title=title, path=path,
+            title_terms=normalize_terms(title), path_terms=normalize_terms(path),
+        ))
+    SearchEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0006_natural_sort_keys"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("title", models.CharField(max_length=255, verbose_name="Title")),
+                ("path", models.CharField(blank=True, default="", max_length=255, verbose_name="Category Path")),
+                ("title_terms", models.CharField(max_length=512, verbose_name="Title Terms")),
+                ("path_terms", models.CharField(blank=True, default="", max_length=512, verbose_name="Category Path Terms")),
+                ("content", models.TextField(blank=True, default="", verbose_name="Extracted Text")),
+                ("file_name", models.CharField(blank=True, default="", max_length=255, verbose_name="Indexed File")),
+                (
+                    "document",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_entry",
+                        to="documents.document",
+                        verbose_name="Document",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_search_index, reverse_code=drop_search_index),
+        migrations.RunPython(populate_entries, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.24 on 2026-10-19 13:30
+
+import hashlib
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def hash_existing_files(apps, schema_editor):
+    """Hashes the files already uploaded. Missing files are left unhashed."""
+    Document = apps.get_model("documents", "Document")
+    documents = []
+    for document in Document.objects.exclude(file="").only("id", "file"):
+        digest = hashlib.sha256()
+        try:
+            with default_storage.open(document.file.name, "rb") as stored:
+                for chunk in iter(lambda: stored.read(64 * 1024), b""):
+                    digest.update(chunk)
+        except OSError:
+            continue
+        document.file_hash = digest.hexdigest()
+        documents.append(document)
+    Document.objects.bulk_update(documents, ["file_hash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0007_searchentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="file_hash",
+            field=models.CharField(
+                blank=True, db_index=True, default="", editable=False, max_length=64, verbose_name="File Hash"
+            ),
+        ),
+        migrations.RunPython(hash_existing_files, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0008_document_file_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="page_count",
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name="Rendered Pages"),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.24 on 2026-10-19 16:05
+
+import uuid
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("documents", "0009_document_page_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChunkedUpload",
+            fields=[
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("file_name", models.CharField(max_length=255, verbose_name="File Name")),
+                ("size", models.PositiveBigIntegerField(verbose_name="Size")),
+                ("offset", models.PositiveBigIntegerField(default=0, verbose_name="Received Bytes")),
+                ("created_at", models.DateTimeField(auto_now_add=True, verbose_name="Creation Date")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="Last Chunk Date")),
+                (
+                    "document",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="uploads",
+                        to="documents.document",
+                        verbose_name="Document",
+                    ),
+                ),
+                (
+                    "uploaded_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Uploaded by",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -1,16 +1,50 @@
-from django.db import models
+import re
+import uuid
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.conf import settings
+from .media import document_file_url, file_digest, store_content
 from django.contrib.auth import get_user_model
 
 
+# Width of the numbers in the natural sort keys ("ES2" -> "es0000000002")
+SORT_NUMBER_WIDTH = 10
+
+
+def natural_sort_key(title):
+    """
+    String whose plain (index) ordering is the natural ordering of `title`: "ES2" before
+    "ES10", "FLPp99" before "FLPp127". Numbers are zero-padded, text is case-insensitive.
+    """
+    parts = re.split(r'(\d+)', title.strip().lower())
+    return ''.join(part.zfill(SORT_NUMBER_WIDTH) if part.isdigit() else part for part in parts)[:255]
+
+
+# Width of one id in Category.path: ids are zero-padded so that string order follows the tree
+PATH_STEP = 8
+PATH_SEPARATOR = '/'
+
+
+def _path_segment(pk):
+    return f"{pk:0{PATH_STEP}d}{PATH_SEPARATOR}"
+
+
 class Category(models.Model):
     """
     Represents a folder or category in the document tree.
     Can be nested to create a hierarchy (e.g., 11th Grade > NRPR).
+
+    `path` is a materialized path (the zero-padded ids of the ancestors and of the
+    category itself, e.g. "00000003/00000012/"), kept in sync by `save`. Subtrees,
+    ancestors and breadcrumbs are read with one indexed query at any depth.
     """
     name = models.CharField(max_length=100, verbose_name="Category Name")
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children', verbose_name="Parent Category")
     order = models.PositiveIntegerField(default=0, verbose_name="Display Order")
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='', verbose_name="Materialized Path")
+    depth = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name="Depth")
+    sort_key = models.CharField(max_length=255, default='', editable=False, verbose_name="Natural Sort Key")
 
     class Meta:
         verbose_name = "Category"
@@ -18,15 +52,82 @@ class Category(models.Model):
         ordering = ['order', 'name']
         # Ensures that category names are unique within the same parent
         unique_together = ('name', 'parent')
+        indexes = [
+            # Listing the children of a category in display order
+            models.Index(fields=['parent', 'order', 'sort_key'], name='category_parent_sort_idx'),
+        ]
 
     def __str__(self):
         # Displays the full path, e.g., "11th Grade > NRPR"
-        full_path = [self.name]
-        p = self.parent
-        while p is not None:
-            full_path.append(p.name)
-            p = p.parent
-        return ' > '.join(full_path[::-1])
+        return ' > '.join(category.name for category in self.get_ancestors(include_self=True))
+
+    def save(self, *args, **kwargs):
+        self.sort_key = natural_sort_key(self.name)
+        if kwargs.get('update_fields') is not None and 'name' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'sort_key'}
+        with transaction.atomic():
+            # Paths as stored: the instance may be stale if the tree moved since it was loaded
+            stored = dict(Category.objects.filter(pk__in=[self.pk, self.parent_id]).values_list('pk', 'path'))
+            parent_path = stored.get(self.parent_id, '')
+            if self.pk and f"{self.pk:0{PATH_STEP}d}" in parent_path.split(PATH_SEPARATOR):
+                raise ValueError("A category cannot be moved under itself or one of its descendants.")
+            super().save(*args, **kwargs)
+            path = parent_path + _path_segment(self.pk)
+            old_path = stored.get(self.pk, '')
+            if path != old_path:
+                self._move_subtree(old_path, path)
+            else:
+                self.path, self.depth = path, path.count(PATH_SEPARATOR) - 1
+
+    def _move_subtree(self, old_path, new_path):
+        """Rewrites the path of the category and of all its descendants in one UPDATE."""
+        depth = new_path.count(PATH_SEPARATOR) - 1
+        if old_path:
+            old_depth = old_path.count(PATH_SEPARATOR) - 1
+            Category.objects.filter(path__startswith=old_path).update(
+                path=Concat(Value(new_path), Substr('path', len(old_path) + 1), output_field=models.CharField()),
+                depth=F('depth') + (depth - old_depth),
+            )
+        else:
+            Category.objects.filter(pk=self.pk).update(path=new_path, depth=depth)
+        self.path, self.depth = new_path, depth
+
+    @property
+    def ancestor_ids(self):
+        """Ids from the root to the parent, read from the path without any query."""
+        return [int(segment) for segment in self.path.split(PATH_SEPARATOR)[:-2]]
+
+    def get_ancestors(self, include_self=False):
+        """Ancestors from the root down (the breadcrumb), in a single query."""
+        ids = self.ancestor_ids + ([self.pk] if include_self else [])
+        return Category.objects.filter(pk__in=ids).order_by('depth')
+
+    def get_descendants(self, include_self=True):
+        """The whole subtree, in a single indexed prefix query."""
+        descendants = Category.objects.filter(path__startswith=self.path)
+        return descendants if include_self else descendants.exclude(pk=self.pk)
+
+    @classmethod
+    def rebuild_paths(cls):
+        """
+        Recomputes every path from the parent links (after bulk inserts or updates,
+        which bypass `save`). Reads the table once and only writes the rows that changed.
+        """
+        rows = {pk: (parent_id, path) for pk, parent_id, path in cls.objects.values_list('pk', 'parent_id', 'path')}
+        paths = {}
+
+        def compute(pk):
+            if pk not in paths:
+                parent_id = rows[pk][0]
+                paths[pk] = (compute(parent_id) if parent_id else '') + _path_segment(pk)
+            return paths[pk]
+
+        changed = [
+            cls(pk=pk, path=compute(pk), depth=compute(pk).count(PATH_SEPARATOR) - 1)
+            for pk in rows if compute(pk) != rows[pk][1]
+        ]
+        cls.objects.bulk_update(changed, ['path', 'depth'], batch_size=500)
+        return len(changed)
 
 
 class Document(models.Model):
@@ -39,6 +140,84 @@ class Document(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name="Upload Date")
     uploaded_by = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL, null=True, verbose_name="Uploaded by")
     solution_for = models.OneToOneField('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='solution', verbose_name="Solution for exercise")
+    sort_key = models.CharField(max_length=255, default='', editable=False, verbose_name="Natural Sort Key")
+    # SHA-256 of the file: part of its URL (see documents/media.py) and its ETag
+    file_hash = models.CharField(max_length=64, blank=True, default='', editable=False, db_index=True, verbose_name="File Hash")
+    # Number of pages rendered as images by documents/previews.py (0: not rendered)
+    page_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Rendered Pages")
+
+    class Meta:
+        indexes = [
+            # Listing the documents of a category in natural order is an index scan
+            models.Index(fields=['category', 'sort_key'], name='document_category_sort_idx'),
+            models.Index(fields=['sort_key'], name='document_sort_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    @property
+    def file_url(self):
+        """Content-hashed URL of the file, served with range and cache support."""
+        return document_file_url(self.pk, self.file_hash, self.file.name)
+
+    def save(self, *args, **kwargs):
+        self.sort_key = natural_sort_key(self.title)
+        if not self.file:
+            self.file_hash, self.page_count = '', 0
+        elif not self.file._committed:
+            # A new file: hashed, then stored once per content. Its pages are rendered again.
+            self.file_hash, self.page_count = file_digest(self.file), 0
+            self.file = store_content(self.file, self.file_hash)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {
+                *update_fields,
+                *(['sort_key'] if 'title' in update_fields else []),
+                *(['file_hash', 'page_count'] if 'file' in update_fields else []),
+            }
+        super().save(*args, **kwargs)
+
+    def delete_file(self):
+        """Detaches the file, and deletes it from the storage unless another document shares it."""
+        if self.file and not Document.objects.filter(file=self.file.name).exclude(pk=self.pk).exists():
+            self.file.delete(save=False)
+        self.file = None
+        self.save()
+
+class SearchEntry(models.Model):
+    """
+    Searchable text of a document: its title, its category path and the text extracted
+    from its PDF. The `*_terms` and `content` columns hold normalized text (lower case,
+    no accents) and are indexed by the database full-text engine (see documents/search.py).
+    """
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, related_name='search_entry', verbose_name="Document")
+    title = models.CharField(max_length=255, verbose_name="Title")
+    path = models.CharField(max_length=255, blank=True, default='', verbose_name="Category Path")
+    title_terms = models.CharField(max_length=512, verbose_name="Title Terms")
+    path_terms = models.CharField(max_length=512, blank=True, default='', verbose_name="Category Path Terms")
+    content = models.TextField(blank=True, default='', verbose_name="Extracted Text")
+    # File whose text is in `content`: the PDF is only read again when it changes
+    file_name = models.CharField(max_length=255, blank=True, default='', verbose_name="Indexed File")
+
+    def __str__(self):
+        return self.title
+
+
+class ChunkedUpload(models.Model):
+    """
+    A document file being uploaded in chunks (see documents/uploads.py). The chunks are
+    appended to a partial file on disk and `offset` counts the bytes received so far:
+    an interrupted upload resumes from there.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='uploads', verbose_name="Document")
+    uploaded_by = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, verbose_name="Uploaded by")
+    file_name = models.CharField(max_length=255, verbose_name="File Name")
+    size = models.PositiveBigIntegerField(verbose_name="Size")
+    offset = models.PositiveBigIntegerField(default=0, verbose_name="Received Bytes")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Creation Date")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Last Chunk Date")
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return f"{self.file_name} ({self.offset}/{self.size})"
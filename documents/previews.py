@@ -0,0 +1,154 @@
+# documents/previews.py
+
+import base64
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.urls import reverse
+from .models import Document
+
+try:
+    import pymupdf as fitz  # PyMuPDF
+except ImportError:  # pdftoppm (poppler-utils) is used instead when it is installed
+    fitz = None
+
+# Width in pixels of each rendered size: 'small' for thumbnails, 'large' for the
+# exercise display and the image analysis (about the PDF.js rendering at scale 2)
+PREVIEW_SIZES = {'small': 400, 'large': 1200}
+# Only the first pages are rendered: exercises are short
+MAX_PREVIEW_PAGES = 20
+PREVIEW_ROOT = 'previews'
+RENDER_TIMEOUT = 120
+
+
+def renderer_available():
+    return fitz is not None or shutil.which('pdftoppm') is not None
+
+
+def preview_path(file_hash, page, size):
+    """Storage path of a rendered page. It only depends on the content, so identical files share their pages."""
+    return f"{PREVIEW_ROOT}/{file_hash[:2]}/{file_hash}/{size}-{page}.png"
+
+
+def preview_url(document_id, file_hash, page, size):
+    return reverse('documents:preview', args=[document_id, file_hash, page, size])
+
+
+def preview_urls(document, size='large'):
+    """URLs of the rendered pages of a document, in order. Empty while they are not rendered."""
+    if not document.file_hash:
+        return []
+    return [preview_url(document.pk, document.file_hash, page, size) for page in range(1, document.page_count + 1)]
+
+
+def preview_base64(document, page=1, size='large'):
+    """A rendered page encoded in base64 (as sent to the image analysis), or None if it is not rendered."""
+    if not document or not document.file_hash or not 1 <= page <= document.page_count:
+        return None
+    try:
+        with default_storage.open(preview_path(document.file_hash, page, size), 'rb') as image:
+            return base64.b64encode(image.read()).decode('ascii')
+    except OSError:
+        return None
+
+
+def _render_with_fitz(data, width):
+    pdf = fitz.open(stream=data, filetype='pdf')
+    try:
+        images = []
+        for page in pdf.pages(0, min(pdf.page_count, MAX_PREVIEW_PAGES)):
+            zoom = width / page.rect.width
+            images.append(page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False).tobytes('png'))
+        return images
+    finally:
+        pdf.close()
+
+
+def _render_with_pdftoppm(data, width):
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'source.pdf')
+        with open(source, 'wb') as pdf:
+            pdf.write(data)
+        subprocess.run(
+            ['pdftoppm', '-png', '-l', str(MAX_PREVIEW_PAGES), '-scale-to-x', str(width), '-scale-to-y', '-1',
+             source, os.path.join(directory, 'page')],
+            check=True, capture_output=True, timeout=RENDER_TIMEOUT,
+        )
+        # page-1.png, page-2.png... (zero-padded to the number of digits of the page count)
+        names = sorted(
+            (name for name in os.listdir(directory) if name.endswith('.png')),
+            key=lambda name: int(name[len('page-'):-len('.png')]),
+        )
+        images = []
+        for name in names:
+            with open(os.path.join(directory, name), 'rb') as image:
+                images.append(image.read())
+        return images
+
+
+def render_pages(data, width):
+    """PNG images of the first pages of a PDF, `width` pixels wide. Empty if no renderer is installed."""
+    if fitz is not None:
+        return _render_with_fitz(data, width)
+    if shutil.which('pdftoppm'):
+        return _render_with_pdftoppm(data, width)
+    return []
+
+
+def render_previews(document_id, force=False):
+    """
+    Renders the pages of a document's PDF at every PREVIEW_SIZES width and records
+    their number on the document. Pages already rendered for the same content (by
+    another document) are reused. Returns the number of pages, 0 if nothing could be rendered.
+    """
+    document = Document.objects.filter(pk=document_id).only('id', 'file', 'file_hash', 'page_count').first()
+    if not document or not document.file or not document.file_hash:
+        return 0
+    if document.page_count and not force:
+        return document.page_count
+
+    file_hash = document.file_hash
+    page_count = 0 if force else (
+        Document.objects.filter(file_hash=file_hash, page_count__gt=0).values_list('page_count', flat=True).first() or 0
+    )
+    if not page_count:
+        try:
+            with default_storage.open(document.file.name, 'rb') as pdf:
+                data = pdf.read()
+            for size, width in PREVIEW_SIZES.items():
+                images = render_pages(data, width)
+                for page, image in enumerate(images, start=1):
+                    path = preview_path(file_hash, page, size)
+                    if default_storage.exists(path):
+                        default_storage.delete(path)
+                    default_storage.save(path, ContentFile(image))
+                page_count = len(images)
+        except (OSError, RuntimeError, ValueError, subprocess.SubprocessError):
+            # A missing or broken PDF keeps the client-side rendering
+            return 0
+
+    # The file may have been replaced while it was rendered: only the same content is updated.
+    # update() does not send post_save: the tree and the search index are not affected.
+    Document.objects.filter(pk=document_id, file_hash=file_hash).update(page_count=page_count)
+    return page_count
+
+
+def _render_in_thread(document_id):
+    try:
+        render_previews(document_id)
+    finally:
+        close_old_connections()
+
+
+def render_previews_in_background(document_id):
+    """Renders the previews in a thread once the current transaction is committed."""
+    if not renderer_available():
+        return
+    transaction.on_commit(
+        lambda: threading.Thread(target=_render_in_thread, args=[document_id], daemon=True).start()
+    )
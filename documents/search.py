@@ -0,0 +1,196 @@
+# documents/search.py
+
+import re
+import unicodedata
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import Q
+from .models import Category, Document, SearchEntry
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # The PDF text is not indexed without pypdf
+    PdfReader = None
+
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+MAX_QUERY_TERMS = 8
+# Only the beginning of a PDF is indexed: enough to find an exercise by its statement
+MAX_INDEXED_PAGES = 20
+MAX_INDEXED_CHARS = 20000
+BULK_BATCH_SIZE = 500
+
+# SQLite: FTS5 table over the search entries, kept in sync by triggers (migration 0007).
+# bm25() weights: a match in the title counts more than in the path, more than in the text.
+SQLITE_SEARCH_SQL = """
+    SELECT e.document_id, e.title, e.path, d.category_id, d.solution_for_id, d.file
+    FROM documents_search
+    JOIN documents_searchentry e ON e.id = documents_search.rowid
+    JOIN documents_document d ON d.id = e.document_id
+    WHERE documents_search MATCH %s {filters}
+    ORDER BY bm25(documents_search, 10.0, 3.0, 1.0), d.sort_key
+    LIMIT %s
+"""
+
+# Postgres: same expression as the GIN index of migration 0007, so that the index is used
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('simple', e.title_terms), 'A') || "
+    "setweight(to_tsvector('simple', e.path_terms), 'B') || "
+    "setweight(to_tsvector('simple', e.content), 'D')"
+)
+POSTGRES_SEARCH_SQL = f"""
+    SELECT e.document_id, e.title, e.path, d.category_id, d.solution_for_id, d.file
+    FROM documents_searchentry e
+    JOIN documents_document d ON d.id = e.document_id
+    WHERE ({POSTGRES_VECTOR}) @@ to_tsquery('simple', %s) {{filters}}
+    ORDER BY ts_rank({POSTGRES_VECTOR}, to_tsquery('simple', %s)) DESC, d.sort_key
+    LIMIT %s
+"""
+
+STUDENT_FILTERS = "AND d.solution_for_id IS NULL AND d.file <> ''"
+
+
+def _fold(text):
+    """Lower case without accents."""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in text if not unicodedata.combining(char)).lower()
+
+
+def normalize_terms(text):
+    """
+    Text as indexed: folded, and with the numbers also split from the letters ("ES12" is
+    indexed as "es12 es 12") so that "es 12" and "es12" both find it.
+    """
+    text = _fold(text)
+    split = re.sub(r'(\d+)', r' \1 ', text)
+    return ' '.join(text.split() + (split.split() if split != text else []))
+
+
+def query_terms(query):
+    """Words of a user query, folded like the index, at most MAX_QUERY_TERMS."""
+    return re.findall(r'\w+', _fold(query))[:MAX_QUERY_TERMS]
+
+
+def extract_pdf_text(file_name):
+    """Text of the first pages of a stored PDF, normalized for the index. Empty if it cannot be read."""
+    if PdfReader is None or not file_name:
+        return ''
+    try:
+        with default_storage.open(file_name, 'rb') as pdf:
+            reader = PdfReader(pdf)
+            parts = []
+            for page in reader.pages[:MAX_INDEXED_PAGES]:
+                parts.append(page.extract_text() or '')
+                if sum(map(len, parts)) >= MAX_INDEXED_CHARS:
+                    break
+    except Exception:
+        # A broken or encrypted PDF is still findable by its title and path
+        return ''
+    return normalize_terms(' '.join(parts))[:MAX_INDEXED_CHARS]
+
+
+def category_labels():
+    """Full label ("10ème > Algèbre") of every category, in one query."""
+    labels = {}
+    for category_id, name, parent_id in Category.objects.order_by('depth').values_list('id', 'name', 'parent_id'):
+        labels[category_id] = f"{labels[parent_id]} > {name}" if parent_id in labels else name
+    return labels
+
+
+def index_documents(document_ids=None, extract_text=True):
+    """
+    Brings the search entries of the given documents (all of them by default) up to
+    date, writing only the entries that changed. The PDF text is only extracted again
+    when the file changed. Returns the number of entries written.
+    """
+    documents = Document.objects.all() if document_ids is None else Document.objects.filter(id__in=document_ids)
+    # The terms of a category path are computed once for all its documents
+    paths = {category_id: (label, normalize_terms(label)) for category_id, label in category_labels().items()}
+    entries = {
+        entry.document_id: entry
+        for entry in SearchEntry.objects.filter(document__in=documents.values('id'))
+    }
+
+    to_create, to_update = [], []
+    for document_id, title, file_name, category_id in documents.values_list('id', 'title', 'file', 'category_id'):
+        path, path_terms = paths.get(category_id, ('', ''))
+        values = {
+            'title': title,
+            'path': path,
+            'title_terms': normalize_terms(title),
+            'path_terms': path_terms,
+            'file_name': file_name or '',
+        }
+        entry = entries.get(document_id)
+        if entry is None or entry.file_name != values['file_name']:
+            values['content'] = extract_pdf_text(file_name) if extract_text else ''
+        if entry is None:
+            to_create.append(SearchEntry(document_id=document_id, **values))
+        elif any(getattr(entry, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(entry, field, value)
+            to_update.append(entry)
+
+    SearchEntry.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    SearchEntry.objects.bulk_update(
+        to_update, ['title', 'path', 'title_terms', 'path_terms', 'content', 'file_name'], batch_size=BULK_BATCH_SIZE
+    )
+    return len(to_create) + len(to_update)
+
+
+def index_category(category):
+    """Updates the path of the entries of every document under a renamed or moved category."""
+    return index_documents(
+        Document.objects.filter(category__path__startswith=category.path).values('id'), extract_text=False
+    )
+
+
+def _result(document_id, title, path, category_id, solution_for_id, file_name):
+    return {
+        'id': document_id,
+        'title': title,
+        'path': path,
+        'category_id': category_id,
+        'is_solution': solution_for_id is not None,
+        'has_file': bool(file_name),
+    }
+
+
+def search_documents(query, limit=SEARCH_LIMIT, include_solutions=True):
+    """
+    Ranked documents matching every word of `query` as a prefix (for the typeahead)
+    in their title, category path or text. Students (`include_solutions=False`)
+    only get the exercises that have a file. Uses SQLite FTS5 or Postgres full-text search,
+    and a plain scan on other databases.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+    filters = '' if include_solutions else STUDENT_FILTERS
+
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        sql, params = SQLITE_SEARCH_SQL.format(filters=filters), [match, limit]
+    elif connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f"{term}:*" for term in terms)
+        sql, params = POSTGRES_SEARCH_SQL.format(filters=filters), [tsquery, tsquery, limit]
+    else:
+        return _search_without_index(terms, limit, include_solutions)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [_result(*row) for row in cursor.fetchall()]
+
+
+def _search_without_index(terms, limit, include_solutions):
+    entries = SearchEntry.objects.select_related('document')
+    for term in terms:
+        entries = entries.filter(Q(title_terms__contains=term) | Q(path_terms__contains=term) | Q(content__contains=term))
+    if not include_solutions:
+        entries = entries.filter(document__solution_for__isnull=True).exclude(document__file='')
+    return [
+        _result(entry.document_id, entry.title, entry.path, entry.document.category_id,
+                entry.document.solution_for_id, entry.document.file.name)
+        for entry in entries.order_by('document__sort_key')[:limit]
+    ]
@@ -0,0 +1,33 @@
+# documents/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Category, Document
+from .search import index_documents, index_category
+from .tree import bump_tree_version
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def invalidate_tree_snapshot(sender, **kwargs):
+    bump_tree_version()
+
+
+@receiver(post_save, sender=Document)
+def update_search_entry(sender, instance, raw=False, **kwargs):
+    # The PDF text is only extracted again when the file changed
+    if not raw:
+        index_documents([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def update_search_paths(sender, instance, created, raw=False, **kwargs):
+    # A renamed or moved category changes the path of every document under it. post_save
+    # runs before Category.save rewrites the paths and depths of a moved subtree: the
+    # entries are indexed once its transaction is committed
+    if not created and not raw:
+        transaction.on_commit(lambda: index_category(instance))
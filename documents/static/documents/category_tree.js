@@ -0,0 +1,62 @@
+// /static/documents/category_tree.js
+// Lazy category tree: only the top-level categories are in the page, the content of a
+// category is fetched from the tree API the first time it is expanded.
+function initCategoryTree(tree, { renderDocument, renderCategoryExtra = () => '' }) {
+    const nodeUrl = (categoryId) => tree.dataset.nodeUrl.replace('/0/', `/${categoryId}/`);
+
+    const renderCategory = (category) => `
+        <li data-category-id="${category.id}">
+            <div class="category-item collapsed">
+                <i class="fas fa-chevron-down icon"></i>
+                <i class="fas fa-folder"></i>
+                <span>${escapeTreeHtml(category.name)}</span>
+                ${renderCategoryExtra(category)}
+            </div>
+            <ul class="category-children" style="display: none;"></ul>
+        </li>`;
+
+    const renderNode = (node) => {
+        const children = node.children.filter(child => child.has_children).map(renderCategory);
+        const documents = node.documents.map(renderDocument);
+        const content = children.concat(documents).join('');
+        return content || '<li class="tree-empty">Aucun exercice</li>';
+    };
+
+    const load = async (item, sublist) => {
+        sublist.dataset.loaded = 'true';
+        sublist.innerHTML = '<li class="tree-loading"><i class="fas fa-spinner fa-spin"></i> Chargement...</li>';
+        try {
+            const response = await fetch(nodeUrl(item.parentElement.dataset.categoryId));
+            if (!response.ok) throw new Error(response.statusText);
+            sublist.innerHTML = renderNode(await response.json());
+        } catch (error) {
+            // Retried on the next expansion
+            delete sublist.dataset.loaded;
+            sublist.innerHTML = '<li class="tree-error">Impossible de charger cette catégorie.</li>';
+        }
+    };
+
+    const toggle = (item) => {
+        const sublist = item.nextElementSibling;
+        const expanding = item.classList.contains('collapsed');
+        item.classList.toggle('collapsed', !expanding);
+        sublist.style.display = expanding ? 'block' : 'none';
+        if (expanding && !sublist.dataset.loaded) {
+            load(item, sublist);
+        }
+    };
+
+    // One listener for the whole tree, including the levels loaded later
+    tree.addEventListener('click', (event) => {
+        const item = event.target.closest('.category-item');
+        if (item && !event.target.closest('a, button, form')) {
+            toggle(item);
+        }
+    });
+
+    return { toggle };
+}
+
+function escapeTreeHtml(text) {
+    return String(text).replace(/[&<>"']/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' })[c]);
+}
@@ -0,0 +1,46 @@
+// /static/documents/search.js
+// Typeahead over the document search API: results are requested while typing,
+// a request still in flight is cancelled by the next one.
+function initDocumentSearch(input, results, { renderResult, delay = 150 }) {
+    let timer = null;
+    let controller = null;
+
+    const close = () => {
+        results.innerHTML = '';
+        results.hidden = true;
+    };
+
+    const search = async (query) => {
+        if (controller) controller.abort();
+        controller = new AbortController();
+        try {
+            const url = `${input.dataset.searchUrl}?q=${encodeURIComponent(query)}`;
+            const response = await fetch(url, { signal: controller.signal });
+            if (!response.ok) throw new Error(response.statusText);
+            const data = await response.json();
+            results.innerHTML = data.results.length
+                ? data.results.map(renderResult).join('')
+                : '<li class="search-empty">Aucun résultat</li>';
+            results.hidden = false;
+        } catch (error) {
+            if (error.name !== 'AbortError') close();
+        }
+    };
+
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (!query) {
+            if (controller) controller.abort();
+            close();
+            return;
+        }
+        timer = setTimeout(() => search(query), delay);
+    });
+    input.addEventListener('keydown', (event) => {
+        if (event.key === 'Escape') close();
+    });
+    document.addEventListener('click', (event) => {
+        if (!results.contains(event.target) && event.target !== input) close();
+    });
+}
@@ -0,0 +1,63 @@
+// /static/documents/upload.js
+// Chunked upload of a document's file: the file is sent in chunks with PUT requests,
+// a failed chunk is retried from the offset confirmed by the server, and an upload
+// interrupted by a reload resumes where it stopped (the server recognizes the file).
+function initChunkedUpload(form, { csrfToken, onProgress, onDone, onError, maxRetries = 8 }) {
+    const input = form.querySelector('input[type="file"]');
+    const wait = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+    const request = async (url, options = {}) => {
+        const response = await fetch(url, {
+            ...options,
+            headers: { 'X-CSRFToken': csrfToken, ...(options.headers || {}) },
+        });
+        const data = await response.json();
+        // 409: not the expected chunk, `data.offset` says where to resume
+        if (!response.ok && response.status !== 409) {
+            const error = new Error(data.error || response.statusText);
+            error.fatal = response.status < 500;
+            throw error;
+        }
+        return data;
+    };
+
+    const upload = async (file) => {
+        let status = await request(form.dataset.startUrl, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ name: file.name, size: file.size }),
+        });
+        const url = form.dataset.uploadUrl.replace('00000000-0000-0000-0000-000000000000', status.id);
+        let failures = 0;
+        onProgress(status.offset, file.size);
+        while (!status.complete) {
+            const end = Math.min(status.offset + status.chunk_size, file.size);
+            try {
+                status = await request(url, {
+                    method: 'PUT',
+                    headers: { 'Content-Range': `bytes ${status.offset}-${end - 1}/${file.size}` },
+                    body: file.slice(status.offset, end),
+                });
+                failures = 0;
+            } catch (error) {
+                if (error.fatal || ++failures > maxRetries) throw error;
+                // Network error: wait, then ask the server how much it received
+                await wait(Math.min(1000 * 2 ** failures, 30000));
+                status = await request(url).catch(() => status);
+            }
+            onProgress(status.offset, file.size);
+        }
+        return status;
+    };
+
+    form.addEventListener('submit', async (event) => {
+        const file = input && input.files[0];
+        if (!file || !window.fetch) return; // The form is sent as is
+        event.preventDefault();
+        try {
+            onDone(await upload(file));
+        } catch (error) {
+            onError(error);
+        }
+    });
+}
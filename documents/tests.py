@@ -1,3 +1,528 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from unittest import mock, skipIf
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from core.testing import TEST_SETTINGS, QueryBudgetTestCase
+from dashboard.cache import bump_version
+from users.roles import TEACHERS_GROUP
+from .curriculum import apply_curriculum_diff, diff_curriculum
+from .media import document_file_url
+from .models import Category, ChunkedUpload, Document, SearchEntry, natural_sort_key
+from .previews import (
+    PREVIEW_SIZES, preview_base64, preview_path, preview_url, preview_urls, render_previews, renderer_available,
+)
+from .tree import (
+    TREE_SCOPE, build_tree_snapshot, deferred_tree_invalidation, get_tree_snapshot, get_tree_version,
+)
+from .uploads import fcntl, partial_path, start_upload, write_chunk
+
+
+class DocumentQueryBudgetTests(QueryBudgetTestCase):
+    """Query and row budgets of the document views (see core/testing.py)."""
+
+    def test_browse(self):
+        self.assertQueryBudget(lambda f: {'url': reverse('documents:browse'), 'user': f['teacher']}, 5, 60)
+
+    def test_browse_category(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('documents:browse'), 'user': f['teacher'], 'data': {'category': f['category_id']},
+        }, 5, 15)
+
+    def test_tree_roots(self):
+        self.assertQueryBudget(lambda f: {'url': reverse('documents:tree-roots'), 'user': f['student']}, 5, 60)
+
+    def test_tree_node(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('documents:tree-node', args=[f['category_id']]), 'user': f['student'],
+        }, 5, 60)
+
+    def test_search(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('documents:search'), 'user': f['student'], 'data': {'q': 'ES'},
+        }, 4, 30)
+
+
+def one_page_pdf(text):
+    """A valid one-page PDF showing `text` (ASCII), built by hand."""
+    content = f"BT /F1 24 Tf 72 720 Td ({text}) Tj ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R"
+        b" /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return pdf
+
+
+class MediaTestCase(TestCase):
+    """A teacher logged in, with the media and the partial uploads in a temporary directory."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = get_user_model().objects.create_user('prof', password='prof')
+        cls.teacher.groups.add(Group.objects.get_or_create(name=TEACHERS_GROUP)[0])
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            **TEST_SETTINGS, MEDIA_ROOT=directory.name, CHUNKED_UPLOAD_DIR=os.path.join(directory.name, 'uploads'),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_login(self.teacher)
+
+    def create_document(self, content, name='exercice.pdf', **fields):
+        document = Document(title="ES1", **fields)
+        document.file = ContentFile(content, name=name)
+        document.save()
+        return document
+
+
+class DocumentFileTests(MediaTestCase):
+    def test_legacy_non_ascii_name(self):
+        # Files stored before the content hashes keep their name (migration 0008)
+        default_storage.save('documents/Exercice_é.pdf', ContentFile(b'%PDF-1.4 legacy'))
+        document = Document.objects.create(title="ES1")
+        Document.objects.filter(pk=document.pk).update(file='documents/Exercice_é.pdf', file_hash='')
+
+        url = document_file_url(document.pk, '', 'documents/Exercice_é.pdf')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 legacy')
+
+    def test_outdated_url_redirects(self):
+        document = self.create_document(b'%PDF-1.4 v1')
+        response = self.client.get(document_file_url(document.pk, 'outdated', document.file.name))
+        self.assertRedirects(response, document.file_url, fetch_redirect_response=False)
+
+    def get_range(self, range_header, **headers):
+        document = self.create_document(b'0123456789')
+        response = self.client.get(document.file_url, HTTP_RANGE=range_header, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_range(self):
+        for range_header, content_range, body in (
+            ('bytes=2-5', 'bytes 2-5/10', b'2345'),
+            ('bytes=7-', 'bytes 7-9/10', b'789'),
+            ('bytes=-3', 'bytes 7-9/10', b'789'),
+            ('bytes=8-20', 'bytes 8-9/10', b'89'),
+        ):
+            with self.subTest(range_header):
+                response, content = self.get_range(range_header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(content, body)
+
+    def test_unsatisfiable_range(self):
+        for range_header in ('bytes=10-', 'bytes=5-2', 'bytes=-0'):
+            with self.subTest(range_header):
+                response, _ = self.get_range(range_header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_whole_file_instead_of_range(self):
+        # Multiple ranges are not served, nor a range of another version of the file
+        for range_header, headers in (
+            ('bytes=0-1,4-5', {}),
+            ('bytes=0-1', {'HTTP_IF_RANGE': '"another-version"'}),
+            ('items=0-1', {}),
+        ):
+            with self.subTest(range_header, **headers):
+                response, content = self.get_range(range_header, **headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(content, b'0123456789')
+
+
+@override_settings(**TEST_SETTINGS)
+class PreviewTests(MediaTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.student = get_user_model().objects.create_user('eleve', password='eleve')
+
+    def test_render_previews(self):
+        self.assertTrue(renderer_available())
+        document = self.create_document(one_page_pdf("Pythagore"))
+        self.assertEqual(render_previews(document.pk), 1)
+        document.refresh_from_db()
+        self.assertEqual(document.page_count, 1)
+        for size in PREVIEW_SIZES:
+            with default_storage.open(preview_path(document.file_hash, 1, size), 'rb') as image:
+                self.assertEqual(image.read(8), b'\x89PNG\r\n\x1a\n')
+        self.assertTrue(preview_base64(document))
+
+    def test_preview_view(self):
+        exercise = self.create_document(one_page_pdf("Exercice"))
+        solution = self.create_document(one_page_pdf("Corrige"), name='corrige.pdf', solution_for=exercise)
+        for document in (exercise, solution):
+            render_previews(document.pk)
+            document.refresh_from_db()
+        [exercise_url], [solution_url] = preview_urls(exercise), preview_urls(solution)
+
+        response = self.client.get(solution_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+
+        # Students see the pages of the exercises, never those of the solutions
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(exercise_url).status_code, 200)
+        self.assertEqual(self.client.get(solution_url).status_code, 404)
+        self.assertEqual(self.client.get(preview_url(exercise.pk, exercise.file_hash, 2, 'large')).status_code, 404)
+
+
+class SearchIndexTests(TestCase):
+    def test_moved_category(self):
+        grade = Category.objects.create(name="9ème")
+        chapter = Category.objects.create(name="Fractions", parent=grade)
+        other_chapter = Category.objects.create(name="Nombres", parent=Category.objects.create(name="10ème"))
+        document = Document.objects.create(title="ES1", category=chapter)
+        self.assertEqual(SearchEntry.objects.get(document=document).path, "9ème > Fractions")
+
+        # Moved one level down: its depth is only rewritten at the end of Category.save
+        with self.captureOnCommitCallbacks(execute=True):
+            chapter.parent = other_chapter
+            chapter.save()
+        self.assertEqual(SearchEntry.objects.get(document=document).path, "10ème > Nombres > Fractions")
+
+
+class CategoryPathTests(TestCase):
+    def test_moved_subtree(self):
+        grade = Category.objects.create(name="9ème")
+        chapter = Category.objects.create(name="Fractions", parent=grade)
+        section = Category.objects.create(name="Addition", parent=chapter)
+        other_grade = Category.objects.create(name="10ème")
+        self.assertEqual((section.path, section.depth), (f"{grade.pk:08d}/{chapter.pk:08d}/{section.pk:08d}/", 2))
+
+        # The whole subtree follows its root, one level deeper
+        chapter.parent = Category.objects.create(name="Nombres", parent=other_grade)
+        chapter.save()
+        section.refresh_from_db()
+        self.assertEqual(section.ancestor_ids, [other_grade.pk, chapter.parent_id, chapter.pk])
+        self.assertEqual(section.depth, 3)
+        self.assertEqual([category.name for category in section.get_ancestors()], ["10ème", "Nombres", "Fractions"])
+        self.assertEqual(set(grade.get_descendants(include_self=False)), set())
+
+        # Back to a root
+        chapter.parent = None
+        chapter.save()
+        section.refresh_from_db()
+        self.assertEqual((section.path, section.depth), (f"{chapter.pk:08d}/{section.pk:08d}/", 1))
+        self.assertEqual(Category.rebuild_paths(), 0)
+
+    def test_cycle_is_refused(self):
+        grade = Category.objects.create(name="9ème")
+        chapter = Category.objects.create(name="Fractions", parent=grade)
+        grade.parent = chapter
+        with self.assertRaises(ValueError):
+            grade.save()
+        grade.refresh_from_db()
+        self.assertIsNone(grade.parent_id)
+
+
+class NaturalOrderTests(TestCase):
+    def test_natural_sort_key(self):
+        titles = ["Ex 10", "ex 1", "Ex 2", "FLPp127", "FLPp99"]
+        self.assertEqual(sorted(titles, key=natural_sort_key), ["ex 1", "Ex 2", "Ex 10", "FLPp99", "FLPp127"])
+
+    def test_tree_order(self):
+        grade = Category.objects.create(name="9ème")
+        for name in ("Chapitre 10", "Chapitre 9"):
+            Category.objects.create(name=name, parent=grade)
+        for title in ("Ex 10", "Ex 2", "Ex 1"):
+            Document.objects.create(title=title, category=grade)
+        # A renamed document gets its key rewritten, even through update_fields
+        renamed = Document.objects.get(title="Ex 1")
+        renamed.title = "Ex 11"
+        renamed.save(update_fields=['title'])
+
+        root = build_tree_snapshot()['roots'][0]
+        self.assertEqual([child['name'] for child in root['children']], ["Chapitre 9", "Chapitre 10"])
+        self.assertEqual([entry['title'] for entry in root['documents']], ["Ex 2", "Ex 10", "Ex 11"])
+
+
+@override_settings(**TEST_SETTINGS)
+class TreeSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_invalidation(self):
+        grade = Category.objects.create(name="9ème")
+        snapshot = get_tree_snapshot()
+        # Served from the cache while nothing changes
+        with self.assertNumQueries(0):
+            self.assertEqual(get_tree_snapshot(), snapshot)
+
+        document = Document.objects.create(title="ES1", category=grade)
+        self.assertNotEqual(get_tree_version(), snapshot['version'])
+        self.assertEqual([entry['title'] for entry in get_tree_snapshot()['roots'][0]['documents']], ["ES1"])
+
+        version = get_tree_version()
+        grade.name = "10ème"
+        grade.save()
+        self.assertEqual(get_tree_snapshot()['roots'][0]['name'], "10ème")
+        document.delete()
+        self.assertEqual(get_tree_snapshot()['roots'][0]['documents'], [])
+        self.assertNotEqual(get_tree_version(), version)
+
+    def test_deferred_invalidation(self):
+        version = get_tree_version()
+        with mock.patch('documents.tree.bump_version', wraps=bump_version) as bump:
+            with deferred_tree_invalidation():
+                for index in range(3):
+                    Category.objects.create(name=f"Chapitre {index}")
+                # Nothing is invalidated before the block exits
+                self.assertEqual(get_tree_version(), version)
+        bump.assert_called_once_with(TREE_SCOPE)
+        self.assertEqual(len(get_tree_snapshot()['roots']), 3)
+
+
+class CategoryNodeAPITests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.grade = Category.objects.create(name="9ème")
+        self.chapter = Category.objects.create(name="Fractions", parent=self.grade)
+        self.exercise = self.create_document(b'%PDF-1.4 exercice', category=self.chapter)
+        self.create_document(b'%PDF-1.4 corrige', name='corrige.pdf', category=self.chapter, solution_for=self.exercise)
+        Document.objects.create(title="ES2", category=self.chapter)
+
+    def node(self, category_id=None):
+        url = reverse('documents:tree-node', args=[category_id]) if category_id else reverse('documents:tree-roots')
+        return self.client.get(url)
+
+    def test_one_level(self):
+        roots = self.node().json()
+        self.assertEqual(roots['children'], [{'id': self.grade.pk, 'name': "9ème", 'has_children': True}])
+        self.assertEqual(self.node(self.grade.pk).json()['documents'], [])
+
+        documents = self.node(self.chapter.pk).json()['documents']
+        self.assertEqual([(entry['title'], entry['has_file']) for entry in documents], [("ES1", True), ("ES2", False)])
+        self.assertEqual(documents[0]['solution']['id'], self.exercise.solution.pk)
+        self.assertEqual(self.node(self.chapter.pk + 100).status_code, 404)
+
+    def test_students_only_get_exercises_with_a_file(self):
+        self.client.force_login(get_user_model().objects.create_user('eleve', password='eleve'))
+        documents = self.node(self.chapter.pk).json()['documents']
+        self.assertEqual([entry['id'] for entry in documents], [self.exercise.pk])
+        self.assertNotIn('solution', documents[0])
+
+
+class PdfTextSearchTests(MediaTestCase):
+    def test_pdf_text_is_searchable(self):
+        document = self.create_document(one_page_pdf("Theoreme de Pythagore"))
+        self.assertIn("pythagore", SearchEntry.objects.get(document=document).content)
+        response = self.client.get(reverse('documents:search'), {'q': "pythagore"})
+        self.assertEqual([result['id'] for result in response.json()['results']], [document.pk])
+
+
+CURRICULUM = [
+    {'grade': "9ème", 'chapters': [
+        {'name': "Espace", 'exercises': ["ES2", "ES1"]},
+        {'name': "Nombres", 'exercises': ["NO1"]},
+    ]},
+]
+
+
+@override_settings(**TEST_SETTINGS)
+class CurriculumSyncTests(TestCase):
+    def sync(self, curriculum):
+        apply_curriculum_diff(diff_curriculum(curriculum))
+
+    def test_set_diff(self):
+        diff = diff_curriculum(CURRICULUM)
+        self.assertEqual(diff.counts(), {
+            'categories_created': 3, 'categories_reordered': 0, 'categories_deleted': 0,
+            'documents_created': 6, 'documents_updated': 0, 'documents_deleted': 0,
+        })
+        apply_curriculum_diff(diff)
+        self.assertEqual(
+            Document.objects.get(title="ES1 (Corrigé)").solution_for, Document.objects.get(title="ES1")
+        )
+        self.assertFalse(diff_curriculum(CURRICULUM))
+
+        Document.objects.filter(title="ES1 (Corrigé)").update(title="Corrigé ES1")
+        curriculum = [{'grade': "9ème", 'chapters': [
+            {'name': "Nombres", 'exercises': ["NO1"]},
+            {'name': "Espace", 'exercises': ["ES1", "ES3"]},
+        ]}]
+        diff = diff_curriculum(curriculum)
+        self.assertEqual(diff.exercises_to_create, [(("9ème", "Espace"), "ES3")])
+        self.assertEqual([title for _, title, _ in diff.solutions_to_update], ["ES1 (Corrigé)"])
+        self.assertEqual(sorted(title for _, title, _ in diff.documents_to_delete), ["ES2", "ES2 (Corrigé)"])
+        self.assertEqual(len(diff.categories_to_reorder), 2)
+
+        apply_curriculum_diff(diff)
+        self.assertFalse(diff_curriculum(curriculum))
+
+    def test_only_categorized_documents_are_deleted(self):
+        self.sync(CURRICULUM)
+        uncategorized = Document.objects.create(title="Fiche libre")
+        self.sync([{'grade': "9ème", 'chapters': [{'name': "Espace", 'exercises': ["ES1", "ES2"]}]}])
+        self.assertFalse(Category.objects.filter(name="Nombres").exists())
+        self.assertFalse(Document.objects.filter(title__startswith="NO1").exists())
+        self.assertTrue(Document.objects.filter(pk=uncategorized.pk).exists())
+
+    def test_dry_run(self):
+        output = io.StringIO()
+        call_command('sync_curriculum', '--dry-run', stdout=output)
+        self.assertIn("+ catégorie", output.getvalue())
+        self.assertIn("Simulation", output.getvalue())
+        self.assertFalse(Category.objects.exists())
+        self.assertFalse(Document.objects.exists())
+
+
+class ChunkedUploadTests(MediaTestCase):
+    CONTENT = b'%PDF-1.4 ' + bytes(range(256)) * 4
+
+    def setUp(self):
+        super().setUp()
+        previews = mock.patch('documents.views.render_previews_in_background')
+        previews.start()
+        self.addCleanup(previews.stop)
+
+    def start(self, document, name='exercice.pdf'):
+        response = self.client.post(
+            reverse('documents:upload-start', args=[document.pk]),
+            {'name': name, 'size': len(self.CONTENT)}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def put(self, upload, start, end):
+        return self.client.put(
+            reverse('documents:upload', args=[upload['id']]), self.CONTENT[start:end + 1],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f"bytes {start}-{end}/{len(self.CONTENT)}",
+        )
+
+    def upload(self, document):
+        upload = self.start(document)
+        self.assertEqual(self.put(upload, 0, 499).status_code, 200)
+        response = self.put(upload, 500, len(self.CONTENT) - 1)
+        self.assertEqual(response.status_code, 200)
+        document.refresh_from_db()
+        return response.json()
+
+    def test_resume(self):
+        document = Document.objects.create(title="ES1")
+        upload = self.start(document)
+        self.assertEqual(self.put(upload, 0, 299).json()['offset'], 300)
+
+        # The same file, started again (e.g. after the page was reloaded), resumes at 300
+        resumed = self.start(document)
+        self.assertEqual((resumed['id'], resumed['offset']), (upload['id'], 300))
+        response = self.put(resumed, 300, len(self.CONTENT) - 1)
+        self.assertTrue(response.json()['complete'])
+
+        document.refresh_from_db()
+        self.assertEqual(response.json()['url'], document.file_url)
+        with document.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.CONTENT)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_offset_mismatch(self):
+        document = Document.objects.create(title="ES1")
+        upload = self.start(document)
+        self.put(upload, 0, 299)
+        # A chunk sent again after its response was lost
+        response = self.put(upload, 0, 299)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 300)
+
+    def test_replaced_file_is_deleted(self):
+        document = self.create_document(b'%PDF-1.4 v1')
+        shared = self.create_document(b'%PDF-1.4 shared', name='autre.pdf')
+        previous = document.file.name
+        self.upload(document)
+        self.assertFalse(default_storage.exists(previous))
+
+        # A file still used by another document is kept
+        Document.objects.filter(pk=document.pk).update(file=shared.file.name)
+        document.refresh_from_db()
+        self.CONTENT += b' v2'
+        self.upload(document)
+        self.assertTrue(default_storage.exists(shared.file.name))
+
+    def test_same_content_is_stored_once(self):
+        first, second = Document.objects.create(title="ES1"), Document.objects.create(title="ES2")
+        self.upload(first)
+        self.upload(second)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(first.file_hash, second.file_hash)
+        _, stored = default_storage.listdir(os.path.dirname(first.file.name))
+        self.assertEqual(stored, [os.path.basename(first.file.name)])
+
+
+class ConcurrentChunkTests(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            **TEST_SETTINGS, MEDIA_ROOT=directory.name, CHUNKED_UPLOAD_DIR=os.path.join(directory.name, 'uploads'),
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    @skipIf(fcntl is None, "The chunks are only serialized where fcntl is available.")
+    def test_overlapping_writers(self):
+        teacher = get_user_model().objects.create_user('prof', password='prof')
+        upload = start_upload(Document.objects.create(title="ES1"), teacher, 'exercice.pdf', 8)
+        reading, release = threading.Event(), threading.Event()
+
+        class SlowStream(io.BytesIO):
+            def read(self, size=-1):
+                reading.set()
+                release.wait(5)
+                return super().read(size)
+
+        results = {}
+
+        def send(name, stream):
+            try:
+                results[name] = write_chunk(ChunkedUpload.objects.get(pk=upload.pk), stream, 4)
+            except ValueError as e:
+                results[name] = e
+            finally:
+                connection.close()
+
+        # Two requests sending the first chunk: the second one arrives while the first is writing
+        first = threading.Thread(target=send, args=('first', SlowStream(b'AAAA')))
+        second = threading.Thread(target=send, args=('second', io.BytesIO(b'BBBB')))
+        first.start()
+        self.assertTrue(reading.wait(5))
+        second.start()
+        second.join(0.2)
+        self.assertTrue(second.is_alive())
+        release.set()
+        first.join(5)
+        second.join(5)
+
+        self.assertIsInstance(results['second'], ValueError)
+        self.assertEqual(results['first'].hexdigest(), hashlib.sha256(b'AAAA').hexdigest())
+        upload.refresh_from_db()
+        self.assertEqual(upload.offset, 4)
+        with open(partial_path(upload), 'rb') as partial:
+            self.assertEqual(partial.read(), b'AAAA')
@@ -0,0 +1,173 @@
+# documents/tree.py
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.core.cache import cache
+from dashboard.cache import get_version, bump_version
+from .media import document_file_url
+from .models import Category, Document
+
+TREE_SCOPE = 'documents-tree'
+# The snapshot is invalidated by version bumps, the timeout only bounds memory usage
+TREE_CACHE_TIMEOUT = 60 * 60 * 24
+
+_deferred_invalidation = ContextVar('deferred_tree_invalidation', default=None)
+
+
+def get_tree_version():
+    return get_version(TREE_SCOPE)
+
+
+def bump_tree_version():
+    """Invalidates the tree snapshot (a category or a document changed)."""
+    pending = _deferred_invalidation.get()
+    if pending is not None:
+        pending.append(TREE_SCOPE)
+        return
+    bump_version(TREE_SCOPE)
+
+
+@contextmanager
+def deferred_tree_invalidation():
+    """
+    Coalesces the invalidations of a bulk change (one per saved or deleted row through
+    the signals) into a single version bump when the block exits.
+    """
+    pending = []
+    token = _deferred_invalidation.set(pending)
+    try:
+        yield
+    finally:
+        _deferred_invalidation.reset(token)
+        if pending:
+            bump_version(TREE_SCOPE)
+
+
+def _document_entry(document_id, title, file_name, file_hash):
+    return {
+        'id': document_id,
+        'title': title,
+        'url': document_file_url(document_id, file_hash, file_name),
+    }
+
+
+def build_tree_snapshot(version=None):
+    """
+    Builds the whole category tree with its exercises (and their solutions) in two queries.
+    Returns plain data: nested dicts with 'id', 'name', 'children' and 'documents'.
+    """
+    nodes = {}
+    roots = []
+    categories = Category.objects.order_by('order', 'sort_key').values_list('id', 'name', 'parent_id')
+    for category_id, name, parent_id in categories:
+        nodes[category_id] = {'id': category_id, 'name': name, 'parent_id': parent_id, 'children': [], 'documents': []}
+    for node in nodes.values():
+        parent = nodes.get(node.pop('parent_id'))
+        (parent['children'] if parent else roots).append(node)
+
+    exercises, solutions = [], {}
+    # In natural order, read from the stored sort keys
+    documents = Document.objects.filter(category__isnull=False).order_by('sort_key', 'id').values_list(
+        'id', 'title', 'file', 'file_hash', 'category_id', 'solution_for_id'
+    )
+    for document_id, title, file_name, file_hash, category_id, solution_for_id in documents:
+        if solution_for_id:
+            solutions[solution_for_id] = _document_entry(document_id, title, file_name, file_hash)
+        else:
+            exercises.append((category_id, _document_entry(document_id, title, file_name, file_hash)))
+
+    for category_id, entry in exercises:
+        entry['solution'] = solutions.get(entry['id'])
+        nodes[category_id]['documents'].append(entry)
+
+    return {'version': version or get_tree_version(), 'roots': roots}
+
+
+def get_tree_snapshot():
+    """
+    Returns the category tree shared by the exercise pickers, from the cache when it is
+    up to date. Its 'version' can key the cached rendering of the tree.
+    """
+    version = get_tree_version()
+    key = f"documents:tree:v{version}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_tree_snapshot(version)
+        cache.set(key, snapshot, TREE_CACHE_TIMEOUT)
+    return snapshot
+
+
+def _find_by_id(nodes, category_id):
+    for node in nodes:
+        if node['id'] == category_id:
+            return node
+        found = _find_by_id(node['children'], category_id)
+        if found:
+            return found
+    return None
+
+
+def _document_flags(entry):
+    return {'id': entry['id'], 'title': entry['title'], 'has_file': entry['url'] is not None, 'url': entry['url']}
+
+
+def node_payload(snapshot, category_id=None, include_solutions=True):
+    """
+    One level of the tree for the lazy-loading browsers: the immediate children of a
+    category (the roots when `category_id` is None) and its exercises with their file
+    status. Students (`include_solutions=False`) only get the exercises that have a file,
+    never the solutions. Returns None if the category does not exist.
+    """
+    if category_id is None:
+        node = {'id': None, 'name': None, 'children': snapshot['roots'], 'documents': []}
+    else:
+        node = _find_by_id(snapshot['roots'], category_id)
+        if node is None:
+            return None
+
+    documents = []
+    for entry in node['documents']:
+        if include_solutions:
+            solution = entry['solution']
+            documents.append({**_document_flags(entry), 'solution': _document_flags(solution) if solution else None})
+        elif entry['url']:
+            documents.append(_document_flags(entry))
+    return {
+        'version': snapshot['version'],
+        'id': node['id'],
+        'name': node['name'],
+        'children': [
+            {'id': child['id'], 'name': child['name'], 'has_children': bool(child['children'] or child['documents'])}
+            for child in node['children']
+        ],
+        'documents': documents,
+    }
+
+
+def get_node_payload(category_id=None, include_solutions=True):
+    """
+    Cached `node_payload`: once warm, expanding a category only reads that level
+    from the cache, whatever the size of the curriculum.
+    """
+    version = get_tree_version()
+    key = f"documents:tree:v{version}:node:{category_id or 'roots'}:{'teacher' if include_solutions else 'student'}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = node_payload(get_tree_snapshot(), category_id, include_solutions)
+        if payload is not None:
+            cache.set(key, payload, TREE_CACHE_TIMEOUT)
+    return payload
+
+
+def category_options(snapshot):
+    """Every category in tree order with its full label (e.g. "10ème > Algèbre"), for the filters."""
+    options = []
+
+    def visit(nodes, prefix):
+        for node in nodes:
+            label = f"{prefix} > {node['name']}" if prefix else node['name']
+            options.append({'id': node['id'], 'label': label})
+            visit(node['children'], label)
+
+    visit(snapshot['roots'], '')
+    return options
@@ -0,0 +1,188 @@
+# documents/uploads.py
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import F
+from django.utils.timezone import now
+from .media import CHUNK_SIZE, store_content
+from .models import ChunkedUpload, Document
+
+try:
+    import fcntl
+except ImportError:  # Windows: the chunks of an upload are not serialized (development only)
+    fcntl = None
+
+# Size of the chunks sent by the browser: small enough to be resent after a network error
+UPLOAD_CHUNK_SIZE = 2 * 1024 * 1024
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_UPLOAD_SIZE = 100 * 1024 * 1024
+# Uploads left unfinished for longer are deleted
+UPLOAD_EXPIRY = timedelta(days=2)
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+# SHA-256 state of the uploads in progress in this process, keyed by upload id, with the
+# offset it covers. hashlib objects cannot be stored: after a restart, or when a chunk
+# reaches another worker, the state is rebuilt from the partial file.
+MAX_CACHED_HASHERS = 32
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+def partial_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f"{upload.pk}.part")
+
+
+def upload_status(upload):
+    return {
+        'id': str(upload.pk),
+        'file_name': upload.file_name,
+        'size': upload.size,
+        'offset': upload.offset,
+        'chunk_size': UPLOAD_CHUNK_SIZE,
+        'complete': upload.offset == upload.size,
+    }
+
+
+def parse_content_range(header):
+    """Reads a "Content-Range: bytes start-end/size" header. Returns (start, end, size), or None."""
+    match = CONTENT_RANGE_PATTERN.match(header or '')
+    if not match:
+        return None
+    start, end, size = map(int, match.groups())
+    return (start, end, size) if start <= end < size else None
+
+
+def _take_hasher(upload, path):
+    with _hashers_lock:
+        offset, digest = _hashers.pop(upload.pk, (None, None))
+    if offset == upload.offset:
+        return digest
+    digest, remaining = hashlib.sha256(), upload.offset
+    with open(path, 'rb') as partial:
+        while remaining > 0:
+            chunk = partial.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise ValueError("Le fichier partiel est incomplet.")
+            remaining -= len(chunk)
+            digest.update(chunk)
+    return digest
+
+
+def _keep_hasher(upload, digest):
+    with _hashers_lock:
+        _hashers[upload.pk] = (upload.offset, digest)
+        while len(_hashers) > MAX_CACHED_HASHERS:
+            _hashers.popitem(last=False)
+
+
+def discard_upload(upload):
+    with _hashers_lock:
+        _hashers.pop(upload.pk, None)
+    try:
+        os.remove(partial_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def purge_expired_uploads():
+    """Deletes the uploads (and their partial files) left unfinished for longer than UPLOAD_EXPIRY."""
+    expired = ChunkedUpload.objects.filter(updated_at__lt=now() - UPLOAD_EXPIRY)
+    for upload in expired:
+        discard_upload(upload)
+
+
+def start_upload(document, user, file_name, size):
+    """
+    Starts the upload of a file for `document`, or returns the unfinished upload of the
+    same file (name and size) by the same user so that it resumes where it stopped.
+    Raises ValueError if the file is refused.
+    """
+    file_name = os.path.basename(file_name or '')
+    if not file_name.lower().endswith('.pdf'):
+        raise ValueError("Le fichier doit être au format PDF.")
+    if not 0 < size <= MAX_UPLOAD_SIZE:
+        raise ValueError(f"Le fichier ne doit pas dépasser {MAX_UPLOAD_SIZE // 1024 // 1024} Mo.")
+
+    purge_expired_uploads()
+    upload = ChunkedUpload.objects.filter(document=document, uploaded_by=user, file_name=file_name, size=size).first()
+    if upload is not None and os.path.exists(partial_path(upload)):
+        return upload
+    if upload is None:
+        upload = ChunkedUpload.objects.create(document=document, uploaded_by=user, file_name=file_name, size=size)
+    else:
+        # The partial file is gone: the upload starts again
+        ChunkedUpload.objects.filter(pk=upload.pk).update(offset=0)
+        upload.offset = 0
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(partial_path(upload), 'wb').close()
+    return upload
+
+
+def write_chunk(upload, stream, length):
+    """
+    Appends `length` bytes read from `stream` (the request body) at `upload.offset`,
+    updating the SHA-256 as they arrive. The offset only moves once the whole chunk is
+    written: bytes of an interrupted chunk are overwritten by the retry.
+    The partial file is locked for the whole write, and the offset read again once the
+    lock is held: of two requests sending a chunk at the same offset, the second one
+    finds it moved and writes nothing.
+    Raises ValueError if the chunk is incomplete or another chunk was written meanwhile.
+    """
+    path = partial_path(upload)
+    with open(path, 'r+b') as partial:
+        if fcntl is not None:
+            # Released when the file is closed
+            fcntl.flock(partial, fcntl.LOCK_EX)
+        offset = ChunkedUpload.objects.filter(pk=upload.pk).values_list('offset', flat=True).first()
+        if offset != upload.offset:
+            raise ValueError("Un autre morceau a été reçu entre-temps.")
+        digest = _take_hasher(upload, path)
+        partial.truncate(upload.offset)
+        partial.seek(upload.offset)
+        remaining = length
+        while remaining > 0:
+            chunk = stream.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise ValueError("Le morceau reçu est incomplet.")
+            remaining -= len(chunk)
+            digest.update(chunk)
+            partial.write(chunk)
+        partial.flush()
+
+        updated = ChunkedUpload.objects.filter(pk=upload.pk, offset=upload.offset).update(
+            offset=F('offset') + length, updated_at=now()
+        )
+    if not updated:
+        raise ValueError("Un autre morceau a été reçu entre-temps.")
+    upload.offset += length
+    _keep_hasher(upload, digest)
+    return digest
+
+
+def finish_upload(upload, digest):
+    """
+    Stores the received file in the content-addressed store (once per content), attaches
+    it to the document, deletes the upload and the file it replaces. Returns the document.
+    """
+    file_hash = digest.hexdigest()
+    with open(partial_path(upload), 'rb') as partial:
+        name = store_content(File(partial, name=upload.file_name), file_hash)
+    document = upload.document
+    previous = document.file.name if document.file else ''
+    document.file = name
+    document.file_hash, document.page_count = file_hash, 0
+    document.uploaded_by = upload.uploaded_by
+    document.save()
+    discard_upload(upload)
+    # The replaced file, unless another document shares its content
+    if previous and previous != name and not Document.objects.filter(file=previous).exists():
+        default_storage.delete(previous)
+    return document
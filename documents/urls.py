@@ -1,12 +1,22 @@
 # documents/urls.py
 
 from django.urls import path
-from .views import DocumentBrowseView, DocumentUpdateFileView, DocumentClearFileView
+from .views import (
+    DocumentBrowseView, DocumentUpdateFileView, DocumentClearFileView, CategoryNodeAPIView, DocumentSearchAPIView,
+    DocumentFileView, DocumentPreviewView, ChunkedUploadStartView, ChunkedUploadView,
+)
 
 app_name = 'documents'
 
 urlpatterns = [
     path('browse/', DocumentBrowseView.as_view(), name='browse'),
     path('<int:pk>/upload/', DocumentUpdateFileView.as_view(), name='update-file'),
+    path('<int:pk>/uploads/', ChunkedUploadStartView.as_view(), name='upload-start'),
+    path('uploads/<uuid:upload_id>/', ChunkedUploadView.as_view(), name='upload'),
     path('<int:pk>/clear/', DocumentClearFileView.as_view(), name='clear-file'),
+    path('api/tree/', CategoryNodeAPIView.as_view(), name='tree-roots'),
+    path('api/tree/<int:category_id>/', CategoryNodeAPIView.as_view(), name='tree-node'),
+    path('api/search/', DocumentSearchAPIView.as_view(), name='search'),
+    path('files/<int:pk>/<str:digest>/<str:filename>', DocumentFileView.as_view(), name='file'),
+    path('previews/<int:pk>/<str:digest>/<int:page>-<str:size>.png', DocumentPreviewView.as_view(), name='preview'),
 ]
\ No newline at end of file
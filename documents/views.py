@@ -1,20 +1,24 @@
 # documents/views.py
 
+import json
+import os
 from django.views.generic import TemplateView, View
 from django.views.generic.edit import CreateView, UpdateView
 from django.contrib.auth.mixins import UserPassesTestMixin, LoginRequiredMixin
 from django.contrib.auth.decorators import user_passes_test
 from django.urls import reverse_lazy, reverse
 from django.shortcuts import get_object_or_404, redirect
-from django.db import models
-from django.db.models.functions import Cast
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse
 from django.utils.decorators import method_decorator
-from .models import Document, Category
+from .models import Document, Category, ChunkedUpload
 from .forms import DocumentFileUpdateForm, DocumentForm
-
-def is_teacher(user):
-    """Checks if the user is in the 'Professeurs' group."""
-    return user.groups.filter(name='Professeurs').exists()
+from users.roles import is_teacher
+from .tree import get_node_payload
+from .search import SEARCH_LIMIT, search_documents
+from .media import UNHASHED_DIGEST, document_file_url, serve_file
+from .previews import PREVIEW_SIZES, preview_path, preview_url, render_previews_in_background
+from .uploads import MAX_CHUNK_SIZE, finish_upload, parse_content_range, start_upload, upload_status, write_chunk
 
 class DocumentUploadView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     """
@@ -32,7 +36,10 @@ class DocumentUploadView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     
     def form_valid(self, form):
         form.instance.uploaded_by = self.request.user
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        # The pages are rendered after the response, for the tutor and the image analysis
+        render_previews_in_background(self.object.pk)
+        return response
 
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
 class DocumentClearFileView(LoginRequiredMixin, View):
@@ -41,13 +48,8 @@ class DocumentClearFileView(LoginRequiredMixin, View):
     """
     def post(self, request, pk):
         doc = get_object_or_404(Document, pk=pk)
-        
-        # Delete the physical file from storage
-        if doc.file:
-            doc.file.delete(save=False) # Do not save the model right away
-
-        doc.file = None
-        doc.save()
+        # The physical file is only deleted if no other document shares its content
+        doc.delete_file()
         return redirect('documents:browse')
 
 @method_decorator(user_passes_test(is_teacher), name='dispatch')
@@ -57,15 +59,91 @@ class DocumentBrowseView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # We sort documents by their title using a natural sort
-        # by extracting the numeric part of the title.
-        documents_sorted = Document.objects.annotate(
-            numeric_part=Cast(models.functions.Substr('title', 3), models.IntegerField())
-        ).order_by('numeric_part')
-        
-        context['categories'] = Category.objects.filter(parent__isnull=True).prefetch_related(models.Prefetch('children__children__documents', queryset=documents_sorted, to_attr='sorted_documents'), 'children__children__documents__solution').order_by('order', 'name')
+        # Only the top-level categories are rendered, their content is loaded on expansion
+        category_id = self.request.GET.get('category', '')
+        if category_id.isdigit():
+            # Only the subtree of one category, with its breadcrumb
+            category = get_object_or_404(Category, pk=category_id)
+            context['breadcrumb'] = category.get_ancestors(include_self=True)
+            context['roots'] = [category]
+        else:
+            context['roots'] = get_node_payload()['children']
         return context
 
+class CategoryNodeAPIView(LoginRequiredMixin, View):
+    """
+    Returns one level of the category tree as JSON (the roots, or the children and
+    exercises of a category). Fetched by the browsers when a category is expanded.
+    """
+    def get(self, request, category_id=None):
+        payload = get_node_payload(category_id, include_solutions=request.user_roles.is_teacher)
+        if payload is None:
+            return JsonResponse({'error': "Catégorie introuvable."}, status=404)
+        return JsonResponse(payload)
+
+class DocumentSearchAPIView(LoginRequiredMixin, View):
+    """Typeahead: the documents best matching `q` (title, category path or PDF text), as JSON."""
+    def get(self, request):
+        try:
+            limit = int(request.GET.get('limit', SEARCH_LIMIT))
+        except ValueError:
+            limit = SEARCH_LIMIT
+        query = request.GET.get('q', '')
+        results = search_documents(query, limit, include_solutions=request.user_roles.is_teacher)
+        return JsonResponse({'query': query, 'results': results})
+
+class DocumentFileView(LoginRequiredMixin, View):
+    """
+    Serves the file of a document at its content-hashed URL, with range requests and
+    long-lived caching. Outdated URLs redirect to the current file.
+    """
+    def get(self, request, pk, digest, filename):
+        document = Document.objects.filter(pk=pk).values('file', 'file_hash', 'solution_for_id').first()
+        if not document or not document['file']:
+            raise Http404("Fichier introuvable.")
+        # Students never get the solutions
+        if document['solution_for_id'] and not request.user_roles.is_teacher:
+            raise Http404("Fichier introuvable.")
+        # The resolved arguments are compared, not the paths: the URL built by reverse() is
+        # percent-encoded (non-ASCII file names) while request.path is decoded
+        if digest != (document['file_hash'] or UNHASHED_DIGEST) or filename != os.path.basename(document['file']):
+            return redirect(document_file_url(pk, document['file_hash'], document['file']))
+
+        if document['file_hash']:
+            etag, immutable = f'"{document["file_hash"]}"', True
+        else:
+            # Not hashed yet: the URL does not change with the content, the ETag does
+            try:
+                size = default_storage.size(document['file'])
+            except OSError:
+                raise Http404("Fichier introuvable.")
+            etag, immutable = f'"{document["file"]}:{size}"'.replace(' ', '_'), False
+        try:
+            return serve_file(request, document['file'], etag, immutable)
+        except FileNotFoundError:
+            raise Http404("Fichier introuvable.")
+
+class DocumentPreviewView(LoginRequiredMixin, View):
+    """
+    Serves a page of a document pre-rendered as a PNG image (see documents/previews.py).
+    The URL contains the content hash: the images are cached for good.
+    """
+    def get(self, request, pk, digest, page, size):
+        document = Document.objects.filter(pk=pk).values('file_hash', 'page_count', 'solution_for_id').first()
+        if not document or size not in PREVIEW_SIZES or not 1 <= page <= document['page_count']:
+            raise Http404("Aperçu introuvable.")
+        if document['solution_for_id'] and not request.user_roles.is_teacher:
+            raise Http404("Aperçu introuvable.")
+        if digest != document['file_hash']:
+            return redirect(preview_url(pk, document['file_hash'], page, size))
+        try:
+            return serve_file(
+                request, preview_path(digest, page, size), f'"{digest}-{size}-{page}"', immutable=True,
+                content_type='image/png',
+            )
+        except FileNotFoundError:
+            raise Http404("Aperçu introuvable.")
+
 class DocumentUpdateFileView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     """View to upload or replace the file of an existing document."""
     model = Document
@@ -78,4 +156,67 @@ class DocumentUpdateFileView(LoginRequiredMixin, UserPassesTestMixin, UpdateView
 
     def form_valid(self, form):
         form.instance.uploaded_by = self.request.user
-        return super().form_valid(form)
\ No newline at end of file
+        response = super().form_valid(form)
+        # The pages are rendered after the response, for the tutor and the image analysis
+        render_previews_in_background(self.object.pk)
+        return response
+
+@method_decorator(user_passes_test(is_teacher), name='dispatch')
+class ChunkedUploadStartView(LoginRequiredMixin, View):
+    """
+    Starts the chunked upload of a document's file (JSON body: name and size), or
+    returns the unfinished upload of the same file so that the browser resumes it.
+    """
+    def post(self, request, pk):
+        document = get_object_or_404(Document, pk=pk)
+        try:
+            data = json.loads(request.body)
+            name, size = str(data['name']), int(data['size'])
+        except (ValueError, TypeError, KeyError):
+            return JsonResponse({'error': "Requête invalide."}, status=400)
+        try:
+            upload = start_upload(document, request.user, name, size)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse(upload_status(upload))
+
+@method_decorator(user_passes_test(is_teacher), name='dispatch')
+class ChunkedUploadView(LoginRequiredMixin, View):
+    """
+    One chunked upload: GET returns how many bytes were received, PUT appends the next
+    chunk (raw body, with a "Content-Range: bytes start-end/size" header). The last
+    chunk attaches the file to the document.
+    """
+    def get_upload(self, request, upload_id):
+        return get_object_or_404(ChunkedUpload.objects.select_related('document'), pk=upload_id, uploaded_by=request.user)
+
+    def get(self, request, upload_id):
+        return JsonResponse(upload_status(self.get_upload(request, upload_id)))
+
+    def put(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        content_range = parse_content_range(request.headers.get('Content-Range'))
+        if content_range is None or content_range[2] != upload.size:
+            return JsonResponse({'error': "En-tête Content-Range invalide."}, status=400)
+        start, end, _ = content_range
+        length = end - start + 1
+        if length > MAX_CHUNK_SIZE or request.headers.get('Content-Length') != str(length):
+            return JsonResponse({'error': "Taille du morceau invalide."}, status=400)
+        if start != upload.offset:
+            # Not the expected chunk (e.g. resent after a lost response): the browser resumes from `offset`
+            return JsonResponse(upload_status(upload), status=409)
+
+        try:
+            digest = write_chunk(upload, request, length)
+        except FileNotFoundError:
+            return JsonResponse({'error': "Envoi expiré, il doit recommencer."}, status=410)
+        except ValueError as e:
+            upload.refresh_from_db()
+            return JsonResponse({**upload_status(upload), 'error': str(e)}, status=409)
+
+        if upload.offset < upload.size:
+            return JsonResponse(upload_status(upload))
+        status = upload_status(upload)
+        document = finish_upload(upload, digest)
+        render_previews_in_background(document.pk)
+        return JsonResponse({**status, 'url': document.file_url})
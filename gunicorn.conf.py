@@ -0,0 +1,18 @@
+# gunicorn.conf.py
+# Read by gunicorn from the directory it is started in.
+
+import os
+
+
+def on_starting(server):
+    # The metrics files of the previous run (core/metrics.py) would be summed with the new ones
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    from core import metrics
+    metrics.clear()
+
+
+def child_exit(server, worker):
+    # Workers recycled by max_requests would each leave a metrics file behind: their
+    # counters are folded into a single one
+    from core import metrics
+    metrics.retire(worker.pid)
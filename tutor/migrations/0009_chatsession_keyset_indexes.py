@@ -0,0 +1,58 @@
+# Generated by Django 4.2.24 on 2026-10-19 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tutor", "0008_remove_chatsession_teacher_diagnostic_notes_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="chatsession",
+            name="summary_data",
+            field=models.JSONField(
+                blank=True,
+                help_text="Summary and error analysis generated by the AI.",
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="chatsession",
+            name="teacher_analysis",
+            field=models.JSONField(
+                blank=True,
+                help_text="Structured analysis from the teacher. Contains 'error_analysis', 'notes', 'divergence_analysis', 'remediation_strategy', 'ai_influence_rating'.",
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="chatsession",
+            name="whiteboard_state",
+            field=models.JSONField(
+                blank=True, help_text="Last saved state of the whiteboard.", null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chatsession",
+            index=models.Index(
+                fields=["start_time", "id"], name="chatsession_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chatsession",
+            index=models.Index(
+                fields=["student", "start_time", "id"],
+                name="chatsession_student_start_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chatsession",
+            index=models.Index(
+                fields=["document", "start_time", "id"],
+                name="chatsession_document_start_idx",
+            ),
+        ),
+    ]
@@ -33,6 +33,14 @@ class ChatSession(models.Model):
         (4, 'A lot'),
     ]
 
+    class Meta:
+        # Composite indexes for the keyset pagination of the session lists, ordered by (start_time, id)
+        indexes = [
+            models.Index(fields=['start_time', 'id'], name='chatsession_start_idx'),
+            models.Index(fields=['student', 'start_time', 'id'], name='chatsession_student_start_idx'),
+            models.Index(fields=['document', 'start_time', 'id'], name='chatsession_document_start_idx'),
+        ]
+
     def __str__(self):
         return f"Session for {self.student.username} on {self.start_time.strftime('%Y-%m-%d')}"
 
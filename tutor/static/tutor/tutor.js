@@ -101,7 +101,10 @@ document.addEventListener('DOMContentLoaded', () => {
         }
         if (sessionData.exercise_document) {
             const documentUrl = sessionData.exercise_document.url;
-            if (documentUrl.toLowerCase().endsWith('.pdf')) {
+            const previews = sessionData.exercise_document.previews || [];
+            if (previews.length) {
+                showPreviewPage(previews, 1); // Pages rendered at upload
+            } else if (documentUrl.toLowerCase().endsWith('.pdf')) {
                 await loadPdfAsImage(documentUrl, 1); // Load the first page
             }
             if (sendBtn) sendBtn.disabled = false;
@@ -127,8 +130,17 @@ document.addEventListener('DOMContentLoaded', () => {
     // ===            EXERCISE MANAGEMENT (PDF, IMAGE)               ===
     // ===================================================================
 
+    function showPreviewPage(previews, pageNum) {
+        // The image is already rendered by the server: no PDF download or rendering
+        totalPages = previews.length;
+        currentPageNum = pageNum;
+        uploadedImage = previews[pageNum - 1];
+        if (questionImageDisplay) questionImageDisplay.src = uploadedImage;
+    }
+
     async function loadPdfAsImage(pdfUrl, pageNum) {
-        const loadingTask = pdfjsLib.getDocument(pdfUrl);
+        // Only the ranges needed by the displayed page are downloaded
+        const loadingTask = pdfjsLib.getDocument({ url: pdfUrl, disableAutoFetch: true, disableStream: true });
         currentPdf = await loadingTask.promise;
         totalPages = currentPdf.numPages;
         currentPageNum = pageNum;        
@@ -1,3 +1,27 @@
-from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from core.testing import QueryBudgetTestCase
+
+
+class TutorQueryBudgetTests(QueryBudgetTestCase):
+    """Query and row budgets of the tutor views (see core/testing.py)."""
+
+    def test_tutor_page(self):
+        self.assertQueryBudget(lambda f: {'url': reverse('tutor-page'), 'user': f['student']}, 5, 60)
+
+    def test_tutor_page_resume(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('tutor-page'), 'user': f['student'], 'data': {'resume': f['session'].id},
+        }, 10, 40)
+
+    def test_start_session(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('start-session', args=[f['document_id']]), 'user': f['student'],
+        }, 10, 15, status=302)
+
+    def test_save_whiteboard(self):
+        self.assertQueryBudget(lambda f: {
+            'url': reverse('save-whiteboard'), 'user': f['student'],
+            'data': {'whiteboard_state': {'objects': []}}, 'content_type': 'application/json',
+            'session': {'chat_session_id': f['session'].id},
+        }, 4, 10, method='post')
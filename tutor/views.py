@@ -19,8 +19,12 @@ from django.utils.timezone import now
 from .models import ChatSession, ChatMessage
 from documents.models import Document
 from dashboard.services import generate_and_save_session_summary
-from documents.models import Category
-from django.db.models.functions import Cast
+from dashboard.cache import bump_student_classes
+from documents.tree import get_node_payload
+from documents.media import document_id_from_url
+from documents.previews import preview_base64, preview_urls
+from core import metrics
+from core.llm import chat_completion
 
 class TutorPageView(TemplateView):
     """
@@ -45,6 +49,7 @@ class TutorPageView(TemplateView):
                 if resume_session_id and session.end_time:
                     session.end_time = None
                     session.save()
+                    bump_student_classes(session.student_id)
 
                 messages = ChatMessage.objects.filter(session=session).order_by('timestamp')
                 
@@ -60,7 +65,9 @@ class TutorPageView(TemplateView):
                 if session.document:
                     context['exercise_document_json'] = json.dumps({
                         'title': session.document.title,
-                        'url': session.document.file.url
+                        'url': session.document.file_url,
+                        # Pages rendered at upload: the PDF is not rendered by the browser
+                        'previews': preview_urls(session.document),
                     })
                 if session.whiteboard_state:
                     context['whiteboard_state_json'] = json.dumps(session.whiteboard_state)
@@ -73,16 +80,11 @@ class TutorPageView(TemplateView):
 
             except ChatSession.DoesNotExist:
                 self.request.session.pop('chat_session_id', None)
-                context['documents'] = Document.objects.all().order_by('title')
-                # Load categories for the tree if no session is in progress
-                context['categories'] = Category.objects.filter(parent__isnull=True).prefetch_related(
-                    'children__children__documents'
-                ).order_by('order', 'name')
+                # Load the top-level categories if no session is in progress
+                context['roots'] = get_node_payload(include_solutions=False)['children']
         else:
-            # Load categories for the tree if no session is in progress
-            context['categories'] = Category.objects.filter(parent__isnull=True).prefetch_related(
-                'children__children__documents'
-            ).order_by('order', 'name')
+            # Load the top-level categories if no session is in progress
+            context['roots'] = get_node_payload(include_solutions=False)['children']
         return context
 
 class OpenAIAPIView(APIView):
@@ -116,7 +118,7 @@ class StartSessionView(LoginRequiredMixin, View):
             question_context=question_context,
             solution_context=solution_context
         )
-        
+
         # Generate the AI's welcome message
         try:
             client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
@@ -124,7 +126,8 @@ class StartSessionView(LoginRequiredMixin, View):
                 "role": "system",
                 "content": "Tu es un tuteur de maths sympathique et encourageant. Tu t'apprêtes à commencer un exercice avec un élève. Ton premier message doit être un message d'accueil court et motivant pour l'inviter à commencer. Tu tutoies l'élève. Ne mentionne ni la question ni la solution. Réponds uniquement en français."
             }
-            welcome_response = client.chat.completions.create(
+            welcome_response = chat_completion(
+                client, 'welcome',
                 model="gpt-4o",
                 messages=[welcome_prompt, {"role": "user", "content": "Commence la conversation."}],
                 temperature=0.5
@@ -151,12 +154,16 @@ class TutorImageAnalysisView(OpenAIAPIView):
     """
     def post(self, request, *args, **kwargs):
         document_url = request.data.get('document_url')
-        image_base64 = request.data.get('image')
+        document = Document.objects.filter(pk=document_id_from_url(document_url)).first()
+        try:
+            page = int(request.data.get('page', 1))
+        except (TypeError, ValueError):
+            page = 1
+        # Without a screenshot from the browser, the page rendered at upload is analyzed
+        image_base64 = request.data.get('image') or preview_base64(document, page)
         if not image_base64:
             return Response({"error": "No image provided."}, status=status.HTTP_400_BAD_REQUEST)
 
-        document = Document.objects.filter(file=document_url.replace('/media/', '')).first()
-
         try:
             extraction_prompt = {
                 "role": "system",
@@ -167,7 +174,8 @@ class TutorImageAnalysisView(OpenAIAPIView):
                 {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_base64}"}}
             ]
             
-            extraction_response = self.client.chat.completions.create(
+            extraction_response = chat_completion(
+                self.client, 'image_analysis',
                 model="gpt-4o",
                 messages=[extraction_prompt, {"role": "user", "content": user_content}],
                 response_format={"type": "json_object"}
@@ -194,7 +202,8 @@ class TutorImageAnalysisView(OpenAIAPIView):
                 "content": "Tu es un tuteur de maths sympathique et encourageant. Tu t'apprêtes à commencer un exercice avec un élève. Ton premier message doit être un message d'accueil court et motivant pour l'inviter à commencer. Tu tutoies l'élève. Ne mentionne ni la question ni la solution. Réponds uniquement en français."
             }
             
-            welcome_response = self.client.chat.completions.create(
+            welcome_response = chat_completion(
+                self.client, 'welcome',
                 model="gpt-4o",
                 messages=[welcome_prompt, {"role": "user", "content": "Commence la conversation."}],
                 temperature=0.5
@@ -243,6 +252,7 @@ class TutorInteractionView(BaseTutorAPIView):
     """Handles a normal interaction with the AI tutor."""
     def handle_logic(self, request, *args, **kwargs):
         user_message_content = self.client_messages[-1]['content']
+        # No cache bump per message: the class dashboards are refreshed when the session ends
         ChatMessage.objects.create(session=self.chat_session, role='user', content=user_message_content)
         request.session['hint_level'] = 1
 
@@ -287,7 +297,8 @@ class TutorInteractionView(BaseTutorAPIView):
         api_messages = [{"role": "system", "content": system_prompt}] + processed_messages
 
         try:
-            completion = self.client.chat.completions.create(
+            completion = chat_completion(
+                self.client, 'interaction',
                 model="gpt-4o",
                 messages=api_messages,
                 temperature=0.4,
@@ -325,6 +336,7 @@ class EndSessionView(APIView):
                     thread = threading.Thread(target=generate_and_save_session_summary, args=[session.id])
                     thread.start()
                     session.save()
+                    bump_student_classes(session.student_id)
             except ChatSession.DoesNotExist:
                 pass
 
@@ -352,6 +364,8 @@ class SaveWhiteboardView(APIView):
             session = ChatSession.objects.get(id=chat_session_id)
             session.whiteboard_state = whiteboard_data
             session.save(update_fields=['whiteboard_state'])
+            metrics.inc('catalyst_whiteboard_saves_total')
+            metrics.inc('catalyst_whiteboard_save_bytes_total', amount=int(request.META.get('CONTENT_LENGTH') or 0))
             return Response({"success": True}, status=status.HTTP_200_OK)
         except ChatSession.DoesNotExist:
             return Response({"error": "Session not found."}, status=status.HTTP_404_NOT_FOUND)
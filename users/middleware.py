@@ -0,0 +1,18 @@
+# users/middleware.py
+
+from django.utils.functional import SimpleLazyObject
+
+from .roles import get_user_roles
+
+
+class UserRolesMiddleware:
+    """
+    Exposes the roles of the current user as `request.user_roles` (also available in
+    templates through the request context processor). They are only resolved when used.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user_roles = SimpleLazyObject(lambda: get_user_roles(request.user))
+        return self.get_response(request)
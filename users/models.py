@@ -1,3 +1,17 @@
+# users/models.py
+
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class CachedRoles(models.Model):
+    """
+    The group names of a user (users.roles), loaded with the user by RolesModelBackend.
+    `names` is None until they are resolved again; `version` is bumped on every
+    membership change so that a resolution racing with it is not stored.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='cached_roles'
+    )
+    names = models.JSONField(null=True)
+    version = models.PositiveIntegerField(default=0)
@@ -0,0 +1,80 @@
+# users/roles.py
+
+from django.db.models import F
+from .models import CachedRoles
+
+TEACHERS_GROUP = 'Professeurs'
+STUDENTS_GROUP = 'Eleves'
+
+
+class UserRoles:
+    """The groups of a user, resolved once per request."""
+    __slots__ = ('names',)
+
+    def __init__(self, names=()):
+        self.names = frozenset(names)
+
+    def __contains__(self, group_name):
+        return group_name in self.names
+
+    def __iter__(self):
+        return iter(sorted(self.names))
+
+    def __bool__(self):
+        return bool(self.names)
+
+    @property
+    def is_teacher(self):
+        return TEACHERS_GROUP in self.names
+
+    @property
+    def is_student(self):
+        return not self.is_teacher
+
+
+def get_user_roles(user):
+    """
+    Returns the roles of a user. They are memoized on the user object (so on the request)
+    and stored between requests in its CachedRoles row, which RolesModelBackend loads
+    with the user, until the user's memberships change.
+    """
+    if not getattr(user, 'is_authenticated', False):
+        return UserRoles()
+    roles = getattr(user, '_user_roles', None)
+    if roles is None:
+        try:
+            stored = user.cached_roles
+        except CachedRoles.DoesNotExist:
+            stored = None
+        if stored is not None and stored.names is not None:
+            names = stored.names
+        else:
+            names = list(user.groups.values_list('name', flat=True))
+            _store_roles(user.pk, stored, names)
+        roles = user._user_roles = UserRoles(names)
+    return roles
+
+
+def _store_roles(user_id, stored, names):
+    if stored is None:
+        CachedRoles.objects.bulk_create([CachedRoles(user_id=user_id, names=names)], ignore_conflicts=True)
+    else:
+        # Not written if the memberships changed since the row was read: the version was bumped
+        CachedRoles.objects.filter(user_id=user_id, version=stored.version).update(names=names)
+
+
+def invalidate_user_roles(*user_ids):
+    """
+    Discards the stored roles of the given (existing) users, after their memberships changed.
+    The rows are created first, so that a resolution that read the old memberships cannot
+    store them afterwards.
+    """
+    if not user_ids:
+        return
+    CachedRoles.objects.bulk_create([CachedRoles(user_id=user_id) for user_id in set(user_ids)], ignore_conflicts=True)
+    CachedRoles.objects.filter(user_id__in=user_ids).update(names=None, version=F('version') + 1)
+
+
+def is_teacher(user):
+    """Checks if the user is in the 'Professeurs' group."""
+    return get_user_roles(user).is_teacher
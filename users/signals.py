@@ -0,0 +1,30 @@
+# users/signals.py
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+
+from .roles import invalidate_user_roles
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        # user.groups.add/remove/clear(...)
+        invalidate_user_roles(instance.pk)
+    elif action == 'pre_clear':
+        # group.user_set.clear(): the members are only known before the clear
+        invalidate_user_roles(*instance.user_set.values_list('pk', flat=True))
+    else:
+        invalidate_user_roles(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_roles_on_group_change(sender, instance, **kwargs):
+    # A renamed or deleted group changes the roles of all its members
+    if instance.pk:
+        invalidate_user_roles(*instance.user_set.values_list('pk', flat=True))
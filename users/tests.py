@@ -1,3 +1,43 @@
-from django.test import TestCase
+# users/tests.py
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.test import TestCase, override_settings
+from core.testing import TEST_SETTINGS
+from .backends import RolesModelBackend
+from .roles import TEACHERS_GROUP, _store_roles, get_user_roles
+
+
+@override_settings(**TEST_SETTINGS)
+class UserRolesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('prof', password='prof')
+        cls.teachers = Group.objects.get_or_create(name=TEACHERS_GROUP)[0]
+
+    def load_user(self):
+        # As the authentication middleware does on every request
+        return RolesModelBackend().get_user(self.user.pk)
+
+    def test_stored_roles_cost_no_query(self):
+        self.assertFalse(get_user_roles(self.load_user()).is_teacher)
+        user = self.load_user()
+        with self.assertNumQueries(0):
+            self.assertFalse(get_user_roles(user).is_teacher)
+
+    def test_membership_changes(self):
+        get_user_roles(self.load_user())
+        self.user.groups.add(self.teachers)
+        self.assertTrue(get_user_roles(self.load_user()).is_teacher)
+        self.teachers.user_set.clear()
+        self.assertFalse(get_user_roles(self.load_user()).is_teacher)
+
+    def test_resolution_racing_with_a_change(self):
+        for _ in range(2):
+            # Without a stored row, then with one
+            user = self.load_user()
+            stale = list(user.groups.values_list('name', flat=True))
+            self.user.groups.add(self.teachers)
+            _store_roles(user.pk, getattr(user, 'cached_roles', None), stale)
+            self.assertTrue(get_user_roles(self.load_user()).is_teacher)
+            self.user.groups.clear()